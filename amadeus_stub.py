@@ -0,0 +1,428 @@
+"""Local stand-in for the Amadeus self-service API.
+
+Implements just enough of ``/v1/security/oauth2/token`` and
+``/v2/shopping/flight-offers`` for ``app.py`` to run its flight search against
+a laptop instead of ``test.api.amadeus.com``:
+
+    python amadeus_stub.py serve --port 8080 --latency-ms 120 --offers 250
+    AMADEUS_BASE_URL=http://localhost:8080 python app.py
+
+Responses are either replayed from recorded fixtures (``--fixtures DIR``, one
+``<ORIGIN>-<DESTINATION>.json`` file per route, ``default.json`` as catch-all)
+or synthesised deterministically from ``--seed`` and the search parameters.
+Latency, 5xx errors, 401 and 429 responses can be injected at configurable
+rates, so the search path can be benchmarked and regression-tested offline.
+
+Fixtures can be captured from the real API with:
+
+    python amadeus_stub.py record DEL BOM 2025-07-01 --out fixtures/amadeus
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from flask import Flask, Response, request
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+CARRIERS = {
+    '6E': 'INDIGO',
+    'AI': 'AIR INDIA',
+    'UK': 'VISTARA',
+    'SG': 'SPICEJET',
+    'QP': 'AKASA AIR',
+    'IX': 'AIR INDIA EXPRESS',
+    'EK': 'EMIRATES',
+    'LH': 'LUFTHANSA',
+}
+
+AIRCRAFT = {
+    '320': 'AIRBUS A320',
+    '32N': 'AIRBUS A320NEO',
+    '321': 'AIRBUS A321',
+    '738': 'BOEING 737-800',
+    '7M8': 'BOEING 737 MAX 8',
+    '788': 'BOEING 787-8',
+}
+
+ERRORS = {
+    400: {'code': 477, 'title': 'INVALID FORMAT'},
+    401: {'code': 38191, 'title': 'Invalid access token',
+          'detail': 'The access token provided in the Authorization header is invalid'},
+    429: {'code': 38194, 'title': 'Too many requests',
+          'detail': 'The network rate limit is exceeded, please try again later'},
+    500: {'code': 141, 'title': 'SYSTEM ERROR HAS OCCURRED'},
+}
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class StubConfig:
+    """Runtime knobs of the stand-in server (env defaults, CLI overrides)"""
+
+    def __init__(self, **overrides):
+        self.latency_ms = _env_float('AMADEUS_STUB_LATENCY_MS', 0)
+        self.jitter_ms = _env_float('AMADEUS_STUB_JITTER_MS', 0)
+        self.error_rate = _env_float('AMADEUS_STUB_ERROR_RATE', 0)
+        self.unauthorized_rate = _env_float('AMADEUS_STUB_401_RATE', 0)
+        self.rate_limit_rate = _env_float('AMADEUS_STUB_429_RATE', 0)
+        self.offers = int(os.getenv('AMADEUS_STUB_OFFERS', 0))  # 0 = honour the "max" parameter
+        self.token_ttl = int(os.getenv('AMADEUS_STUB_TOKEN_TTL', 1799))
+        self.seed = int(os.getenv('AMADEUS_STUB_SEED', 42))
+        self.fixtures = os.getenv('AMADEUS_STUB_FIXTURES')
+        for key, value in overrides.items():
+            if value is not None:
+                setattr(self, key, value)
+
+
+def error_response(status, detail=None):
+    """Build an error body in the shape the real API uses"""
+    error = dict(ERRORS.get(status, {'code': status, 'title': 'ERROR'}))
+    if detail:
+        error['detail'] = detail
+    error['status'] = status
+    return Response(json.dumps({'errors': [error]}), status=status,
+                    mimetype='application/vnd.amadeus+json')
+
+
+def _route_rng(seed, *parts):
+    """Deterministic RNG for a search, independent of request order"""
+    key = '|'.join(str(p) for p in (seed,) + parts)
+    return random.Random(zlib.crc32(key.encode('utf-8')))
+
+
+def _iso_duration(minutes):
+    hours, mins = divmod(minutes, 60)
+    return f"PT{hours}H{mins}M" if mins else f"PT{hours}H"
+
+
+def synthesize_offers(seed, origin, destination, date, count, currency='INR', cabin='ECONOMY'):
+    """Generate ``count`` flight offers shaped like a real v2 flight-offers response"""
+    rng = _route_rng(seed, origin, destination, date)
+    try:
+        day = datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    base_minutes = rng.randint(70, 600)
+    base_price = 2500 + base_minutes * rng.uniform(25, 45)
+    carriers = list(CARRIERS)
+    aircraft = list(AIRCRAFT)
+
+    offers = []
+    for i in range(count):
+        carrier = rng.choice(carriers)
+        departure = day + timedelta(minutes=rng.randrange(0, 24 * 60, 5))
+        duration = base_minutes + rng.randint(-15, 45)
+        arrival = departure + timedelta(minutes=duration)
+        price = round(base_price * rng.uniform(0.8, 2.2), 2)
+        stops = 0 if rng.random() < 0.7 else 1
+        segment_id = str(i + 1)
+
+        offers.append({
+            'type': 'flight-offer',
+            'id': str(i + 1),
+            'source': 'GDS',
+            'instantTicketingRequired': False,
+            'nonHomogeneous': False,
+            'oneWay': False,
+            'lastTicketingDate': date,
+            'numberOfBookableSeats': rng.randint(1, 9),
+            'itineraries': [{
+                'duration': _iso_duration(duration),
+                'segments': [{
+                    'departure': {'iataCode': origin, 'at': departure.strftime('%Y-%m-%dT%H:%M:%S')},
+                    'arrival': {'iataCode': destination, 'at': arrival.strftime('%Y-%m-%dT%H:%M:%S')},
+                    'carrierCode': carrier,
+                    'number': str(rng.randint(100, 9999)),
+                    'aircraft': {'code': rng.choice(aircraft)},
+                    'operating': {'carrierCode': carrier},
+                    'duration': _iso_duration(duration),
+                    'id': segment_id,
+                    'numberOfStops': stops,
+                    'blacklistedInEU': False,
+                }],
+            }],
+            'price': {
+                'currency': currency,
+                'total': f"{price:.2f}",
+                'base': f"{price * 0.85:.2f}",
+                'grandTotal': f"{price:.2f}",
+            },
+            'pricingOptions': {'fareType': ['PUBLISHED'], 'includedCheckedBagsOnly': True},
+            'validatingAirlineCodes': [carrier],
+            'travelerPricings': [{
+                'travelerId': '1',
+                'fareOption': 'STANDARD',
+                'travelerType': 'ADULT',
+                'price': {'currency': currency, 'total': f"{price:.2f}", 'base': f"{price * 0.85:.2f}"},
+                'fareDetailsBySegment': [{
+                    'segmentId': segment_id,
+                    'cabin': cabin,
+                    'fareBasis': 'SAVER',
+                    'class': 'S',
+                    'includedCheckedBags': {'weight': 15, 'weightUnit': 'KG'},
+                    'includedCabinBags': {'weight': 7, 'weightUnit': 'KG'},
+                }],
+            }],
+        })
+
+    return {
+        'meta': {'count': len(offers)},
+        'data': offers,
+        'dictionaries': {
+            'locations': {
+                origin: {'cityCode': origin, 'countryCode': 'XX'},
+                destination: {'cityCode': destination, 'countryCode': 'XX'},
+            },
+            'aircraft': AIRCRAFT,
+            'currencies': {currency: currency},
+            'carriers': CARRIERS,
+        },
+    }
+
+
+def load_fixture(fixtures_dir, origin, destination):
+    """Return the recorded response for a route, or None if there is none"""
+    if not fixtures_dir:
+        return None
+    for name in (f"{origin}-{destination}.json", 'default.json'):
+        path = os.path.join(fixtures_dir, name)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+    return None
+
+
+def resize_offers(payload, count):
+    """Trim or repeat the offers of a recorded response to ``count`` entries"""
+    offers = payload.get('data', [])
+    if not offers or count is None:
+        return payload
+    resized = []
+    for i in range(count):
+        offer = dict(offers[i % len(offers)])
+        offer['id'] = str(i + 1)
+        resized.append(offer)
+    payload = dict(payload)
+    payload['data'] = resized
+    payload['meta'] = {'count': len(resized)}
+    return payload
+
+
+def create_app(config=None):
+    """Create the stand-in Flask app"""
+    config = config or StubConfig()
+    stub = Flask(__name__)
+    tokens = {}
+    tokens_lock = threading.Lock()
+    chaos = random.Random(config.seed)
+    chaos_lock = threading.Lock()
+    stats = {'tokens_issued': 0, 'searches': 0, 'injected': {401: 0, 429: 0, 500: 0}}
+
+    @lru_cache(maxsize=1024)
+    def offers_body(origin, destination, date, count, currency, cabin):
+        # Serialise once per distinct search so the stub is never the bottleneck
+        payload = load_fixture(config.fixtures, origin, destination)
+        if payload is not None:
+            payload = resize_offers(payload, count)
+        else:
+            payload = synthesize_offers(config.seed, origin, destination, date, count, currency, cabin)
+        return json.dumps(payload)
+
+    def simulate_latency():
+        with chaos_lock:
+            delay = config.latency_ms + chaos.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def injected_status():
+        """Roll the dice for a fault; returns an HTTP status or None"""
+        with chaos_lock:
+            roll = chaos.random()
+        for status, rate in ((401, config.unauthorized_rate),
+                             (429, config.rate_limit_rate),
+                             (500, config.error_rate)):
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+    @stub.route('/v1/security/oauth2/token', methods=['POST'])
+    def issue_token():
+        simulate_latency()
+        if request.form.get('grant_type') != 'client_credentials':
+            return error_response(400, 'Only client_credentials grant_type is supported')
+        if not request.form.get('client_id') or not request.form.get('client_secret'):
+            return error_response(401, 'Missing client credentials')
+
+        access_token = uuid.uuid4().hex
+        with tokens_lock:
+            now = time.time()
+            # Drop expired tokens so long load runs do not grow the table forever
+            for token in [t for t, exp in tokens.items() if exp <= now]:
+                del tokens[token]
+            tokens[access_token] = now + config.token_ttl
+            stats['tokens_issued'] += 1
+
+        return Response(json.dumps({
+            'type': 'amadeusOAuth2Token',
+            'username': 'stub@localhost',
+            'application_name': 'amadeus-stub',
+            'client_id': request.form['client_id'],
+            'token_type': 'Bearer',
+            'access_token': access_token,
+            'expires_in': config.token_ttl,
+            'state': 'approved',
+            'scope': '',
+        }), mimetype='application/json')
+
+    @stub.route('/v2/shopping/flight-offers', methods=['GET'])
+    def flight_offers():
+        simulate_latency()
+
+        auth = request.headers.get('Authorization', '')
+        token = auth[7:] if auth.startswith('Bearer ') else None
+        with tokens_lock:
+            expires_at = tokens.get(token)
+        if not expires_at or expires_at <= time.time():
+            return error_response(401)
+
+        status = injected_status()
+        if status:
+            with chaos_lock:
+                stats['injected'][status] += 1
+            if status == 401:
+                # Behave like a revoked token: the client has to re-authenticate
+                with tokens_lock:
+                    tokens.pop(token, None)
+            return error_response(status)
+
+        origin = request.args.get('originLocationCode', '').upper()
+        destination = request.args.get('destinationLocationCode', '').upper()
+        date = request.args.get('departureDate', '')
+        for name, value in (('originLocationCode', origin),
+                            ('destinationLocationCode', destination),
+                            ('departureDate', date)):
+            if not value:
+                return error_response(400, f'{name} is required')
+        if origin == destination:
+            return error_response(400, 'Origin and destination must be different')
+
+        try:
+            count = config.offers or int(request.args.get('max', 250))
+        except ValueError:
+            return error_response(400, 'max must be a number')
+
+        with chaos_lock:
+            stats['searches'] += 1
+        body = offers_body(origin, destination, date, count,
+                           request.args.get('currencyCode', 'EUR'),
+                           request.args.get('travelClass', 'ECONOMY'))
+        return Response(body, mimetype='application/vnd.amadeus+json')
+
+    @stub.route('/__stub/stats', methods=['GET'])
+    def stub_stats():
+        return Response(json.dumps(stats), mimetype='application/json')
+
+    return stub
+
+
+def record_fixture(origin, destination, date, out_dir):
+    """Capture a real flight-offers response into the fixtures directory"""
+    import requests
+
+    base_url = os.getenv('AMADEUS_RECORD_URL', 'https://test.api.amadeus.com')
+    token_response = requests.post(
+        f"{base_url}/v1/security/oauth2/token",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        data={
+            "grant_type": "client_credentials",
+            "client_id": os.getenv('AMADEUS_API_KEY'),
+            "client_secret": os.getenv('AMADEUS_API_SECRET')
+        }
+    )
+    token_response.raise_for_status()
+
+    response = requests.get(
+        f"{base_url}/v2/shopping/flight-offers",
+        headers={'Authorization': f"Bearer {token_response.json()['access_token']}"},
+        params={
+            'originLocationCode': origin.upper(),
+            'destinationLocationCode': destination.upper(),
+            'departureDate': date,
+            'adults': 1,
+            'currencyCode': 'INR',
+            'max': 250
+        }
+    )
+    response.raise_for_status()
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{origin.upper()}-{destination.upper()}.json")
+    with open(path, 'w') as f:
+        json.dump(response.json(), f, indent=2)
+    print(f"Recorded {len(response.json().get('data', []))} offers to {path}")
+    return path
+
+
+def main():
+    """Command line entry point for the stand-in server"""
+    parser = argparse.ArgumentParser(description='Local Amadeus API stand-in')
+    subparsers = parser.add_subparsers(dest='command', help='Command to execute')
+
+    serve_parser = subparsers.add_parser('serve', help='Run the stand-in server')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--latency-ms', type=float, help='Base latency added to every call')
+    serve_parser.add_argument('--jitter-ms', type=float, help='Uniform +/- jitter around the base latency')
+    serve_parser.add_argument('--error-rate', type=float, help='Fraction of searches answered with 500')
+    serve_parser.add_argument('--unauthorized-rate', type=float, help='Fraction of searches answered with 401')
+    serve_parser.add_argument('--rate-limit-rate', type=float, help='Fraction of searches answered with 429')
+    serve_parser.add_argument('--offers', type=int, help='Offers per response (default: the "max" parameter)')
+    serve_parser.add_argument('--token-ttl', type=int, help='Access token lifetime in seconds')
+    serve_parser.add_argument('--seed', type=int, help='Seed for synthetic data and fault injection')
+    serve_parser.add_argument('--fixtures', help='Directory of recorded <ORIGIN>-<DEST>.json responses')
+
+    record_parser = subparsers.add_parser('record', help='Record a real response as a fixture')
+    record_parser.add_argument('origin')
+    record_parser.add_argument('destination')
+    record_parser.add_argument('date', help='Departure date (YYYY-MM-DD)')
+    record_parser.add_argument('--out', default=os.path.join('fixtures', 'amadeus'))
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        config = StubConfig(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            unauthorized_rate=args.unauthorized_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            offers=args.offers,
+            token_ttl=args.token_ttl,
+            seed=args.seed,
+            fixtures=args.fixtures
+        )
+        print(f"Amadeus stand-in running at http://{args.host}:{args.port}")
+        print(f"Point the API at it with AMADEUS_BASE_URL=http://{args.host}:{args.port}")
+        create_app(config).run(host=args.host, port=args.port, threaded=True)
+    elif args.command == 'record':
+        record_fixture(args.origin, args.destination, args.date, args.out)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,27 @@ from math import radians, sin, cos, sqrt, atan2
 import requests
 import json
 import os
+import base64
 import mysql.connector
 from dotenv import load_dotenv
+from db import connect, get_connection, mark_write, pool_stats, write_tracker
 import uuid
+from functools import partial
 import bcrypt
 import jwt
-from auth_routes import auth_bp
+from auth_routes import auth_bp, client_ip, rate_limited_response
+from offer_cache import OfferCache, PriceCalendar
+from disk_cache import DiskCache
+from serialization import json_response
+from compression import compress_response
+from cache_warmer import CacheWarmer
+from seat_inventory import SeatHolds, booking_reference, seat_numbers, take_seats
+from fare_summary import cheapest_from, fare_calendar
+from password_hashing import password_hasher
+from token_verifier import token_verifier
+from token_revocation import create_tables as create_token_tables, revocation_list
+from profile_cache import profile_cache
+from rate_limiter import rate_limiter
 
 load_dotenv()
 
@@ -22,11 +37,7 @@ def init_db():
     """Initialize the database and create tables if they don't exist"""
     try:
         # First connect without database to create it if needed
-        conn = mysql.connector.connect(
-            host=os.getenv('MYSQL_HOST', 'localhost'),
-            user=os.getenv('MYSQL_USER', 'root'),
-            password=os.getenv('MYSQL_PASSWORD', '')
-        )
+        conn = connect(database=False)
         cursor = conn.cursor()
         
         # Create database if not exists
@@ -35,7 +46,7 @@ def init_db():
         conn.close()
         
         # Now connect to the database and create tables
-        conn = get_db_connection()
+        conn = connect()
         cursor = conn.cursor()
         
         # Create users table
@@ -67,10 +78,14 @@ def init_db():
                 booking_reference VARCHAR(36) UNIQUE NOT NULL,
                 status VARCHAR(20) DEFAULT 'confirmed',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_bookings_user_created (user_id, created_at, id),
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
             )
         """)
         
+        # Refresh tokens and revoked access tokens
+        create_token_tables(cursor)
+        
         conn.commit()
         cursor.close()
         conn.close()
@@ -79,15 +94,6 @@ def init_db():
         print(f"Error initializing database: {e}")
         raise
 
-# MySQL connection helper
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
-
 # Register blueprints
 app.register_blueprint(auth_bp)
 
@@ -102,9 +108,16 @@ CORS(app, resources={
 })
 
 # Amadeus API Configuration
-AMADEUS_API_KEY = "BqDtPNTcgYsPP0X88iGrEsG3IMNzRpoS"
-AMADEUS_API_SECRET = "cr0APVNsSEoceqUt"
-AMADEUS_BASE_URL = "https://test.api.amadeus.com"
+# Point AMADEUS_BASE_URL at amadeus_stub.py to run searches offline
+AMADEUS_API_KEY = os.getenv('AMADEUS_API_KEY', "BqDtPNTcgYsPP0X88iGrEsG3IMNzRpoS")
+AMADEUS_API_SECRET = os.getenv('AMADEUS_API_SECRET', "cr0APVNsSEoceqUt")
+AMADEUS_BASE_URL = os.getenv('AMADEUS_BASE_URL', "https://test.api.amadeus.com").rstrip('/')
+
+# Host-wide cache shared by all worker processes (offers, calendar, Amadeus token)
+shared_cache = DiskCache()
+
+# Read-your-writes markers must be visible to every worker
+write_tracker.use_store(shared_cache)
 
 # Token management
 token_data = {
@@ -122,6 +135,13 @@ def get_amadeus_token():
     if token_data["access_token"] and token_data["expires_at"] and current_time < token_data["expires_at"]:
         return token_data["access_token"]
     
+    # Reuse a token another worker already obtained
+    shared_token = shared_cache.get('amadeus:token')
+    if shared_token:
+        token_data["access_token"] = shared_token["access_token"]
+        token_data["expires_at"] = datetime.fromtimestamp(shared_token["expires_at"])
+        return token_data["access_token"]
+    
     # Get new token
     try:
         token_url = f"{AMADEUS_BASE_URL}/v1/security/oauth2/token"
@@ -141,6 +161,10 @@ def get_amadeus_token():
         token_data["access_token"] = token_response["access_token"]
         # Set expiration time (subtract 5 minutes for safety margin)
         token_data["expires_at"] = current_time + timedelta(seconds=token_response["expires_in"] - 300)
+        shared_cache.set('amadeus:token', {
+            "access_token": token_data["access_token"],
+            "expires_at": token_data["expires_at"].timestamp()
+        }, ttl=max(token_response["expires_in"] - 300, 1))
         
         return token_data["access_token"]
     except Exception as e:
@@ -154,9 +178,12 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
     response.headers['Access-Control-Allow-Credentials'] = 'true'
-    response.headers['Vary'] = 'Origin'
+    response.vary.add('Origin')
     return response
 
+# Compress large responses for clients that accept gzip/brotli
+app.after_request(compress_response)
+
 # Handle OPTIONS method for preflight requests
 @app.route('/api/optimize', methods=['OPTIONS'])
 def options_handler():
@@ -339,76 +366,655 @@ def get_airports():
 
 # Route to optimize route
 
+# Fields a client may request with ?fields= (sparse fieldsets)
+OFFER_FIELDS = (
+    'airline', 'flightNumber', 'origin', 'destination', 'departureTime', 'arrivalTime',
+    'duration', 'price', 'currency', 'numberOfStops', 'aircraft', 'cabin', 'baggage'
+)
+BOOKING_FIELDS = (
+    'id', 'user_id', 'flight_number', 'airline', 'origin', 'destination', 'departure_time',
+    'arrival_time', 'price', 'currency', 'cabin_class', 'booking_reference', 'status', 'created_at'
+)
+
+def parse_fields(raw, allowed):
+    """Parse a ``fields`` parameter (comma separated or a list) against a whitelist
+
+    Returns the requested fields in order, or None when the parameter is absent.
+    Raises ValueError naming the unknown fields.
+    """
+    if raw is None or raw == '' or raw == []:
+        return None
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    elif not isinstance(raw, list) or not all(isinstance(field, str) for field in raw):
+        raise ValueError('fields must be a comma separated string or a list of strings')
+    fields = []
+    for field in raw:
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+def fields_error(error, allowed):
+    return jsonify({'error': str(error), 'allowed_fields': list(allowed)}), 400
+
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 200
+
+def encode_cursor(created_at, booking_id):
+    """Opaque pagination cursor pointing just past the given booking"""
+    raw = json.dumps([created_at.isoformat(), booking_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, booking_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(booking_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('malformed cursor') from e
+
 # --- USER REGISTRATION ENDPOINT ---
 @app.route('/api/register', methods=['POST'])
 def register_user():
+    retry_after = rate_limiter.check(('register_ip', client_ip()))
+    if retry_after:
+        return rate_limited_response(retry_after)
     data = request.get_json()
     user_id = str(uuid.uuid4())
     email = data['email']
     name = data['name']
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(
-            "INSERT INTO users (id, email, name) VALUES (%s, %s, %s)",
-            (user_id, email, name)
-        )
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO users (id, email, name) VALUES (%s, %s, %s)",
+                (user_id, email, name)
+            )
+            conn.commit()
+            cursor.close()
+        mark_write(user_id)
+        profile_cache.invalidate(user_id)
         return jsonify({'user_id': user_id, 'email': email, 'name': name}), 201
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 400
-    finally:
-        cursor.close()
-        conn.close()
 
 # --- FLIGHT BOOKING ENDPOINT ---
+BOOKING_REQUIRED_FIELDS = (
+    'user_id', 'flight_number', 'airline', 'origin', 'destination',
+    'departure_time', 'arrival_time', 'price'
+)
+BULK_BOOKING_MAX = int(os.getenv('BULK_BOOKING_MAX', 500))
+
+INSERT_BOOKING_SQL = """
+    INSERT INTO bookings (
+        user_id, flight_number, airline, origin, destination,
+        departure_time, arrival_time, price, currency, cabin_class, booking_reference
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def valid_user_id(value):
+    """A user id is a string (UUID) or an integer, never a list or object"""
+    return isinstance(value, str) or (isinstance(value, int) and not isinstance(value, bool))
+
+def validate_booking(data):
+    """Return an error message for an invalid booking payload, or None"""
+    if not isinstance(data, dict):
+        return 'Booking must be an object'
+    missing = [field for field in BOOKING_REQUIRED_FIELDS if data.get(field) in (None, '')]
+    if missing:
+        return f'Missing required fields: {", ".join(missing)}'
+    if not valid_user_id(data['user_id']):
+        return 'user_id must be a string or an integer'
+    try:
+        if float(data['price']) < 0:
+            return 'price must not be negative'
+    except (TypeError, ValueError):
+        return 'price must be a number'
+    return None
+
+def booking_row(data, booking_reference):
+    """Parameters for INSERT_BOOKING_SQL"""
+    return (
+        data['user_id'],
+        data['flight_number'],
+        data['airline'],
+        data['origin'],
+        data['destination'],
+        data['departure_time'],
+        data['arrival_time'],
+        data['price'],
+        data.get('currency', 'INR'),
+        data.get('cabin_class', 'ECONOMY'),
+        booking_reference
+    )
+
 @app.route('/api/bookings', methods=['POST'])
 def create_booking():
     data = request.get_json()
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    error = validate_booking(data)
+    if error:
+        return jsonify({'error': error}), 400
+
     booking_reference = str(uuid.uuid4())
     try:
-        cursor.execute("""
-            INSERT INTO bookings (
-                user_id, flight_number, airline, origin, destination,
-                departure_time, arrival_time, price, currency, cabin_class, booking_reference
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            data['user_id'],
-            data['flight_number'],
-            data['airline'],
-            data['origin'],
-            data['destination'],
-            data['departure_time'],
-            data['arrival_time'],
-            data['price'],
-            data.get('currency', 'INR'),
-            data.get('cabin_class', 'ECONOMY'),
-            booking_reference
-        ))
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_BOOKING_SQL, booking_row(data, booking_reference))
+            conn.commit()
+            cursor.close()
+        # The user's next bookings read must not hit a lagging replica
+        mark_write(data['user_id'])
         return jsonify({'booking_reference': booking_reference}), 201
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 400
-    finally:
-        cursor.close()
-        conn.close()
+
+# --- BULK BOOKING ENDPOINT ---
+@app.route('/api/bookings/bulk', methods=['POST'])
+def create_bookings_bulk():
+    """Book a group in one transaction: either every booking is stored or none is
+
+    Accepts ``{"bookings": [...]}`` (or a bare list) of the same objects as
+    ``POST /api/bookings`` and returns their references in request order.
+    """
+    data = request.get_json()
+    bookings = data.get('bookings') if isinstance(data, dict) else data
+    if not isinstance(bookings, list) or not bookings:
+        return jsonify({'error': 'bookings must be a non-empty list'}), 400
+    if len(bookings) > BULK_BOOKING_MAX:
+        return jsonify({'error': f'At most {BULK_BOOKING_MAX} bookings per request'}), 400
+
+    errors = []
+    for index, booking in enumerate(bookings):
+        error = validate_booking(booking)
+        if error:
+            errors.append({'index': index, 'error': error})
+    if errors:
+        return jsonify({'error': 'Invalid bookings', 'details': errors}), 400
+
+    references = [str(uuid.uuid4()) for _ in bookings]
+    rows = [booking_row(booking, reference) for booking, reference in zip(bookings, references)]
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # executemany turns this into a single multi-row INSERT
+            cursor.executemany(INSERT_BOOKING_SQL, rows)
+            conn.commit()
+            cursor.close()
+    except mysql.connector.Error as err:
+        # Nothing was committed; the pool rolls the transaction back
+        return jsonify({'error': str(err)}), 400
+
+    mark_write(*{booking['user_id'] for booking in bookings})
+    return jsonify({'booking_references': references, 'count': len(references)}), 201
+
+# --- SEAT INVENTORY (local flights table) ---
+seat_holds = SeatHolds()
+
+def parse_seats(data):
+    """Validated seat count from a hold or booking request"""
+    seats = int(data.get('seats', 1))
+    if not 1 <= seats <= seat_holds.max_seats:
+        raise ValueError(f'seats must be between 1 and {seat_holds.max_seats}')
+    return seats
+
+@app.route('/api/flights/<int:flight_id>/holds', methods=['POST'])
+def hold_seats(flight_id):
+    """Hold seats on a flight for the duration of checkout"""
+    data = request.get_json() or {}
+    if not data.get('user_id'):
+        return jsonify({'error': 'Missing required fields: user_id'}), 400
+    if not valid_user_id(data['user_id']):
+        return jsonify({'error': 'user_id must be a string or an integer'}), 400
+    try:
+        seats = parse_seats(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT available_seats FROM flights WHERE id = %s", (flight_id,))
+            flight = cursor.fetchone()
+            cursor.close()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 400
+    if flight is None:
+        return jsonify({'error': 'Flight not found'}), 404
+
+    hold = seat_holds.create(flight_id, data['user_id'], seats, flight['available_seats'])
+    if hold is None:
+        return jsonify({'error': 'Not enough seats available'}), 409
+    hold['expires_at'] = datetime.fromtimestamp(hold['expires_at']).isoformat(timespec='seconds')
+    return jsonify(hold), 201
+
+# Bookings of local flights use init_db.py's bookings table, keyed by flight_id
+INSERT_FLIGHT_BOOKING_SQL = """
+    INSERT INTO bookings (
+        user_id, flight_id, booking_reference, passenger_name,
+        passenger_email, passenger_phone, seat_number
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def parse_passengers(data, seats):
+    """Passenger ``(name, email, phone)`` per seat, or None to use the account holder
+
+    Raises ValueError for a malformed ``passengers`` list.
+    """
+    passengers = data.get('passengers')
+    if passengers is None:
+        return None
+    if not isinstance(passengers, list) or len(passengers) != seats:
+        raise ValueError(f'passengers must be a list of {seats} passenger(s)')
+    parsed = []
+    for passenger in passengers:
+        if not isinstance(passenger, dict):
+            raise ValueError('Each passenger must be an object')
+        values = tuple(passenger.get(field) for field in ('name', 'email', 'phone'))
+        if not all(isinstance(value, str) and value.strip() for value in values):
+            raise ValueError('Each passenger needs a name, email and phone')
+        parsed.append(tuple(value.strip() for value in values))
+    return parsed
+
+@app.route('/api/flights/<int:flight_id>/book', methods=['POST'])
+def book_flight(flight_id):
+    """Book seats on a local flight, decrementing its inventory in the same transaction
+
+    Every seat is booked for the account holder unless ``passengers`` lists a
+    ``name``, ``email`` and ``phone`` per seat.
+    """
+    data = request.get_json() or {}
+    if not data.get('user_id'):
+        return jsonify({'error': 'Missing required fields: user_id'}), 400
+    if not valid_user_id(data['user_id']):
+        return jsonify({'error': 'user_id must be a string or an integer'}), 400
+
+    hold_id = data.get('hold_id')
+    if hold_id:
+        hold = seat_holds.get(hold_id)
+        if hold is None or hold['flight_id'] != flight_id or hold['user_id'] != data['user_id']:
+            return jsonify({'error': 'Hold expired or not found'}), 410
+        seats = hold['seats']
+    else:
+        try:
+            seats = parse_seats(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+    try:
+        passengers = parse_passengers(data, seats)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    references = [booking_reference() for _ in range(seats)]
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if passengers is None:
+                cursor.execute("SELECT name, email, mobile FROM users WHERE id = %s", (data['user_id'],))
+                user = cursor.fetchone()
+                if user is None:
+                    return jsonify({'error': 'User not found'}), 404
+                passengers = [(user[0], user[1], user[2] or '')] * seats
+            # Seats held by other checkouts are left alone; only the booking
+            # rows are written between taking the seats and the commit
+            seats_left = take_seats(cursor, flight_id, seats,
+                                    reserved=seat_holds.held(flight_id, exclude=hold_id))
+            if seats_left is None:
+                conn.rollback()
+                cursor.execute("SELECT 1 FROM flights WHERE id = %s", (flight_id,))
+                if cursor.fetchone() is None:
+                    return jsonify({'error': 'Flight not found'}), 404
+                return jsonify({'error': 'Not enough seats available'}), 409
+            seat_list = seat_numbers(seats_left, seats)
+            cursor.executemany(INSERT_FLIGHT_BOOKING_SQL, [
+                (data['user_id'], flight_id, reference) + passenger + (seat,)
+                for reference, passenger, seat in zip(references, passengers, seat_list)
+            ])
+            conn.commit()
+            cursor.close()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 400
+
+    if hold_id:
+        seat_holds.release(hold_id)
+    mark_write(data['user_id'])
+    return jsonify({'booking_references': references, 'flight_id': flight_id, 'seats': seats,
+                    'seat_numbers': seat_list}), 201
+
+# --- LOCAL FLIGHT SEARCH ---
+FLIGHT_SEARCH_PAGE_SIZE = 50
+FLIGHT_SEARCH_MAX_PAGE_SIZE = 200
+
+# The inner query reads only the route index (ids ride along in every InnoDB
+# secondary index) and stops after LIMIT rows; full rows are fetched for that
+# page alone. Airport codes resolve to constants through the unique code key.
+FLIGHT_SEARCH_SQL = {
+    'price': """
+        SELECT page.id
+        FROM flights page
+        WHERE page.source_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND page.destination_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND page.departure_date = %s
+        ORDER BY page.price, page.id
+        LIMIT %s
+    """,
+    'time': """
+        SELECT page.id
+        FROM flights page
+        WHERE page.source_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND page.destination_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND page.departure_time >= %s AND page.departure_time < %s
+        ORDER BY page.departure_time, page.id
+        LIMIT %s
+    """
+}
+FLIGHT_SEARCH_ORDER = {'price': 'f.price, f.id', 'time': 'f.departure_time, f.id'}
+
+@app.route('/api/flights/search', methods=['GET'])
+def search_local_flights():
+    """Search the local flights inventory for a route and day"""
+    source = (request.args.get('source') or '').upper()
+    destination = (request.args.get('destination') or '').upper()
+    sort = request.args.get('sort', 'price')
+    if not source or not destination or not request.args.get('date'):
+        return jsonify({'error': 'source, destination and date are required'}), 400
+    if sort not in FLIGHT_SEARCH_SQL:
+        return jsonify({'error': 'sort must be one of: price, time'}), 400
+    try:
+        day = datetime.strptime(request.args['date'], '%Y-%m-%d')
+        limit = min(int(request.args.get('limit', FLIGHT_SEARCH_PAGE_SIZE)), FLIGHT_SEARCH_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date or limit: {e}'}), 400
+
+    if sort == 'price':
+        params = (source, destination, day.date(), limit)
+    else:
+        params = (source, destination, day, day + timedelta(days=1), limit)
+    query = f"""
+        SELECT f.id, f.flight_number, f.airline, f.departure_time, f.arrival_time,
+               f.price, f.available_seats
+        FROM ({FLIGHT_SEARCH_SQL[sort]}) ids
+        JOIN flights f ON f.id = ids.id
+        ORDER BY {FLIGHT_SEARCH_ORDER[sort]}
+    """
+
+    try:
+        with get_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, params)
+            flights = cursor.fetchall()
+            cursor.close()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 400
+
+    return json_response({
+        'flights': flights,
+        'source': source,
+        'destination': destination,
+        'date': day.date().isoformat(),
+        'sort': sort
+    })
+
+# --- FARE SUMMARY (route_fare_summary) ---
+FARE_SUMMARY_MAX_DAYS = 366
+
+def parse_date_range(default_days=30):
+    """``from``/``to`` (or ``days``) query arguments as a date range, today onwards by default"""
+    start = (datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+             if request.args.get('from') else datetime.now().date())
+    if request.args.get('to'):
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date()
+    else:
+        end = start + timedelta(days=int(request.args.get('days', default_days)) - 1)
+    if end < start or (end - start).days >= FARE_SUMMARY_MAX_DAYS:
+        raise ValueError(f'the range must cover 1 to {FARE_SUMMARY_MAX_DAYS} days')
+    return start, end
+
+@app.route('/api/flights/fare-calendar', methods=['GET'])
+def get_fare_calendar():
+    """Cheapest local fare per day for a route"""
+    source = (request.args.get('source') or '').upper()
+    destination = (request.args.get('destination') or '').upper()
+    if not source or not destination:
+        return jsonify({'error': 'source and destination are required'}), 400
+    try:
+        start, end = parse_date_range()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date range: {e}'}), 400
+
+    try:
+        with get_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            days = fare_calendar(cursor, source, destination, start, end)
+            cursor.close()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 400
+
+    return json_response({'source': source, 'destination': destination, 'days': days})
+
+@app.route('/api/flights/cheapest', methods=['GET'])
+def get_cheapest_destinations():
+    """Cheapest local fare per destination from one airport over a date range"""
+    source = (request.args.get('source') or '').upper()
+    if not source:
+        return jsonify({'error': 'source is required'}), 400
+    try:
+        start, end = parse_date_range()
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date range or limit: {e}'}), 400
+
+    try:
+        with get_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True)
+            destinations = cheapest_from(cursor, source, start, end, limit)
+            cursor.close()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 400
+
+    return json_response({
+        'source': source,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'destinations': destinations
+    })
 
 # --- GET BOOKINGS FOR A USER ---
 @app.route('/api/users/<user_id>/bookings', methods=['GET'])
 def get_user_bookings(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    """Newest-first bookings history, one page at a time
+
+    Pages are walked with an opaque ``cursor`` (keyset pagination over the
+    ``(user_id, created_at, id)`` index), so every page costs the same no
+    matter how long the history is. Optional filters: ``status``, ``from`` and
+    ``to`` (booking dates, inclusive).
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), BOOKING_FIELDS)
+    except ValueError as e:
+        return fields_error(e, BOOKING_FIELDS)
+
+    try:
+        limit = min(max(int(request.args.get('limit', BOOKINGS_PAGE_SIZE)), 1), BOOKINGS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    try:
+        if request.args.get('cursor'):
+            created_at, last_id = decode_cursor(request.args['cursor'])
+            conditions.append("(created_at < %s OR (created_at = %s AND id < %s))")
+            params.extend([created_at, created_at, last_id])
+        if request.args.get('from'):
+            conditions.append("created_at >= %s")
+            params.append(datetime.strptime(request.args['from'], '%Y-%m-%d'))
+        if request.args.get('to'):
+            conditions.append("created_at < %s")
+            params.append(datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid cursor or date filter: {e}'}), 400
+    if request.args.get('status'):
+        conditions.append("status = %s")
+        params.append(request.args['status'])
+
+    # Column names come from the whitelist, so they are safe to interpolate;
+    # created_at and id are always read because the next cursor is built from them.
+    # Without fields every column is returned, whichever bookings schema is in use.
+    columns = ', '.join(dict.fromkeys(fields + ['created_at', 'id'])) if fields else '*'
+    query = f"""
+        SELECT {columns} FROM bookings
+        WHERE {' AND '.join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """
+    params.append(limit + 1)
+
     try:
-        cursor.execute("SELECT * FROM bookings WHERE user_id = %s", (user_id,))
-        bookings = cursor.fetchall()
-        return jsonify(bookings)
+        with get_connection(readonly=True, user_key=user_id) as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, params)
+            bookings = cursor.fetchall()
+            cursor.close()
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 400
-    finally:
-        cursor.close()
-        conn.close()
+
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        next_cursor = encode_cursor(bookings[-1]['created_at'], bookings[-1]['id'])
+    if fields:
+        bookings = [{field: booking[field] for field in fields} for booking in bookings]
+
+    return json_response({'bookings': bookings, 'next_cursor': next_cursor})
+
+class FlightSearchError(Exception):
+    """Amadeus search failure carrying the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+def fetch_flight_offers(source, destination, date):
+    """Search Amadeus for one-way offers and return them normalized, cheapest first"""
+    # Get fresh token
+    access_token = get_amadeus_token()
+    if not access_token:
+        raise FlightSearchError('Failed to authenticate with Amadeus API', 500)
+
+    # Search flights using Amadeus API
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+    
+    search_url = f"{AMADEUS_BASE_URL}/v2/shopping/flight-offers"
+    params = {
+        "originLocationCode": source.upper(),
+        "destinationLocationCode": destination.upper(),
+        "departureDate": date,
+        "adults": "1",
+        "children": "0",
+        "infants": "0",
+        "travelClass": "ECONOMY",
+        "nonStop": "false",
+        "currencyCode": "INR",
+        "max": "25"
+    }
+    
+    print(f"Making Amadeus API request to {search_url}")
+    print("Request params:", params)
+    
+    response = requests.get(search_url, headers=headers, params=params)
+    
+    # Log the response for debugging
+    print(f"Amadeus API response status: {response.status_code}")
+    print("Amadeus API response:", response.text[:500])  # Print first 500 chars of response
+    
+    if response.status_code == 401:
+        # Token might be invalid, clear it and try once more
+        token_data["access_token"] = None
+        shared_cache.delete('amadeus:token')
+        access_token = get_amadeus_token()
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+            response = requests.get(search_url, headers=headers, params=params)
+    
+    if response.status_code == 400:
+        error_data = response.json()
+        error_message = error_data.get('errors', [{}])[0].get('detail', 'Invalid request')
+        raise FlightSearchError(f'API Error: {error_message}', 400)
+        
+    response.raise_for_status()
+    flight_data = response.json()
+
+    # Process and format flight results
+    flights = []
+    for offer in flight_data.get('data', []):
+        try:
+            itinerary = offer['itineraries'][0]
+            segment = itinerary['segments'][0]
+            price = float(offer['price']['total'])
+            
+            # Get airline name from dictionaries
+            airline_code = segment['carrierCode']
+            airline_name = flight_data.get('dictionaries', {}).get('carriers', {}).get(airline_code, airline_code)
+            
+            flight = {
+                'airline': airline_name,
+                'flightNumber': f"{airline_code}{segment['number']}",
+                'origin': segment['departure']['iataCode'],
+                'destination': segment['arrival']['iataCode'],
+                'departureTime': segment['departure']['at'],
+                'arrivalTime': segment['arrival']['at'],
+                'duration': itinerary['duration'],
+                'price': price,
+                'currency': offer['price']['currency'],
+                'numberOfStops': segment.get('numberOfStops', 0),
+                'aircraft': flight_data.get('dictionaries', {}).get('aircraft', {}).get(segment['aircraft']['code'], 'Unknown Aircraft'),
+                'cabin': offer['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin']
+            }
+            
+            # Add baggage info if available
+            try:
+                flight['baggage'] = {
+                    'checked': offer['travelerPricings'][0]['fareDetailsBySegment'][0].get('includedCheckedBags', {}),
+                    'cabin': offer['travelerPricings'][0]['fareDetailsBySegment'][0].get('includedCabinBags', {})
+                }
+            except Exception as e:
+                print(f"Warning: Could not get baggage info: {str(e)}")
+                flight['baggage'] = {'checked': {}, 'cabin': {}}
+            
+            flights.append(flight)
+        except Exception as e:
+            print(f"Warning: Error processing flight offer: {str(e)}")
+            continue
+
+    # Sort flights by price
+    flights.sort(key=lambda x: x['price'])
+    return flights
+
+# Offer cache and cheapest-fare calendar shared by searches and the cache warmer
+offer_cache = OfferCache(shared=shared_cache)
+price_calendar = PriceCalendar(shared=shared_cache)
+cache_warmer = CacheWarmer(fetch_flight_offers, offer_cache, price_calendar,
+                           partial(get_connection, readonly=True),
+                           shared=shared_cache)
+
+def search_flights(source, destination, date):
+    """Return normalized offers for a search, served from the offer cache when possible"""
+    offer_cache.record_search(source, destination)
+    flights = offer_cache.get(source, destination, date)
+    if flights is None:
+        flights = fetch_flight_offers(source, destination, date)
+        offer_cache.set(source, destination, date, flights)
+        price_calendar.update(source, destination, date, flights)
+    return flights
 
 @app.route('/api/optimize', methods=['POST', 'OPTIONS'])
 def optimize_route():
@@ -444,107 +1050,22 @@ def optimize_route():
                 'error': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
 
-        # Get fresh token
-        access_token = get_amadeus_token()
-        if not access_token:
-            return jsonify({'error': 'Failed to authenticate with Amadeus API'}), 500
+        try:
+            fields = parse_fields(request.args.get('fields', data.get('fields')), OFFER_FIELDS)
+        except ValueError as e:
+            return fields_error(e, OFFER_FIELDS)
 
-        # Search flights using Amadeus API
-        headers = {
-            "Authorization": f"Bearer {access_token}"
-        }
-        
-        search_url = f"{AMADEUS_BASE_URL}/v2/shopping/flight-offers"
-        params = {
-            "originLocationCode": source.upper(),
-            "destinationLocationCode": destination.upper(),
-            "departureDate": date,
-            "adults": "1",
-            "children": "0",
-            "infants": "0",
-            "travelClass": "ECONOMY",
-            "nonStop": "false",
-            "currencyCode": "INR",
-            "max": "25"
-        }
-        
-        print(f"Making Amadeus API request to {search_url}")
-        print("Request params:", params)
-        
-        response = requests.get(search_url, headers=headers, params=params)
-        
-        # Log the response for debugging
-        print(f"Amadeus API response status: {response.status_code}")
-        print("Amadeus API response:", response.text[:500])  # Print first 500 chars of response
-        
-        if response.status_code == 401:
-            # Token might be invalid, clear it and try once more
-            token_data["access_token"] = None
-            access_token = get_amadeus_token()
-            if access_token:
-                headers["Authorization"] = f"Bearer {access_token}"
-                response = requests.get(search_url, headers=headers, params=params)
-        
-        if response.status_code == 400:
-            error_data = response.json()
-            error_message = error_data.get('errors', [{}])[0].get('detail', 'Invalid request')
-            return jsonify({'error': f'API Error: {error_message}'}), 400
-            
-        response.raise_for_status()
-        flight_data = response.json()
+        flights = search_flights(source, destination, date)
+        if fields:
+            flights = [{field: flight[field] for field in fields if field in flight} for flight in flights]
 
-        if not flight_data.get('data'):
-            return jsonify({
+        if not flights:
+            return json_response({
                 'flights': [],
                 'message': 'No flights found for the specified route and date'
             })
-
-        # Process and format flight results
-        flights = []
-        for offer in flight_data.get('data', []):
-            try:
-                itinerary = offer['itineraries'][0]
-                segment = itinerary['segments'][0]
-                price = float(offer['price']['total'])
-                
-                # Get airline name from dictionaries
-                airline_code = segment['carrierCode']
-                airline_name = flight_data.get('dictionaries', {}).get('carriers', {}).get(airline_code, airline_code)
-                
-                flight = {
-                    'airline': airline_name,
-                    'flightNumber': f"{airline_code}{segment['number']}",
-                    'origin': segment['departure']['iataCode'],
-                    'destination': segment['arrival']['iataCode'],
-                    'departureTime': segment['departure']['at'],
-                    'arrivalTime': segment['arrival']['at'],
-                    'duration': itinerary['duration'],
-                    'price': price,
-                    'currency': offer['price']['currency'],
-                    'numberOfStops': segment.get('numberOfStops', 0),
-                    'aircraft': flight_data.get('dictionaries', {}).get('aircraft', {}).get(segment['aircraft']['code'], 'Unknown Aircraft'),
-                    'cabin': offer['travelerPricings'][0]['fareDetailsBySegment'][0]['cabin']
-                }
-                
-                # Add baggage info if available
-                try:
-                    flight['baggage'] = {
-                        'checked': offer['travelerPricings'][0]['fareDetailsBySegment'][0].get('includedCheckedBags', {}),
-                        'cabin': offer['travelerPricings'][0]['fareDetailsBySegment'][0].get('includedCabinBags', {})
-                    }
-                except Exception as e:
-                    print(f"Warning: Could not get baggage info: {str(e)}")
-                    flight['baggage'] = {'checked': {}, 'cabin': {}}
-                
-                flights.append(flight)
-            except Exception as e:
-                print(f"Warning: Error processing flight offer: {str(e)}")
-                continue
-
-        # Sort flights by price
-        flights.sort(key=lambda x: x['price'])
         
-        return jsonify({
+        return json_response({
             'flights': flights,
             'source': source.upper(),
             'destination': destination.upper(),
@@ -552,6 +1073,8 @@ def optimize_route():
             'total_flights': len(flights)
         })
 
+    except FlightSearchError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except requests.exceptions.RequestException as e:
         print(f"Error fetching flight data: {str(e)}")
         return jsonify({
@@ -565,6 +1088,27 @@ def optimize_route():
             'error': f'Failed to process flight data: {str(e)}'
         }), 500
 
+# --- CHEAPEST FARE CALENDAR ---
+@app.route('/api/price-calendar', methods=['GET'])
+def get_price_calendar():
+    """Cheapest cached fare per day for a route, answered from memory"""
+    source = request.args.get('source', '').upper()
+    destination = request.args.get('destination', '').upper()
+    if not source or not destination:
+        return jsonify({'error': 'source and destination are required'}), 400
+    try:
+        start = datetime.strptime(request.args.get('start', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d')
+        days = min(int(request.args.get('days', 30)), 365)
+    except ValueError:
+        return jsonify({'error': 'start must be YYYY-MM-DD and days a number'}), 400
+
+    dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+    return jsonify({
+        'source': source,
+        'destination': destination,
+        'calendar': price_calendar.get(source, destination, dates)
+    })
+
 @app.route('/test-airports', methods=['GET'])
 def test_airports():
     try:
@@ -589,6 +1133,22 @@ def test_airports():
 
 
 
+# --- OPERATIONAL METRICS ---
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Connection pool and cache statistics of this worker"""
+    return jsonify({
+        'db_pool': pool_stats(),
+        'offer_cache': offer_cache.stats(),
+        'shared_cache': shared_cache.stats(),
+        'seat_holds': seat_holds.stats(),
+        'password_hashing': password_hasher.stats(),
+        'jwt': token_verifier.stats(),
+        'token_revocation': revocation_list.stats(),
+        'profile_cache': profile_cache.stats(),
+        'rate_limits': rate_limiter.stats()
+    })
+
 @app.route('/')
 def home():
     return "<h1>Flight Route Optimizer API is running!</h1><p>Try accessing <a href='/test-airports'>/test-airports</a> to test the airport search.</p>"
@@ -596,6 +1156,13 @@ def home():
 # Add a secret key for JWT
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
 
+# Keep this worker's copy of revoked access tokens current
+revocation_list.start()
+
+# Pre-fetch popular routes during off-peak hours
+if os.getenv('CACHE_WARMER_ENABLED', '0') == '1':
+    cache_warmer.start()
+
 if __name__ == '__main__':
     try:
         # Initialize database
@@ -605,15 +1172,13 @@ if __name__ == '__main__':
         
         # Test database connection
         try:
-            conn = get_db_connection()
-            if conn.is_connected():
+            with get_connection() as conn:
                 print("Successfully connected to MySQL database")
                 cursor = conn.cursor()
                 cursor.execute("SELECT DATABASE();")
                 db_name = cursor.fetchone()[0]
                 print(f"✅ Using database: {db_name}")
                 cursor.close()
-                conn.close()
         except Exception as e:
             print("❌ Error connecting to MySQL:", str(e))
             print("\nPlease check your MySQL server and .env configuration:")
@@ -1,29 +1,94 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 import mysql.connector
-import bcrypt
-import jwt
-import os
 from datetime import datetime, timedelta
 from functools import wraps
+import os
+import uuid
+from db import get_connection, mark_write
+from password_hashing import HashingBusy, password_hasher
+from token_verifier import token_verifier
+from profile_cache import profile_cache
+from rate_limiter import rate_limiter
+from token_revocation import (ACCESS_TOKEN_SECONDS, hash_refresh_token, issue_refresh_token,
+                              revocation_list, revoke_access_token)
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__)
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
+# Only behind a reverse proxy that sets X-Forwarded-For can the header be trusted
+TRUST_PROXY_HEADERS = os.getenv('TRUST_PROXY_HEADERS', '0') == '1'
 
 def generate_token(user_id):
-    """Generate JWT token for authenticated user"""
+    """Generate a short-lived JWT access token for authenticated user"""
+    now = datetime.utcnow()
     payload = {
         'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(days=1)
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + timedelta(seconds=ACCESS_TOKEN_SECONDS)
+    }
+    return token_verifier.issue(payload)
+
+def session_tokens(user_id):
+    """Access token plus a newly stored refresh token for a signed-in user"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        refresh_token = issue_refresh_token(cursor, user_id)
+        conn.commit()
+        cursor.close()
+    return {
+        'token': generate_token(user_id),
+        'refresh_token': refresh_token,
+        'expires_in': ACCESS_TOKEN_SECONDS
     }
-    return jwt.encode(payload, os.getenv('SECRET_KEY', 'your-secret-key'), algorithm='HS256')
+
+def hashing_busy_response():
+    """503 telling the client to retry once the password hashing queue drains"""
+    response = jsonify({'error': 'Too many sign-in attempts right now, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+REGISTRATION_FIELDS = ('name', 'email', 'password', 'mobile')
+PROFILE_FIELDS = ('name', 'email', 'mobile')
+
+def validate_user_fields(data, required=()):
+    """Error message for invalid user fields, or None
+
+    Fields in ``required`` must be present; any other field given is checked too.
+    """
+    for field in required:
+        if field not in data or not data[field]:
+            return f'{field} is required'
+    
+    # Validate email format
+    if 'email' in data and '@' not in str(data['email']):
+        return 'Invalid email format'
+    
+    # Validate mobile format (10 digits)
+    if 'mobile' in data and (not str(data['mobile']).isdigit() or len(str(data['mobile'])) != 10):
+        return 'Mobile number must be 10 digits'
+    
+    # Validate password length
+    if 'password' in data and len(str(data['password'])) < 6:
+        return 'Password must be at least 6 characters long'
+    
+    if 'name' in data and not str(data['name']).strip():
+        return 'name must not be empty'
+    return None
+
+def client_ip():
+    """Address of the caller, as seen by our proxy when TRUST_PROXY_HEADERS is set"""
+    if TRUST_PROXY_HEADERS:
+        # The proxy appends the peer it saw; earlier entries are client supplied
+        return request.access_route[-1]
+    return request.remote_addr
+
+def rate_limited_response(retry_after):
+    """429 telling the client how long to wait"""
+    response = jsonify({'error': 'Too many attempts, please try again later',
+                        'retry_after': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
 
 def token_required(f):
     """Decorator to protect routes that require authentication"""
@@ -38,10 +103,15 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token.split(' ')[1]
                 
-            data = jwt.decode(token, os.getenv('SECRET_KEY', 'your-secret-key'), algorithms=['HS256'])
+            data = token_verifier.verify(token)
             current_user_id = data['user_id']
         except Exception as e:
             return jsonify({'error': 'Invalid token'}), 401
+        
+        if revocation_list.is_revoked(data.get('jti')):
+            return jsonify({'error': 'Token has been revoked'}), 401
+        g.token = token
+        g.token_claims = data
             
         return f(current_user_id, *args, **kwargs)
     return decorated
@@ -49,72 +119,70 @@ def token_required(f):
 @auth_bp.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
+    retry_after = rate_limiter.check(('register_ip', client_ip()))
+    if retry_after:
+        return rate_limited_response(retry_after)
+    
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
     
     # Validate input
-    required_fields = ['name', 'email', 'password', 'mobile']
-    for field in required_fields:
-        if field not in data or not data[field]:
-            return jsonify({'error': f'{field} is required'}), 400
+    error = validate_user_fields(data, REGISTRATION_FIELDS)
+    if error:
+        return jsonify({'error': error}), 400
+    if not isinstance(data['password'], str):
+        return jsonify({'error': 'Password must be a string'}), 400
     
-    # Validate email format
-    if '@' not in data['email']:
-        return jsonify({'error': 'Invalid email format'}), 400
-    
-    # Validate mobile format (10 digits)
-    if not data['mobile'].isdigit() or len(data['mobile']) != 10:
-        return jsonify({'error': 'Mobile number must be 10 digits'}), 400
-    
-    # Validate password length
-    if len(data['password']) < 6:
-        return jsonify({'error': 'Password must be at least 6 characters long'}), 400
-    
-    # Hash password with proper encoding
-    password_bytes = data['password'].encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password_bytes, salt)
+    # Hash password on the hashing pool
+    try:
+        hashed_password = password_hasher.hash(data['password'])
+    except HashingBusy:
+        return hashing_busy_response()
+    except ValueError as e:
+        # bcrypt refuses NUL bytes, and (from bcrypt 5) more than 72 bytes
+        return jsonify({'error': f'Password cannot be used: {e}'}), 400
     
     print("\n=== Registration Attempt ===")
     print(f"Name: {data['name']}")
     print(f"Email: {data['email']}")
     print(f"Mobile: {data['mobile']}")
-    print(f"Hashed password: {hashed_password.decode('utf-8')}")
     
-    conn = None
-    cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check if email or mobile already exists
-        cursor.execute("SELECT id FROM users WHERE email = %s OR mobile = %s", 
-                      (data['email'], data['mobile']))
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
-            print("Registration failed: Email or mobile already exists")
-            return jsonify({'error': 'Email or mobile number already registered'}), 400
-        
-        # Insert new user
-        cursor.execute(
-            """
-            INSERT INTO users (name, email, password, mobile)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (data['name'], data['email'], hashed_password.decode('utf-8'), data['mobile'])
-        )
-        
-        user_id = cursor.lastrowid
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            # Check if email or mobile already exists
+            cursor.execute("SELECT id FROM users WHERE email = %s OR mobile = %s", 
+                          (data['email'], data['mobile']))
+            existing_user = cursor.fetchone()
+            
+            if existing_user:
+                print("Registration failed: Email or mobile already exists")
+                return jsonify({'error': 'Email or mobile number already registered'}), 400
+            
+            # Insert new user
+            cursor.execute(
+                """
+                INSERT INTO users (name, email, password, mobile)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (data['name'], data['email'], hashed_password, data['mobile'])
+            )
+            
+            user_id = cursor.lastrowid
+            conn.commit()
+            cursor.close()
+        # Keep this user's reads (including an immediate login) on the primary
+        mark_write(user_id, data['email'], data['mobile'])
+        profile_cache.invalidate(user_id)
         
         print(f"User registered successfully with ID: {user_id}")
         
-        # Generate token
-        token = generate_token(user_id)
-        
+        # Generate access and refresh tokens
         response_data = {
             'message': 'User registered successfully',
-            'token': token,
+            **session_tokens(user_id),
             'user': {
                 'id': user_id,
                 'name': data['name'],
@@ -126,77 +194,94 @@ def register():
         return jsonify(response_data), 201
         
     except mysql.connector.Error as err:
+        # Uncommitted work is rolled back when the connection returns to the pool
         print("Database error during registration:", err)
-        if conn:
-            conn.rollback()
         return jsonify({'error': 'Database error occurred during registration'}), 500
     except Exception as e:
         print("Unexpected error during registration:", str(e))
-        if conn:
-            conn.rollback()
         return jsonify({'error': 'An error occurred during registration'}), 500
-    finally:
-        if cursor:
+
+# Column names are fixed here, never taken from the request
+LOGIN_QUERIES = {
+    column: f"SELECT id, name, email, mobile, password FROM users WHERE {column} = %s"
+    for column in ('email', 'mobile')
+}
+
+def identifier_column(identifier):
+    """Which unique column a login identifier refers to: 'email', 'mobile' or None"""
+    if '@' in identifier:
+        return 'email'
+    if identifier.isdigit() and len(identifier) == 10:
+        return 'mobile'
+    return None
+
+def rehash_password(user_id, password):
+    """Store a hash at the current cost factor; failures only delay the upgrade"""
+    try:
+        hashed_password = password_hasher.hash(password)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, user_id))
+            conn.commit()
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        password_hasher.record_rehash()
+        print(f"Rehashed password for user {user_id} at cost {password_hasher.rounds}")
+    except (HashingBusy, mysql.connector.Error) as err:
+        print(f"Could not rehash password for user {user_id}: {err}")
 
 @auth_bp.route('/api/auth/login', methods=['POST'])
 def login():
     """Authenticate user and return token"""
     print("\n=== Login Request ===")
     data = request.get_json()
-    print("Login attempt with data:", data)
     
     # Check required fields
-    if not data.get('identifier') or not data.get('password'):
+    if not isinstance(data, dict) or not data.get('identifier') or not data.get('password'):
         print("Missing identifier or password")
         return jsonify({'error': 'Email/Mobile and password are required'}), 400
+    if not isinstance(data['identifier'], str) or not isinstance(data['password'], str):
+        return jsonify({'error': 'Email/Mobile and password must be strings'}), 400
+    
+    # Throttle before any lookup or bcrypt work
+    retry_after = rate_limiter.check(('login_ip', client_ip()),
+                                     ('login_identifier', data['identifier']))
+    if retry_after:
+        return rate_limited_response(retry_after)
     
-    conn = None
-    cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check if identifier is email or mobile
-        query = "SELECT * FROM users WHERE email = %s OR mobile = %s"
-        cursor.execute(query, (data['identifier'], data['identifier']))
-        user = cursor.fetchone()
+        lookup = identifier_column(data['identifier'])
+        if lookup is None:
+            print("Identifier is neither an email nor a mobile number:", data['identifier'])
+            return jsonify({'error': 'Invalid email/mobile or password'}), 401
         
-        print("Found user in database:", user)
+        # Release the connection before the (slow) bcrypt check
+        with get_connection(readonly=True, user_key=data['identifier']) as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            # One equality lookup on the matching unique index
+            cursor.execute(LOGIN_QUERIES[lookup], (data['identifier'],))
+            user = cursor.fetchone()
+            cursor.close()
         
         if not user:
             print("No user found with identifier:", data['identifier'])
             return jsonify({'error': 'Invalid email/mobile or password'}), 401
         
-        # Debug: Print password hashes for verification
-        print("Stored password hash:", user['password'])
-        print("Password type:", type(user['password']))
-        
-        # Verify password - handle both string and bytes for password hash
-        stored_password = user['password'].encode('utf-8') if isinstance(user['password'], str) else user['password']
-        provided_password = data['password'].encode('utf-8')
-        
-        print("Stored password (bytes):", stored_password)
-        print("Provided password (bytes):", provided_password)
-        
-        # First try with the password as is, then try with rehashing if needed
-        if not bcrypt.checkpw(provided_password, stored_password):
-            # If direct check fails, try with rehashing (in case the hash needs updating)
-            if not bcrypt.checkpw(provided_password, stored_password):
-                print("Password verification failed")
-                return jsonify({'error': 'Invalid email/mobile or password'}), 401
+        # Verify password on the hashing pool
+        if not password_hasher.verify(data['password'], user['password']):
+            print("Password verification failed")
+            return jsonify({'error': 'Invalid email/mobile or password'}), 401
         
         print("Password verified successfully")
         
-        # Generate token
-        token = generate_token(user['id'])
-        print("Generated token:", token)
+        # Upgrade hashes created with a lower cost factor while we have the password
+        if password_hasher.needs_rehash(user['password']):
+            rehash_password(user['id'], data['password'])
         
+        # Generate access and refresh tokens
         response_data = {
             'message': 'Login successful',
-            'token': token,
+            **session_tokens(user['id']),
             'user': {
                 'id': user['id'],
                 'name': user['name'],
@@ -208,37 +293,161 @@ def login():
         
         return jsonify(response_data)
         
+    except HashingBusy:
+        return hashing_busy_response()
     except mysql.connector.Error as err:
         print("Database error:", err)
         return jsonify({'error': 'Database error occurred'}), 500
     except Exception as e:
         print("Unexpected error:", str(e))
         return jsonify({'error': 'An error occurred during login'}), 500
-    finally:
-        if cursor:
+
+@auth_bp.route('/api/auth/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    retry_after = rate_limiter.check(('refresh_ip', client_ip()))
+    if retry_after:
+        return rate_limited_response(retry_after)
+    
+    data = request.get_json() or {}
+    if not data.get('refresh_token'):
+        return jsonify({'error': 'refresh_token is required'}), 400
+    if not isinstance(data['refresh_token'], str):
+        return jsonify({'error': 'refresh_token must be a string'}), 400
+    
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, user_id, expires_at, revoked_at FROM refresh_tokens
+                WHERE token_hash = %s FOR UPDATE
+            """, (hash_refresh_token(data['refresh_token']),))
+            stored = cursor.fetchone()
+            
+            if not stored or stored['expires_at'] <= datetime.utcnow():
+                return jsonify({'error': 'Invalid refresh token'}), 401
+            
+            if stored['revoked_at'] is not None:
+                # A rotated token came back: assume it leaked and end every session of the user
+                print(f"Refresh token reuse for user {stored['user_id']}, revoking all sessions")
+                cursor.execute("""
+                    UPDATE refresh_tokens SET revoked_at = UTC_TIMESTAMP()
+                    WHERE user_id = %s AND revoked_at IS NULL
+                """, (stored['user_id'],))
+                conn.commit()
+                return jsonify({'error': 'Invalid refresh token'}), 401
+            
+            cursor.execute("UPDATE refresh_tokens SET revoked_at = UTC_TIMESTAMP() WHERE id = %s", (stored['id'],))
+            user_id = int(stored['user_id']) if stored['user_id'].isdigit() else stored['user_id']
+            refresh_token = issue_refresh_token(cursor, user_id)
+            conn.commit()
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        
+        return jsonify({
+            'token': generate_token(user_id),
+            'refresh_token': refresh_token,
+            'expires_in': ACCESS_TOKEN_SECONDS
+        })
+        
+    except mysql.connector.Error as err:
+        print("Database error during token refresh:", err)
+        return jsonify({'error': 'Database error occurred'}), 500
+
+@auth_bp.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(user_id):
+    """Revoke the current access token and the given refresh token (or all with "all": true)"""
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token') and not isinstance(data['refresh_token'], str):
+        return jsonify({'error': 'refresh_token must be a string'}), 400
+    claims = g.token_claims
+    
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if claims.get('jti'):
+                revoke_access_token(cursor, claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+            if data.get('all'):
+                cursor.execute("""
+                    UPDATE refresh_tokens SET revoked_at = UTC_TIMESTAMP()
+                    WHERE user_id = %s AND revoked_at IS NULL
+                """, (str(user_id),))
+            elif data.get('refresh_token'):
+                cursor.execute("""
+                    UPDATE refresh_tokens SET revoked_at = UTC_TIMESTAMP()
+                    WHERE token_hash = %s AND user_id = %s AND revoked_at IS NULL
+                """, (hash_refresh_token(data['refresh_token']), str(user_id)))
+            conn.commit()
+            cursor.close()
+    except mysql.connector.Error as err:
+        print("Database error during logout:", err)
+        return jsonify({'error': 'Database error occurred'}), 500
+    
+    # Effective at once in this process; other processes pick it up on their next sync
+    if claims.get('jti'):
+        revocation_list.add(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    token_verifier.forget(g.token)
+    return jsonify({'message': 'Logged out'})
 
 @auth_bp.route('/api/auth/me', methods=['GET'])
 @token_required
 def get_current_user(user_id):
-    """Get current user's profile"""
+    """Get current user's profile, from the profile cache when possible"""
+    user = profile_cache.get(user_id)
+    if user is not None:
+        return jsonify(user)
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT id, name, email, mobile FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+        with get_connection(readonly=True, user_key=user_id) as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute("SELECT id, name, email, mobile FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+            cursor.close()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
-            
+        
+        profile_cache.fill(user_id, user)
         return jsonify(user)
         
     except mysql.connector.Error as err:
         return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if 'conn' in locals() and conn.is_connected():
+
+@auth_bp.route('/api/auth/me', methods=['PUT'])
+@token_required
+def update_current_user(user_id):
+    """Update the current user's name, email or mobile"""
+    data = request.get_json() or {}
+    changes = {field: data[field] for field in PROFILE_FIELDS if field in data}
+    if not changes:
+        return jsonify({'error': f'Nothing to update; allowed fields: {", ".join(PROFILE_FIELDS)}'}), 400
+    
+    error = validate_user_fields(changes)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            
+            # Column names come from PROFILE_FIELDS, never from the request
+            assignments = ', '.join(f"{field} = %s" for field in changes)
+            cursor.execute(f"UPDATE users SET {assignments} WHERE id = %s",
+                           list(changes.values()) + [user_id])
+            cursor.execute("SELECT id, name, email, mobile FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+            conn.commit()
             cursor.close()
-            conn.close()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        mark_write(user_id, changes.get('email'), changes.get('mobile'))
+        profile_cache.set(user_id, user)
+        return jsonify(user)
+        
+    except mysql.connector.IntegrityError:
+        return jsonify({'error': 'Email or mobile number already registered'}), 400
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
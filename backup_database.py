@@ -1,44 +1,1067 @@
+"""Backup and restore of the MySQL database.
+
+``backup`` writes one ``mysqldump`` SQL file. ``backup --parallel`` writes a
+backup directory instead:
+
+    database_backups/flight_booking_backup_20261019_020000/
+        schema.sql.zst      tables, without data or triggers (mysqldump)
+        data/<table>.tsv.zst  rows of each table, in LOAD DATA text format
+        routines.sql.zst    triggers, procedures, functions and events
+        manifest.json       sizes, row counts and checksums
+
+Tables are dumped by ``--jobs`` workers. They all start their transaction
+while the tables are briefly locked, so every table is read at the same
+point in time. Each table is streamed through zstd (when the ``zstandard``
+package is installed) or gzip straight into its file. Nothing uncompressed
+is written to disk. The manifest records, per file, the compressed and raw
+size and the SHA-256 of the compressed bytes. Per table it records the row
+count and a checksum of the rows that does not depend on their order.
+
+``backup --incremental`` builds on the newest backup directory. Tables with an
+``updated_at`` column and a delete trigger (``python backup_database.py
+track``) contribute only the rows changed since that backup's snapshot, plus
+the keys deleted since then, recorded in ``backup_tombstones``. Other tables
+are dumped in full, and so is a tracked table whose row count the changes
+cannot explain (e.g. after a TRUNCATE, which fires no delete triggers).
+``restore`` of a backup directory replays the full backup
+and every incremental leading to it. Tables are loaded in parallel, with
+foreign key checks off and secondary indexes rebuilt after the load. The
+result is then checked against the manifest.
+"""
+import gzip
+import io
+import json
+import multiprocessing
 import os
+import queue
+import re
+import shutil
 import subprocess
 import datetime
+import hashlib
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from db import connect, db_config
+
+import mysql.connector
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Load environment variables
 load_dotenv()
 
+BACKUP_DIR = 'database_backups'
+MANIFEST_FILE = 'manifest.json'
+FETCH_BATCH_SIZE = 5000
+PROGRESS_SECONDS = 5
+LOAD_BATCH_SIZE = 1000
+EXTENSIONS = {'zstd': 'zst', 'gzip': 'gz'}
+UNESCAPE = re.compile(r'\\(.)')
+UNESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '0': '\0'}
+
+# Incremental backups re-read this much before the previous snapshot, for
+# rows whose transaction set updated_at before it but committed after it
+INCREMENTAL_LAG_SECONDS = 60
+TOMBSTONES_TABLE = 'backup_tombstones'
+TOMBSTONES_SQL = f"""
+CREATE TABLE IF NOT EXISTS {TOMBSTONES_TABLE} (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    row_id VARCHAR(64) NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_backup_tombstones_deleted (deleted_at)
+)
+"""
+
+
+def client_args(config):
+    """Connection options for the mysql and mysqldump command line clients"""
+    return [
+        f'--host={config["host"]}',
+        f'--port={config["port"]}',
+        f'--user={config["user"]}',
+        f'--password={config["password"]}'
+    ]
+
+
+def default_compression():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+class CompressedWriter:
+    """Compresses a byte stream into a file, hashing and counting as it goes"""
+
+    def __init__(self, path, compression):
+        if compression == 'zstd':
+            if zstandard is None:
+                raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            # wbits=31 produces a gzip member that gunzip and gzip.open read
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self.path = path
+        self._file = open(path, 'wb')
+        self._sha256 = hashlib.sha256()
+        self.raw_bytes = 0
+        self.bytes = 0
+
+    def _emit(self, chunk):
+        if chunk:
+            self._sha256.update(chunk)
+            self._file.write(chunk)
+            self.bytes += len(chunk)
+
+    def write(self, data):
+        self.raw_bytes += len(data)
+        self._emit(self._compressor.compress(data))
+
+    def close(self):
+        """Finish the file and return its manifest entry"""
+        self._emit(self._compressor.flush())
+        self._file.close()
+        return {
+            'file': os.path.basename(self.path),
+            'bytes': self.bytes,
+            'raw_bytes': self.raw_bytes,
+            'sha256': self._sha256.hexdigest()
+        }
+
+
+def encode_value(value):
+    """One field in LOAD DATA's default text format (tab separated, backslash escaped)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    elif isinstance(value, set):
+        value = ','.join(sorted(value))
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0'))
+
+
+def encode_row(row):
+    return '\t'.join(encode_value(value) for value in row) + '\n'
+
+
+class RowChecksum:
+    """Order-independent checksum of a table's rows
+
+    The sum of the rows' truncated SHA-256 digests, so a restored table can be
+    checked however its rows are read back.
+    """
+    MODULUS = 1 << 128
+
+    def __init__(self):
+        self.value = 0
+
+    def add(self, line):
+        digest = hashlib.sha256(line.encode('utf-8')).digest()
+        self.value = (self.value + int.from_bytes(digest[:16], 'big')) % self.MODULUS
+
+    def hexdigest(self):
+        return f"{self.value:032x}"
+
+
+class Progress:
+    """Counters shared by the dump workers, printed every few seconds"""
+
+    def __init__(self, tables, estimated_rows):
+        self.tables = tables
+        self.estimated_rows = estimated_rows
+        self.tables_done = 0
+        self.rows = 0
+        self.raw_bytes = 0
+        self.bytes = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._report, daemon=True)
+
+    def add(self, rows, raw_bytes, written_bytes):
+        with self._lock:
+            self.rows += rows
+            self.raw_bytes += raw_bytes
+            self.bytes += written_bytes
+
+    def table_done(self):
+        with self._lock:
+            self.tables_done += 1
+
+    def line(self):
+        elapsed = time.time() - self.started or 1e-9
+        with self._lock:
+            percent = f" (~{min(self.rows / self.estimated_rows, 1) * 100:.0f}%)" if self.estimated_rows else ''
+            return (f"  {self.tables_done}/{self.tables} tables, {self.rows:,} rows{percent}, "
+                    f"{self.raw_bytes / 1048576:,.1f} MB dumped to {self.bytes / 1048576:,.1f} MB, "
+                    f"{self.raw_bytes / 1048576 / elapsed:,.1f} MB/s, {self.rows / elapsed:,.0f} rows/s")
+
+    def _report(self):
+        while not self._stop.wait(PROGRESS_SECONDS):
+            print(self.line())
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def dump_to_file(cmd, path, compression):
+    """Run a command and compress its stdout into ``path``"""
+    writer = CompressedWriter(path, compression)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        for chunk in iter(lambda: process.stdout.read(1 << 20), b''):
+            writer.write(chunk)
+    finally:
+        entry = writer.close()
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd[0])
+    return entry
+
+
+def list_tables(cursor):
+    """Base tables with their estimated rows, largest first"""
+    cursor.execute("""
+        SELECT TABLE_NAME, COALESCE(TABLE_ROWS, 0), COALESCE(DATA_LENGTH, 0)
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' AND TABLE_NAME != %s
+        ORDER BY DATA_LENGTH DESC, TABLE_NAME
+    """, (TOMBSTONES_TABLE,))
+    return [(name, rows) for name, rows, _ in cursor.fetchall()]
+
+
+def table_columns(cursor, table):
+    """Columns that hold data; generated columns are recomputed on load"""
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND EXTRA NOT LIKE '%%GENERATED%%'
+        ORDER BY ORDINAL_POSITION
+    """, (table,))
+    return [name for (name,) in cursor.fetchall()]
+
+
+def trackable_tables(cursor):
+    """Tables with an ``updated_at`` column and a one-column primary key, mapped to that key"""
+    cursor.execute("""
+        SELECT k.TABLE_NAME, MIN(k.COLUMN_NAME), COUNT(*)
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
+        JOIN INFORMATION_SCHEMA.COLUMNS c
+            ON c.TABLE_SCHEMA = k.TABLE_SCHEMA AND c.TABLE_NAME = k.TABLE_NAME
+            AND c.COLUMN_NAME = 'updated_at'
+        WHERE k.TABLE_SCHEMA = DATABASE() AND k.CONSTRAINT_NAME = 'PRIMARY'
+        GROUP BY k.TABLE_NAME
+    """)
+    return {table: key for table, key, columns in cursor.fetchall()
+            if columns == 1 and table != TOMBSTONES_TABLE}
+
+
+def tombstone_trigger(table):
+    return f"{table}_backup_tombstone"
+
+
+def tracked_tables(cursor):
+    """Trackable tables whose deletes are currently recorded as tombstones"""
+    cursor.execute("""
+        SELECT EVENT_OBJECT_TABLE, TRIGGER_NAME FROM INFORMATION_SCHEMA.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_MANIPULATION = 'DELETE'
+    """)
+    triggers = {(table, name) for table, name in cursor.fetchall()}
+    return {table: key for table, key in trackable_tables(cursor).items()
+            if (table, tombstone_trigger(table)) in triggers}
+
+
+def install_change_tracking(cursor):
+    """Prepare every trackable table for incremental backups
+
+    Adds an ``updated_at`` index so changed rows are found without a table
+    scan, and an AFTER DELETE trigger that records deleted keys in
+    ``backup_tombstones``. Rows removed by ``ON DELETE CASCADE`` do not fire
+    triggers; a restore repeats the cascade instead.
+    """
+    cursor.execute(TOMBSTONES_SQL)
+    tables = trackable_tables(cursor)
+    for table, key in tables.items():
+        cursor.execute("""
+            SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            AND COLUMN_NAME = 'updated_at' AND SEQ_IN_INDEX = 1
+            LIMIT 1
+        """, (table,))
+        if not cursor.fetchone():
+            print(f"Adding index idx_{table}_updated_at on {table} (updated_at)...")
+            cursor.execute(f"ALTER TABLE `{table}` ADD INDEX `idx_{table}_updated_at` (updated_at)")
+        trigger = tombstone_trigger(table)
+        cursor.execute(f"DROP TRIGGER IF EXISTS `{trigger}`")
+        cursor.execute(f"""
+            CREATE TRIGGER `{trigger}` AFTER DELETE ON `{table}`
+            FOR EACH ROW
+                INSERT INTO {TOMBSTONES_TABLE} (table_name, row_id) VALUES ('{table}', OLD.`{key}`)
+        """)
+    return tables
+
+
+def latest_backup(database):
+    """Path and manifest of the newest backup directory of ``database``, or (None, None)"""
+    latest = (None, None)
+    if not os.path.isdir(BACKUP_DIR):
+        return latest
+    for name in os.listdir(BACKUP_DIR):
+        path = os.path.join(BACKUP_DIR, name)
+        if not os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            continue
+        manifest = read_manifest(path)
+        if manifest['database'] == database and (
+                latest[1] is None or manifest['snapshot_at'] > latest[1]['snapshot_at']):
+            latest = (path, manifest)
+    return latest
+
+
+def open_snapshot(jobs, tables):
+    """``jobs`` connections whose transactions all see the same moment
+
+    The snapshots are started while writes are blocked, with FLUSH TABLES
+    WITH READ LOCK or, lacking the RELOAD privilege, LOCK TABLES ... READ.
+    Returns the connections, the server time of the snapshot and whether it
+    is consistent across tables.
+    """
+    lock_conn = connect()
+    lock_cursor = lock_conn.cursor()
+    consistent = True
+    try:
+        lock_cursor.execute("FLUSH TABLES WITH READ LOCK")
+    except mysql.connector.Error:
+        try:
+            lock_cursor.execute("LOCK TABLES " + ', '.join(f"`{table}` READ" for table in tables))
+        except mysql.connector.Error as err:
+            print(f"Warning: could not lock tables ({err}); each worker will see its own snapshot")
+            consistent = False
+
+    connections = []
+    try:
+        for _ in range(jobs):
+            conn = connect()
+            connections.append(conn)
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+            cursor.close()
+        cursor = connections[0].cursor()
+        cursor.execute("SELECT NOW()")
+        snapshot_at = cursor.fetchone()[0]
+        cursor.close()
+    except mysql.connector.Error:
+        for conn in connections:
+            conn.close()
+        raise
+    finally:
+        lock_cursor.execute("UNLOCK TABLES")
+        lock_cursor.close()
+        lock_conn.close()
+    return connections, snapshot_at, consistent
+
+
+def dump_table(conn, table, columns, data_dir, compression, progress, since=None):
+    """Stream one table into ``data/<table>.tsv.<ext>``; returns its manifest entry
+
+    With ``since``, only rows whose ``updated_at`` is at or after it are
+    written, and the table's full row count is recorded separately.
+    """
+    started = time.time()
+    path = os.path.join(data_dir, f"{table}.tsv.{EXTENSIONS[compression]}")
+    writer = CompressedWriter(path, compression)
+    checksum = RowChecksum()
+    rows = 0
+    cursor = conn.cursor()
+    sql = f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM `{table}`"
+    if since is None:
+        cursor.execute(sql)
+    else:
+        cursor.execute(sql + " WHERE updated_at >= %s", (since,))
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        lines = [encode_row(row) for row in batch]
+        for line in lines:
+            checksum.add(line)
+        raw, written = writer.raw_bytes, writer.bytes
+        writer.write(''.join(lines).encode('utf-8'))
+        rows += len(batch)
+        progress.add(len(batch), writer.raw_bytes - raw, writer.bytes - written)
+    cursor.close()
+
+    entry = writer.close()
+    entry.update({
+        'file': os.path.join('data', entry['file']),
+        'mode': 'full' if since is None else 'changes',
+        'columns': columns,
+        'rows': rows,
+        'checksum': checksum.hexdigest()
+    })
+    if since is None:
+        entry['table_rows'] = rows
+    else:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+        entry['table_rows'] = cursor.fetchone()[0]
+        cursor.close()
+    entry['seconds'] = round(time.time() - started, 3)
+    progress.table_done()
+    return entry
+
+
+def dump_tombstones(conn, path, compression, tables, since):
+    """Write the keys deleted from ``tables`` since ``since``, oldest first"""
+    writer = CompressedWriter(path, compression)
+    rows = 0
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT table_name, row_id FROM {TOMBSTONES_TABLE}
+        WHERE deleted_at >= %s ORDER BY id
+    """, (since,))
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        batch = [row for row in batch if row[0] in tables]
+        writer.write(''.join(encode_row(row) for row in batch).encode('utf-8'))
+        rows += len(batch)
+    cursor.close()
+    entry = writer.close()
+    entry['rows'] = rows
+    return entry
+
+
+def tombstone_counts(conn, since):
+    """Distinct keys deleted since ``since``, per table"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT table_name, COUNT(DISTINCT row_id) FROM {TOMBSTONES_TABLE}
+        WHERE deleted_at >= %s GROUP BY table_name
+    """, (since,))
+    counts = dict(cursor.fetchall())
+    cursor.close()
+    return counts
+
+
+def unexplained_counts(base, entries, deleted):
+    """Tables dumped as changes whose current row count the changes cannot explain
+
+    Every row present now was in the base backup or is a changed row, and at
+    most the tombstoned keys can have gone, so
+
+        base rows - deleted keys <= rows now <= base rows + changed rows
+
+    Rows removed without a tombstone (TRUNCATE, or a delete while the trigger
+    was missing) break this, and replaying the changes would resurrect them.
+    """
+    tables = []
+    for table, entry in entries.items():
+        if entry['mode'] != 'changes':
+            continue
+        base_rows = base['tables'][table]['table_rows']
+        if not base_rows - deleted.get(table, 0) <= entry['table_rows'] <= base_rows + entry['rows']:
+            tables.append(table)
+    return tables
+
+
+def run_dump_workers(connections, plan, data_dir, compression, progress):
+    """Dump the ``(table, columns, since)`` plan with one thread per snapshot connection"""
+    pending = queue.Queue()
+    for task in plan:
+        pending.put(task)
+    entries = {}
+    errors = []
+
+    def worker(conn):
+        while not errors:
+            try:
+                table, columns, since = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                entries[table] = dump_table(conn, table, columns, data_dir, compression, progress, since)
+                entry = entries[table]
+                print(f"  {table}: {entry['rows']:,} {'changed ' if since is not None else ''}rows, "
+                      f"{entry['raw_bytes'] / 1048576:,.1f} MB -> {entry['bytes'] / 1048576:,.1f} MB "
+                      f"in {entry['seconds']:.1f}s")
+            except Exception as e:
+                errors.append((table, e))
+
+    threads = [threading.Thread(target=worker, args=(conn,)) for conn in connections]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        table, error = errors[0]
+        raise RuntimeError(f"dumping {table} failed: {error}")
+    return entries
+
+
+def plan_incremental(base, columns, tracked, lag):
+    """``(table, columns, since)`` per table for an incremental backup on top of ``base``
+
+    Tables whose deletes were tracked since the base backup are dumped from
+    ``lag`` seconds before its snapshot on (for transactions that were still
+    committing); the others are dumped in full.
+    """
+    if set(columns) != set(base['tables']) or any(
+            columns[table] != base['tables'][table]['columns'] for table in columns):
+        raise ValueError("the schema changed since the previous backup; run a full backup")
+    since = (datetime.datetime.fromisoformat(base['snapshot_at'])
+             - datetime.timedelta(seconds=lag)).strftime('%Y-%m-%d %H:%M:%S')
+    plan = []
+    for table, table_columns in columns.items():
+        incremental = table in tracked and tracked[table] == base.get('tracked', {}).get(table)
+        plan.append((table, table_columns, since if incremental else None))
+    return plan, since
+
+
+def backup_parallel(jobs=4, compression=None, incremental=False, lag=INCREMENTAL_LAG_SECONDS):
+    """Dump the database into a compressed backup directory with a manifest
+
+    An incremental backup only holds the rows changed since the newest
+    existing backup (its base) and the keys deleted since then.
+    """
+    config = db_config()
+    compression = compression or default_compression()
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    kind = 'incremental' if incremental else 'backup'
+    backup_path = os.path.join(BACKUP_DIR, f"{config['database']}_{kind}_{timestamp}")
+    data_dir = os.path.join(backup_path, 'data')
+    ext = EXTENSIONS[compression]
+    connections = []
+    started = time.time()
+
+    try:
+        base_path, base = latest_backup(config['database']) if incremental else (None, None)
+        if incremental and base is None:
+            raise ValueError("no previous backup directory to build on; run a full backup first")
+
+        conn = connect()
+        cursor = conn.cursor()
+        tables = list_tables(cursor)
+        columns = {name: table_columns(cursor, name) for name, _ in tables}
+        tracked = tracked_tables(cursor)
+        cursor.close()
+        conn.close()
+        names = [name for name, _ in tables]
+        if incremental:
+            plan, since = plan_incremental(base, columns, tracked, lag)
+        else:
+            plan, since = [(name, columns[name], None) for name in names], None
+
+        os.makedirs(data_dir)
+        print(f"Backing up database '{config['database']}' to {backup_path} "
+              f"({jobs} jobs, {compression}{f', changes since {since}' if since else ''})...")
+
+        schema = dump_to_file(
+            ['mysqldump'] + client_args(config) +
+            ['--no-data', '--skip-triggers', config['database']],
+            os.path.join(backup_path, f"schema.sql.{ext}"), compression
+        )
+
+        connections, snapshot_at, consistent = open_snapshot(min(jobs, len(names)) or 1, names)
+        progress = Progress(len(names), sum(rows for _, rows in tables))
+        progress.start()
+        try:
+            entries = run_dump_workers(connections, plan, data_dir, compression, progress)
+        finally:
+            progress.stop()
+        print(progress.line())
+
+        tombstones = None
+        if incremental:
+            # Still inside the snapshot, so a full dump matches the other tables
+            for table in unexplained_counts(base, entries, tombstone_counts(connections[0], since)):
+                entry = entries[table]
+                print(f"  {table}: {entry['table_rows']:,} rows cannot be explained by the changes "
+                      f"since {base['snapshot_at']} (TRUNCATE?); dumping it in full")
+                progress.add(-entry['rows'], -entry['raw_bytes'], -entry['bytes'])
+                entries[table] = dump_table(connections[0], table, columns[table], data_dir,
+                                            compression, progress)
+            changed = {table for table, entry in entries.items() if entry['mode'] == 'changes'}
+            tombstones = dump_tombstones(connections[0], os.path.join(backup_path, f"tombstones.tsv.{ext}"),
+                                         compression, changed, since)
+            print(f"  {tombstones['rows']:,} deleted rows")
+
+        routines = dump_to_file(
+            ['mysqldump'] + client_args(config) +
+            ['--no-data', '--no-create-info', '--no-create-db', '--routines', '--triggers',
+             '--events', '--add-drop-trigger', config['database']],
+            os.path.join(backup_path, f"routines.sql.{ext}"), compression
+        )
+
+        files = [schema, routines] + ([tombstones] if tombstones else [])
+        manifest = {
+            'format': 1,
+            'type': 'incremental' if incremental else 'full',
+            'database': config['database'],
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'snapshot_at': str(snapshot_at),
+            'consistent': consistent,
+            'base': os.path.basename(base_path) if base_path else None,
+            'since': since,
+            'compression': compression,
+            'jobs': jobs,
+            'seconds': round(time.time() - started, 3),
+            'schema': schema,
+            'routines': routines,
+            'tombstones': tombstones,
+            'tracked': tracked,
+            'tables': {name: entries[name] for name in names},
+            'totals': {
+                'rows': progress.rows,
+                'raw_bytes': progress.raw_bytes + sum(entry['raw_bytes'] for entry in files),
+                'bytes': progress.bytes + sum(entry['bytes'] for entry in files)
+            }
+        }
+        with open(os.path.join(backup_path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        if not incremental and tracked:
+            # Deletes before this snapshot are part of it; later incrementals start from here
+            connections[0].rollback()
+            cursor = connections[0].cursor()
+            cursor.execute(f"DELETE FROM {TOMBSTONES_TABLE} WHERE deleted_at < %s - INTERVAL %s SECOND",
+                           (snapshot_at, lag))
+            connections[0].commit()
+            cursor.close()
+
+        totals = manifest['totals']
+        print(f"Backup completed successfully: {backup_path}")
+        print(f"{totals['rows']:,} rows, {totals['raw_bytes'] / 1048576:,.1f} MB compressed to "
+              f"{totals['bytes'] / 1048576:,.1f} MB in {manifest['seconds']:.1f}s")
+        return backup_path
+
+    except (subprocess.CalledProcessError, mysql.connector.Error, RuntimeError, OSError, ValueError) as e:
+        print(f"Error backing up database: {e}")
+        # A directory without a manifest is not a usable backup
+        if os.path.isdir(backup_path) and not os.path.exists(os.path.join(backup_path, MANIFEST_FILE)):
+            shutil.rmtree(backup_path)
+        return None
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+class HashingReader:
+    """File wrapper that hashes the raw bytes as they are read"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self.sha256.update(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self._file.close()
+
+
+def open_compressed(path, reader=None):
+    """Text stream over a compressed backup file, read through ``reader`` if given"""
+    raw = reader or open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError(f"{path} needs the zstandard package (pip install zstandard)")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True),
+                                encoding='utf-8', newline='\n')
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode='rb'), encoding='utf-8', newline='\n')
+
+
+def decode_value(field):
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    return UNESCAPE.sub(lambda match: UNESCAPES.get(match.group(1), match.group(1)), field)
+
+
+def decode_row(line):
+    return [decode_value(field) for field in line.rstrip('\n').split('\t')]
+
+
+def check_sha256(path, reader, expected):
+    # Drain anything the decompressor left unread, e.g. the gzip trailer
+    while reader.read(1 << 20):
+        pass
+    if reader.sha256.hexdigest() != expected:
+        raise ValueError(f"{path} does not match the SHA-256 in the manifest")
+
+
+def pipe_sql(path, config, sha256=None):
+    """Run a compressed SQL file through the mysql client"""
+    cmd = ['mysql'] + client_args(config) + [config['database']]
+    reader = HashingReader(path)
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        with open_compressed(path, reader) as f:
+            for chunk in iter(lambda: f.read(1 << 20), ''):
+                process.stdin.write(chunk.encode('utf-8'))
+            if sha256:
+                check_sha256(path, reader, sha256)
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, 'mysql')
+
+
+def load_table(conn, table, columns, path, replace=False, key=None, sha256=None):
+    """Insert (or with ``replace``, upsert) the rows of a data file
+
+    Returns the number of rows and, when ``key`` is given, the set of its
+    values. Raises ``ValueError`` if the file does not match ``sha256``.
+    """
+    verb = 'REPLACE' if replace else 'INSERT'
+    sql = (f"{verb} INTO `{table}` ({', '.join(f'`{column}`' for column in columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    key_index = columns.index(key) if key else None
+    keys = set()
+    rows = 0
+    cursor = conn.cursor()
+    cursor.execute("SET foreign_key_checks = 0, unique_checks = 0")
+    reader = HashingReader(path)
+    batch = []
+    with open_compressed(path, reader) as f:
+        for line in f:
+            row = decode_row(line)
+            batch.append(row)
+            if key_index is not None:
+                keys.add(row[key_index])
+            if len(batch) >= LOAD_BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                rows += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            rows += len(batch)
+        if sha256:
+            check_sha256(path, reader, sha256)
+    cursor.close()
+    return rows, keys
+
+
+def apply_tombstones(conn, path, tables, keep):
+    """Delete the rows recorded as deleted, except keys present again in ``keep``
+
+    Foreign key checks stay on so that ``ON DELETE CASCADE`` removes the same
+    child rows it removed originally.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SET foreign_key_checks = 1")
+    deleted = 0
+    run_table, run = None, []
+
+    def flush():
+        nonlocal deleted
+        if run:
+            cursor.execute(f"DELETE FROM `{run_table}` WHERE `{tables[run_table]}` IN "
+                           f"({', '.join(['%s'] * len(run))})", run)
+            deleted += cursor.rowcount
+            conn.commit()
+
+    # Consecutive deletes from one table go together; the order across tables is kept
+    with open_compressed(path) as f:
+        for line in f:
+            table, row_id = decode_row(line)
+            if row_id in keep.get(table, ()):
+                continue
+            if table != run_table or len(run) >= LOAD_BATCH_SIZE:
+                flush()
+                run_table, run = table, []
+            run.append(row_id)
+    flush()
+    cursor.close()
+    return deleted
+
+
+def secondary_indexes(cursor, table):
+    """Non-unique, column-based secondary indexes as ``{name: index definition}``"""
+    cursor.execute("""
+        SELECT INDEX_NAME, INDEX_TYPE, COLUMN_NAME, SUB_PART, COLLATION
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 1
+        AND INDEX_NAME NOT IN (
+            SELECT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME IS NULL
+        )
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table, table))
+    parts = {}
+    kinds = {}
+    for name, index_type, column, sub_part, collation in cursor.fetchall():
+        part = f"`{column}`" + (f"({sub_part})" if sub_part else '') + (' DESC' if collation == 'D' else '')
+        parts.setdefault(name, []).append(part)
+        kinds[name] = index_type
+    return {name: f"{kinds[name] + ' ' if kinds[name] in ('FULLTEXT', 'SPATIAL') else ''}INDEX `{name}` "
+                  f"({', '.join(columns)})"
+            for name, columns in parts.items()}
+
+
+def drop_secondary_indexes(table):
+    """Drop the secondary indexes of an (empty) table; returns the ones to rebuild
+
+    Indexes that a foreign key needs cannot be dropped and stay in place.
+    """
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        dropped = []
+        for name, definition in secondary_indexes(cursor, table).items():
+            try:
+                cursor.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+                dropped.append(definition)
+            except mysql.connector.Error as err:
+                if err.errno != 1553:  # needed in a foreign key constraint
+                    raise
+        cursor.close()
+        return table, dropped
+    finally:
+        conn.close()
+
+
+def add_indexes(task):
+    """Rebuild a table's dropped indexes, all in one ALTER TABLE where possible"""
+    table, definitions = task
+    started = time.time()
+    try:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            # InnoDB builds one FULLTEXT index per statement; the others go together
+            fulltext = [definition for definition in definitions if definition.startswith('FULLTEXT')]
+            regular = [definition for definition in definitions if definition not in fulltext]
+            for group in ([regular] if regular else []) + [[definition] for definition in fulltext]:
+                cursor.execute(f"ALTER TABLE `{table}` " + ', '.join(f"ADD {definition}" for definition in group))
+            cursor.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        raise RuntimeError(f"rebuilding the indexes of {table} failed: {e}")
+    return table, time.time() - started
+
+
+def load_task(task):
+    """Load one data file in a worker process"""
+    table, columns, path, replace, key, sha256 = task
+    started = time.time()
+    try:
+        conn = connect()
+        try:
+            rows, keys = load_table(conn, table, columns, path, replace=replace, key=key, sha256=sha256)
+        finally:
+            conn.close()
+    except Exception as e:
+        # Connector errors do not survive the trip back from the worker process
+        raise RuntimeError(f"loading {table} failed: {e}")
+    return table, rows, keys, time.time() - started
+
+
+def verify_task(task):
+    """Row count, and row checksum if one is expected, of a restored table"""
+    table, columns, expected_rows, expected_checksum = task
+    try:
+        conn = connect()
+    except Exception as e:
+        raise RuntimeError(f"verifying {table} failed: {e}")
+    try:
+        cursor = conn.cursor()
+        if expected_checksum is None:
+            cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+            rows, checksum = cursor.fetchone()[0], None
+        else:
+            checksum = RowChecksum()
+            rows = 0
+            cursor.execute(f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM `{table}`")
+            while True:
+                batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    checksum.add(encode_row(row))
+                rows += len(batch)
+            checksum = checksum.hexdigest()
+        cursor.close()
+    finally:
+        conn.close()
+    problems = []
+    if rows != expected_rows:
+        problems.append(f"{rows:,} rows, expected {expected_rows:,}")
+    if expected_checksum is not None and checksum != expected_checksum:
+        problems.append("row checksum differs")
+    return table, rows, problems
+
+
+def backup_chain(backup_path):
+    """The full backup and the incrementals leading to ``backup_path``, oldest first"""
+    chain = [(backup_path, read_manifest(backup_path))]
+    while chain[0][1]['type'] == 'incremental':
+        base_path = os.path.join(os.path.dirname(os.path.abspath(backup_path)), chain[0][1]['base'])
+        if not os.path.isfile(os.path.join(base_path, MANIFEST_FILE)):
+            raise ValueError(f"{chain[0][0]} builds on {chain[0][1]['base']}, which is missing")
+        chain.insert(0, (base_path, read_manifest(base_path)))
+    return chain
+
+
+def restore_backup(backup_path, jobs=4, defer_indexes=True, verify=True):
+    """Rebuild the database from a backup directory and the backups it builds on
+
+    Tables are loaded by ``jobs`` worker processes with foreign key and
+    unique checks off. Secondary indexes are dropped before the load and
+    rebuilt after it, one ALTER TABLE per table. The result is checked
+    against the last manifest's row counts and, for tables it holds in full,
+    row checksums.
+    """
+    config = db_config()
+    timings = {}
+    pool = None
+    conn = None
+
+    def phase(name, started):
+        timings[name] = time.time() - started
+        print(f"  {name}: {timings[name]:.1f}s")
+
+    try:
+        chain = backup_chain(backup_path)
+        print(f"Restoring database '{config['database']}' from "
+              + ' + '.join(os.path.basename(path) for path, _ in chain) + f" ({jobs} jobs)...")
+        # Fork keeps the workers from re-importing this module
+        context = (multiprocessing.get_context('fork')
+                   if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing)
+        pool = context.Pool(jobs)
+        full_path, full = chain[0]
+        last_path, last = chain[-1]
+
+        started = time.time()
+        pipe_sql(os.path.join(full_path, full['schema']['file']), config, full['schema']['sha256'])
+        phase('schema', started)
+
+        deferred = []
+        if defer_indexes:
+            started = time.time()
+            with ThreadPoolExecutor(jobs) as executor:
+                deferred = [(table, definitions) for table, definitions in
+                            executor.map(drop_secondary_indexes, full['tables']) if definitions]
+            phase('drop indexes', started)
+            print(f"    {sum(len(definitions) for _, definitions in deferred)} secondary indexes deferred")
+
+        conn = connect()
+        for path, manifest in chain:
+            started = time.time()
+            incremental = manifest['type'] == 'incremental'
+            tasks = []
+            for table, entry in manifest['tables'].items():
+                changes = entry['mode'] == 'changes'
+                if incremental and not changes:
+                    cursor = conn.cursor()
+                    cursor.execute("SET foreign_key_checks = 0")
+                    cursor.execute(f"DELETE FROM `{table}`")
+                    conn.commit()
+                    cursor.close()
+                tasks.append((table, entry['columns'], os.path.join(path, entry['file']), changes,
+                              manifest['tracked'].get(table) if changes else None, entry['sha256']))
+            keys = {}
+            rows_loaded = 0
+            for table, rows, table_keys, seconds in pool.imap_unordered(load_task, tasks):
+                keys[table] = table_keys
+                rows_loaded += rows
+                print(f"    {table}: {rows:,} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+            if manifest.get('tombstones'):
+                deleted = apply_tombstones(conn, os.path.join(path, manifest['tombstones']['file']),
+                                           manifest['tracked'], keys)
+                print(f"    {deleted:,} deleted rows removed")
+            phase(f"load {os.path.basename(path)}", started)
+            print(f"    {rows_loaded / timings[f'load {os.path.basename(path)}']:,.0f} rows/s overall")
+
+        if deferred:
+            started = time.time()
+            for table, seconds in pool.imap_unordered(add_indexes, deferred):
+                print(f"    {table}: indexes rebuilt in {seconds:.1f}s")
+            phase('build indexes', started)
+
+        started = time.time()
+        pipe_sql(os.path.join(last_path, last['routines']['file']), config, last['routines']['sha256'])
+        phase('routines', started)
+
+        failures = []
+        if verify:
+            started = time.time()
+            tasks = [(table, entry['columns'], entry.get('table_rows', entry['rows']),
+                      entry['checksum'] if entry.get('mode', 'full') == 'full' else None)
+                     for table, entry in last['tables'].items()]
+            for table, rows, problems in pool.imap_unordered(verify_task, tasks):
+                if problems:
+                    failures.append(f"{table}: {', '.join(problems)}")
+            phase('verify', started)
+
+        print("Phase timings: " + ', '.join(f"{name} {seconds:.1f}s" for name, seconds in timings.items())
+              + f", total {sum(timings.values()):.1f}s")
+        if failures:
+            print("Restored database does not match the backup:")
+            for failure in failures:
+                print(f"  {failure}")
+            return False
+        print("Database restored successfully!" + (" Row counts and checksums verified." if verify else ''))
+        return True
+
+    except (subprocess.CalledProcessError, mysql.connector.Error, RuntimeError, OSError, ValueError) as e:
+        print(f"Error restoring database: {e}")
+        return False
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if conn and conn.is_connected():
+            conn.close()
+
+
+def read_manifest(backup_path):
+    with open(os.path.join(backup_path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
 def backup_database():
     """Backup the MySQL database to a SQL file"""
     # Get database configuration from environment variables
-    db_config = {
-        'host': os.getenv('MYSQL_HOST', 'localhost'),
-        'user': os.getenv('MYSQL_USER', 'root'),
-        'password': os.getenv('MYSQL_PASSWORD', ''),
-        'database': os.getenv('MYSQL_DB', 'flight_booking')
-    }
+    config = db_config()
     
     # Create backups directory if it doesn't exist
-    backup_dir = 'database_backups'
-    os.makedirs(backup_dir, exist_ok=True)
+    os.makedirs(BACKUP_DIR, exist_ok=True)
     
     # Generate backup filename with timestamp
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = os.path.join(backup_dir, f"{db_config['database']}_backup_{timestamp}.sql")
+    backup_file = os.path.join(BACKUP_DIR, f"{config['database']}_backup_{timestamp}.sql")
     
     # Build the mysqldump command
-    cmd = [
-        'mysqldump',
-        f'--host={db_config["host"]}',
-        f'--user={db_config["user"]}',
-        f'--password={db_config["password"]}',
+    cmd = ['mysqldump'] + client_args(config) + [
         '--single-transaction',
         '--routines',
         '--triggers',
         '--events',
-        db_config['database']
+        config['database']
     ]
     
     try:
-        print(f"Backing up database '{db_config['database']}' to {backup_file}...")
+        print(f"Backing up database '{config['database']}' to {backup_file}...")
         
         with open(backup_file, 'w') as f:
             subprocess.run(cmd, stdout=f, check=True)
@@ -55,15 +1078,14 @@ def backup_database():
 
 def list_backups():
     """List all available database backups"""
-    backup_dir = 'database_backups'
-    if not os.path.exists(backup_dir):
+    if not os.path.exists(BACKUP_DIR):
         print("No backups found.")
         return []
     
     backups = []
-    for filename in sorted(os.listdir(backup_dir), reverse=True):
+    for filename in sorted(os.listdir(BACKUP_DIR), reverse=True):
+        filepath = os.path.join(BACKUP_DIR, filename)
         if filename.endswith('.sql'):
-            filepath = os.path.join(backup_dir, filename)
             file_size = os.path.getsize(filepath) / (1024 * 1024)  # Size in MB
             backups.append({
                 'filename': filename,
@@ -71,6 +1093,15 @@ def list_backups():
                 'size_mb': round(file_size, 2),
                 'modified': datetime.datetime.fromtimestamp(os.path.getmtime(filepath))
             })
+        elif os.path.isfile(os.path.join(filepath, MANIFEST_FILE)):
+            manifest = read_manifest(filepath)
+            backups.append({
+                'filename': f"{filename}/ ({manifest['type']}, {len(manifest['tables'])} tables, "
+                            f"{manifest['totals']['rows']:,} rows)",
+                'path': filepath,
+                'size_mb': round(manifest['totals']['bytes'] / (1024 * 1024), 2),
+                'modified': datetime.datetime.fromisoformat(manifest['created_at'])
+            })
     
     if not backups:
         print("No backup files found.")
@@ -81,28 +1112,19 @@ def list_backups():
     
     return backups
 
-def restore_database(backup_file):
-    """Restore the database from a backup file"""
+def restore_database(backup_file, jobs=4, defer_indexes=True, verify=True):
+    """Restore the database from a backup file or backup directory"""
     if not os.path.exists(backup_file):
         print(f"Error: Backup file not found: {backup_file}")
         return False
+    if os.path.isdir(backup_file):
+        return restore_backup(backup_file, jobs=jobs, defer_indexes=defer_indexes, verify=verify)
     
     # Get database configuration from environment variables
-    db_config = {
-        'host': os.getenv('MYSQL_HOST', 'localhost'),
-        'user': os.getenv('MYSQL_USER', 'root'),
-        'password': os.getenv('MYSQL_PASSWORD', ''),
-        'database': os.getenv('MYSQL_DB', 'flight_booking')
-    }
+    config = db_config()
     
     # Build the mysql command
-    cmd = [
-        'mysql',
-        f'--host={db_config["host"]}',
-        f'--user={db_config["user"]}',
-        f'--password={db_config["password"]}',
-        db_config['database']
-    ]
+    cmd = ['mysql'] + client_args(config) + [config['database']]
     
     try:
         print(f"Restoring database from {backup_file}...")
@@ -129,6 +1151,18 @@ def main():
     
     # Backup command
     backup_parser = subparsers.add_parser('backup', help='Create a new database backup')
+    backup_parser.add_argument('--parallel', action='store_true',
+                               help='Dump tables in parallel into a compressed backup directory')
+    backup_parser.add_argument('--jobs', type=int, default=4, help='Tables dumped at once (with --parallel)')
+    backup_parser.add_argument('--compression', choices=['zstd', 'gzip'],
+                               help='Default: zstd if the zstandard package is installed, else gzip')
+    backup_parser.add_argument('--incremental', action='store_true',
+                               help='Only rows changed since the newest backup directory (implies --parallel)')
+    backup_parser.add_argument('--lag', type=int, default=INCREMENTAL_LAG_SECONDS,
+                               help='Seconds re-read before the previous snapshot (with --incremental)')
+    
+    # Track command
+    subparsers.add_parser('track', help='Install the updated_at indexes and delete triggers incremental backups use')
     
     # List command
     list_parser = subparsers.add_parser('list', help='List available backups')
@@ -136,16 +1170,34 @@ def main():
     # Restore command
     restore_parser = subparsers.add_parser('restore', help='Restore database from a backup')
     restore_parser.add_argument('backup_file', nargs='?', help='Path to the backup file to restore')
+    restore_parser.add_argument('--jobs', type=int, default=4, help='Tables loaded at once (backup directories)')
+    restore_parser.add_argument('--keep-indexes', action='store_true',
+                                help='Load with secondary indexes in place instead of rebuilding them afterwards')
+    restore_parser.add_argument('--skip-verify', action='store_true',
+                                help='Do not compare row counts and checksums with the manifest')
     
     args = parser.parse_args()
     
     if args.command == 'backup':
-        backup_database()
+        if args.parallel or args.incremental:
+            backup_parallel(jobs=args.jobs, compression=args.compression,
+                            incremental=args.incremental, lag=args.lag)
+        else:
+            backup_database()
+    elif args.command == 'track':
+        conn = connect()
+        cursor = conn.cursor()
+        tables = install_change_tracking(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"Tracking changes in: {', '.join(sorted(tables)) or 'no tables with updated_at'}")
     elif args.command == 'list':
         list_backups()
     elif args.command == 'restore':
         if args.backup_file:
-            restore_database(args.backup_file)
+            restore_database(args.backup_file, jobs=args.jobs, defer_indexes=not args.keep_indexes,
+                             verify=not args.skip_verify)
         else:
             # Show interactive restore menu
             backups = list_backups()
@@ -155,7 +1207,8 @@ def main():
                     if 1 <= choice <= len(backups):
                         confirm = input(f"Are you sure you want to restore from {backups[choice-1]['filename']}? This will overwrite the current database. (y/n): ")
                         if confirm.lower() == 'y':
-                            restore_database(backups[choice-1]['path'])
+                            restore_database(backups[choice-1]['path'], jobs=args.jobs,
+                                             defer_indexes=not args.keep_indexes, verify=not args.skip_verify)
                     elif choice != 0:
                         print("Invalid selection.")
                 except ValueError:
@@ -0,0 +1,164 @@
+"""End-to-end login throughput benchmark (MySQL lookup plus bcrypt).
+
+Seeds ``--users`` rows into ``users`` once, all sharing one precomputed hash
+so seeding does not cost a bcrypt call per row, then sends logins with random
+emails and mobile numbers from ``--threads`` threads through
+``POST /api/auth/login`` for ``--seconds`` seconds:
+
+    python bench_login.py --users 1000000 --threads 32 --seconds 30
+    python bench_login.py --skip-seed --threads 64 --explain
+    python bench_login.py --cleanup
+
+Set ``PASSWORD_HASH_WORKERS`` and ``BCRYPT_ROUNDS`` to compare configurations.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+import bcrypt
+
+BENCH_PASSWORD = 'bench-password'
+# A fixed prefix keeps the seeded rows a range of the email index
+EMAIL_PATTERN = 'loginbench%@example.com'
+
+
+def bench_email(n):
+    return f"loginbench{n}@example.com"
+
+
+def bench_mobile(n):
+    return f"9{n:09d}"
+
+
+def seed_users(connect, count, batch_size=10000):
+    """Insert ``count`` benchmark users that are not there yet"""
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users WHERE email LIKE %s", (EMAIL_PATTERN,))
+    existing = cursor.fetchone()[0]
+    if existing >= count:
+        print(f"{existing:,} benchmark users already seeded")
+        return
+
+    cursor.execute("""
+        SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'id'
+    """)
+    uuid_ids = cursor.fetchone()[0] in ('varchar', 'char')
+
+    rounds = int(os.getenv('BCRYPT_ROUNDS', 12))
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+    if uuid_ids:
+        sql = "INSERT IGNORE INTO users (id, name, email, password, mobile) VALUES (%s, %s, %s, %s, %s)"
+    else:
+        sql = "INSERT IGNORE INTO users (name, email, password, mobile) VALUES (%s, %s, %s, %s)"
+
+    print(f"Seeding users {existing:,}..{count:,} (bcrypt cost {rounds})")
+    started = time.time()
+    for start in range(existing, count, batch_size):
+        rows = []
+        for n in range(start, min(start + batch_size, count)):
+            row = (f"Bench User {n}", bench_email(n), hashed, bench_mobile(n))
+            rows.append((str(uuid.uuid4()),) + row if uuid_ids else row)
+        cursor.executemany(sql, rows)
+        conn.commit()
+        done = start + len(rows) - existing
+        print(f"  {start + len(rows):,} users ({done / (time.time() - started):,.0f} rows/s)")
+    cursor.close()
+    conn.close()
+
+
+def explain(connect):
+    """Show that each login lookup is a single unique-index read"""
+    from auth_routes import LOGIN_QUERIES
+    conn = connect()
+    cursor = conn.cursor(dictionary=True)
+    for column, value in (('email', bench_email(1)), ('mobile', bench_mobile(1))):
+        cursor.execute("EXPLAIN " + LOGIN_QUERIES[column], (value,))
+        plan = cursor.fetchall()[0]
+        print(f"{column:<7} type={plan['type']} key={plan['key']} rows={plan['rows']}")
+    cursor.close()
+    conn.close()
+
+
+def cleanup(connect):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM users WHERE email LIKE %s", (EMAIL_PATTERN,))
+    conn.commit()
+    print(f"Deleted {cursor.rowcount:,} benchmark users")
+    cursor.close()
+    conn.close()
+
+
+def run(app, users, threads, seconds):
+    client = app.test_client()
+    results = Counter()
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            n = rng.randrange(users)
+            identifier = bench_email(n) if rng.random() < 0.5 else bench_mobile(n)
+            started = time.perf_counter()
+            response = client.post('/api/auth/login',
+                                   json={'identifier': identifier, 'password': BENCH_PASSWORD})
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[response.status_code] += 1
+                latencies.append(elapsed)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, sorted(latencies), time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput benchmark')
+    parser.add_argument('--users', type=int, default=1000000, help='Benchmark users to seed and log in as')
+    parser.add_argument('--threads', type=int, default=32, help='Concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--explain', action='store_true', help='Print the lookup plans')
+    parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users and exit')
+    args = parser.parse_args()
+
+    from db import connect
+    if args.cleanup:
+        cleanup(connect)
+        return
+    if not args.skip_seed:
+        seed_users(connect, args.users)
+    if args.explain:
+        explain(connect)
+
+    # Every login comes from one client IP and would be throttled within seconds
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    from app import app
+    from password_hashing import password_hasher
+
+    results, latencies, duration = run(app, args.users, args.threads, args.seconds)
+
+    total = sum(results.values())
+    print(f"\n{total:,} logins in {duration:.1f}s with {args.threads} threads: "
+          f"{results[200] / duration:,.1f} successful logins/s")
+    print(f"Outcomes: {dict(results)}")
+    if latencies:
+        print(f"Latency:  p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+              f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f}ms")
+    print(f"Hashing:  {password_hasher.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Concurrency benchmark for seat booking on a single hot flight.
+
+Creates a throwaway flight with ``--seats`` seats and lets ``--bookers``
+threads book it at the same time through ``POST /api/flights/<id>/book``
+(the real handler, pooled connections and MySQL). Reports throughput and
+checks that the seats sold, the bookings written and the remaining inventory
+agree, i.e. that nothing was oversold.
+
+Needs the ``airports`` and ``flights`` tables from ``init_db.py``:
+
+    python bench_seat_inventory.py --seats 150 --bookers 400 --pool-size 20
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seat inventory concurrency benchmark')
+    parser.add_argument('--seats', type=int, default=150, help='Seats on the benchmark flight')
+    parser.add_argument('--bookers', type=int, default=400, help='Parallel booking threads')
+    parser.add_argument('--seats-per-booking', type=int, default=1)
+    parser.add_argument('--pool-size', type=int, default=20, help='DB_POOL_SIZE for the run')
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark flight and bookings')
+    args = parser.parse_args()
+
+    # The pool is sized when db is first imported
+    os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+    os.environ.setdefault('DB_POOL_TIMEOUT', '30')
+    from app import app
+    from db import get_connection
+
+    tag = uuid.uuid4().hex
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM airports ORDER BY id LIMIT 2")
+        airports = [row[0] for row in cursor.fetchall()]
+        if len(airports) < 2:
+            print("Error: need at least two airports, run init_db.py first")
+            return
+        cursor.execute("""
+            SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'id'
+        """)
+        if cursor.fetchone()[0] in ('varchar', 'char'):
+            user_id = str(uuid.uuid4())
+            cursor.execute("INSERT INTO users (id, email, password, name) VALUES (%s, %s, %s, %s)",
+                           (user_id, f"bench-{tag}@example.com", 'x', 'Seat Benchmark'))
+        else:
+            cursor.execute("INSERT INTO users (email, password, name) VALUES (%s, %s, %s)",
+                           (f"bench-{tag}@example.com", 'x', 'Seat Benchmark'))
+            user_id = cursor.lastrowid
+        departure = datetime.now().replace(microsecond=0) + timedelta(days=30)
+        cursor.execute("""
+            INSERT INTO flights (flight_number, airline, source_airport_id, destination_airport_id,
+                                 departure_time, arrival_time, price, available_seats)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, ('BENCH1', 'Benchmark Air', airports[0], airports[1],
+              departure, departure + timedelta(hours=2), 4999.00, args.seats))
+        flight_id = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+
+    print(f"Flight {flight_id}: {args.seats} seats, {args.bookers} bookers "
+          f"x {args.seats_per_booking} seat(s), pool size {args.pool_size}")
+
+    client = app.test_client()
+    results = Counter()
+    latencies = []
+    lock = threading.Lock()
+    start_gate = threading.Event()
+
+    def book():
+        start_gate.wait()
+        started = time.perf_counter()
+        response = client.post(f'/api/flights/{flight_id}/book',
+                               json={'user_id': user_id, 'seats': args.seats_per_booking})
+        elapsed = time.perf_counter() - started
+        with lock:
+            results[response.status_code] += 1
+            latencies.append(elapsed)
+
+    threads = [threading.Thread(target=book) for _ in range(args.bookers)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start_gate.set()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT available_seats FROM flights WHERE id = %s", (flight_id,))
+        remaining = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM bookings WHERE user_id = %s", (user_id,))
+        booked_rows = cursor.fetchone()[0]
+        if not args.keep:
+            cursor.execute("DELETE FROM bookings WHERE user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            cursor.execute("DELETE FROM flights WHERE id = %s", (flight_id,))
+            conn.commit()
+        cursor.close()
+
+    latencies.sort()
+    sold = args.seats - remaining
+    confirmed = results[201] * args.seats_per_booking
+    print(f"\nRequests:  {sum(results.values())} in {duration:.2f}s "
+          f"({sum(results.values()) / duration:.0f} req/s)")
+    print(f"Outcomes:  {dict(results)}  (201 booked, 409 sold out)")
+    print(f"Latency:   p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+    print(f"Seats:     sold {sold}, confirmed {confirmed}, booking rows {booked_rows}, remaining {remaining}")
+
+    oversold = remaining < 0 or sold != confirmed or booked_rows != confirmed
+    print("Oversells: none" if not oversold else "Oversells: INVENTORY MISMATCH")
+
+
+if __name__ == '__main__':
+    main()
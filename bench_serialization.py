@@ -0,0 +1,145 @@
+"""Benchmark JSON encoding and compression of the large API payloads.
+
+Compares, per request and in CPU time, Flask's ``jsonify`` against
+``serialization.json_response`` with and without ``compression`` for an
+``/api/optimize``-shaped payload and a ``/api/users/<id>/bookings``-shaped one
+(MySQL rows with ``Decimal`` and ``datetime`` values).
+
+    python bench_serialization.py --flights 250 --bookings 2000 --requests 500
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask, jsonify
+
+import compression
+import serialization
+from compression import compress_response
+from serialization import json_response
+
+
+def make_flights(count, rng):
+    """Normalized offers as returned by optimize_route"""
+    flights = []
+    for i in range(count):
+        departure = datetime(2026, 11, 1) + timedelta(minutes=rng.randrange(0, 1440, 5))
+        flights.append({
+            'airline': rng.choice(['INDIGO', 'AIR INDIA', 'VISTARA', 'SPICEJET']),
+            'flightNumber': f"6E{rng.randint(100, 9999)}",
+            'origin': 'DEL',
+            'destination': 'BOM',
+            'departureTime': departure.strftime('%Y-%m-%dT%H:%M:%S'),
+            'arrivalTime': (departure + timedelta(minutes=135)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'duration': 'PT2H15M',
+            'price': round(rng.uniform(3000, 15000), 2),
+            'currency': 'INR',
+            'numberOfStops': rng.choice([0, 0, 1]),
+            'aircraft': 'AIRBUS A320NEO',
+            'cabin': 'ECONOMY',
+            'baggage': {
+                'checked': {'weight': 15, 'weightUnit': 'KG'},
+                'cabin': {'weight': 7, 'weightUnit': 'KG'}
+            }
+        })
+    return {'flights': flights, 'source': 'DEL', 'destination': 'BOM',
+            'date': '2026-11-01', 'total_flights': count}
+
+
+def make_bookings(count, rng):
+    """Rows of ``SELECT * FROM bookings`` as mysql.connector returns them"""
+    rows = []
+    for i in range(count):
+        departure = datetime(2024, 1, 1) + timedelta(hours=rng.randint(0, 24 * 900))
+        rows.append({
+            'id': i + 1,
+            'user_id': '6f1c2a4e-3d1b-4c55-9d61-2f1e7c0b9a11',
+            'flight_number': f"AI{rng.randint(100, 999)}",
+            'airline': 'AIR INDIA',
+            'origin': 'DEL',
+            'destination': rng.choice(['BOM', 'BLR', 'MAA', 'HYD']),
+            'departure_time': departure,
+            'arrival_time': departure + timedelta(minutes=140),
+            'price': Decimal(f"{rng.uniform(3000, 15000):.2f}"),
+            'currency': 'INR',
+            'cabin_class': 'ECONOMY',
+            'booking_reference': f"{rng.getrandbits(128):032x}",
+            'status': 'confirmed',
+            'created_at': departure - timedelta(days=rng.randint(1, 60))
+        })
+    return rows
+
+
+def create_bench_app(payloads):
+    bench = Flask(__name__)
+
+    @bench.route('/jsonify/<name>')
+    def with_jsonify(name):
+        return jsonify(payloads[name])
+
+    @bench.route('/fast/<name>')
+    def with_fast(name):
+        return json_response(payloads[name])
+
+    return bench
+
+
+def measure(client, url, requests_count, headers=None):
+    """CPU seconds per request and response size for ``url``"""
+    response = client.get(url, headers=headers)
+    if response.status_code != 200:
+        return None, None
+    size = len(response.get_data())
+    start = time.process_time()
+    for _ in range(requests_count):
+        client.get(url, headers=headers)
+    return (time.process_time() - start) / requests_count, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON encoding and compression benchmark')
+    parser.add_argument('--flights', type=int, default=250, help='Offers in the optimize payload')
+    parser.add_argument('--bookings', type=int, default=2000, help='Rows in the bookings payload')
+    parser.add_argument('--requests', type=int, default=300, help='Requests per measurement')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        'optimize': make_flights(args.flights, rng),
+        'bookings': make_bookings(args.bookings, rng)
+    }
+
+    plain = create_bench_app(payloads).test_client()
+    compressed_app = create_bench_app(payloads)
+    compressed_app.after_request(compress_response)
+    compressed = compressed_app.test_client()
+
+    backend = 'orjson' if serialization.dumps is serialization.SERIALIZERS.get('orjson') else 'json'
+    print(f"Serializer backend: {backend}, {args.requests} requests per row\n")
+    print(f"{'payload':<10} {'variant':<24} {'CPU ms/req':>11} {'bytes':>10}")
+
+    for name in payloads:
+        variants = [
+            ('jsonify', plain, f'/jsonify/{name}', None),
+            ('json_response', plain, f'/fast/{name}', None),
+            ('json_response + gzip', compressed, f'/fast/{name}', {'Accept-Encoding': 'gzip'}),
+        ]
+        if compression.brotli is not None:
+            variants.append(('json_response + br', compressed, f'/fast/{name}', {'Accept-Encoding': 'br'}))
+
+        baseline = None
+        for label, client, url, headers in variants:
+            cpu, size = measure(client, url, args.requests, headers)
+            if cpu is None:
+                print(f"{name:<10} {label:<24} {'failed':>11}")
+                continue
+            baseline = baseline or cpu
+            print(f"{name:<10} {label:<24} {cpu * 1000:>11.3f} {size:>10}  ({baseline / cpu:.1f}x)")
+        print()
+
+
+if __name__ == '__main__':
+    main()
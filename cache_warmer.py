@@ -0,0 +1,169 @@
+"""Background pre-fetching of popular routes into the offer cache.
+
+Once per day, inside the off-peak window, the warmer takes the most booked
+routes (``bookings.origin/destination``) merged with the most searched ones,
+and fetches the next ``WARMER_DAYS`` days of offers for each until the
+``WARMER_QUOTA`` API-call budget is spent. Every fetch also refreshes the
+cheapest-fare calendar served by ``/api/price-calendar``.
+
+Enable it in the API process with ``CACHE_WARMER_ENABLED=1``. When a shared
+``DiskCache`` is given, only one worker per host runs each day's pass.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+
+def parse_hours(spec):
+    """Parse an off-peak window like ``"1-5"`` into (start_hour, end_hour)"""
+    start, end = spec.split('-')
+    return int(start), int(end)
+
+
+def in_window(hour, window):
+    """True if ``hour`` falls in the [start, end) window, which may wrap midnight"""
+    start, end = window
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def booked_routes(get_connection, limit, lookback_days=90):
+    """Most booked routes over the lookback period, most popular first"""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT origin, destination, COUNT(*) AS bookings
+                FROM bookings
+                WHERE created_at >= NOW() - INTERVAL %s DAY
+                GROUP BY origin, destination
+                ORDER BY bookings DESC
+                LIMIT %s
+            """, (lookback_days, limit))
+            rows = cursor.fetchall()
+            cursor.close()
+        return [((origin, destination), count) for origin, destination, count in rows]
+    except mysql.connector.Error as err:
+        print(f"Cache warmer: could not read booking history: {err}")
+        return []
+
+
+class CacheWarmer:
+    """Daily off-peak pre-fetch of popular routes within an API-call budget"""
+
+    def __init__(self, fetch_offers, cache, calendar, get_connection,
+                 routes=None, days=None, quota=None, window=None, ttl=None, delay=None,
+                 shared=None):
+        self.fetch_offers = fetch_offers
+        self.cache = cache
+        self.calendar = calendar
+        self.get_connection = get_connection
+        self.shared = shared
+        self.routes = routes or int(os.getenv('WARMER_ROUTES', 300))
+        self.days = days or int(os.getenv('WARMER_DAYS', 14))
+        self.quota = quota or int(os.getenv('WARMER_QUOTA', 2000))
+        self.window = window or parse_hours(os.getenv('WARMER_OFFPEAK_HOURS', '1-5'))
+        self.ttl = ttl or int(os.getenv('WARMER_TTL', 6 * 3600))
+        self.delay = delay if delay is not None else float(os.getenv('WARMER_DELAY_MS', 200)) / 1000.0
+        self.last_run_date = None
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def popular_routes(self):
+        """Booked and searched routes merged by popularity"""
+        scores = {}
+        for route, count in booked_routes(self.get_connection, self.routes):
+            scores[route] = scores.get(route, 0) + count
+        for route, count in self.cache.popular_routes(self.routes):
+            scores[route] = scores.get(route, 0) + count
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [route for route, _ in ranked[:self.routes]]
+
+    def run_once(self):
+        """Warm popular routes until every day is cached or the budget is spent"""
+        started = time.time()
+        budget = self.quota
+        fetched = skipped = failed = 0
+        today = datetime.now().date()
+        dates = [(today + timedelta(days=i)).isoformat() for i in range(self.days)]
+        routes = self.popular_routes()
+
+        print(f"Cache warmer: warming {len(routes)} routes x {len(dates)} days (budget {budget} calls)")
+        self.calendar.prune(today.isoformat())
+
+        # Walk day by day so the budget covers the nearest dates of every route first
+        for date in dates:
+            for source, destination in routes:
+                if self._stop.is_set() or budget <= 0:
+                    break
+                # Leave entries alone that will still be valid through the day
+                if self.cache.is_fresh(source, destination, date, min_ttl=self.ttl // 2):
+                    skipped += 1
+                    continue
+                budget -= 1
+                try:
+                    flights = self.fetch_offers(source, destination, date)
+                except Exception as e:
+                    print(f"Cache warmer: {source}-{destination} on {date} failed: {e}")
+                    failed += 1
+                    continue
+                self.cache.set(source, destination, date, flights, ttl=self.ttl)
+                self.calendar.update(source, destination, date, flights)
+                fetched += 1
+                if self.delay:
+                    time.sleep(self.delay)
+
+        self.last_run = {
+            'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'duration_s': round(time.time() - started, 1),
+            'routes': len(routes),
+            'fetched': fetched,
+            'skipped': skipped,
+            'failed': failed,
+            'budget_left': budget
+        }
+        print(f"Cache warmer: done {self.last_run}")
+        return self.last_run
+
+    def _loop(self, interval):
+        while not self._stop.is_set():
+            now = datetime.now()
+            if in_window(now.hour, self.window) and self.last_run_date != now.date():
+                lock = f"lock:cache-warmer:{now.date()}"
+                locked = False
+                try:
+                    # Let a single worker per host spend the day's quota
+                    if self.shared and not self.shared.add(lock, os.getpid(), 86400):
+                        # Another worker has today's run
+                        self.last_run_date = now.date()
+                    else:
+                        locked = bool(self.shared)
+                        self.run_once()
+                        self.last_run_date = now.date()
+                except Exception as e:
+                    print(f"Cache warmer: run failed, retrying next interval: {e}")
+                    if locked:
+                        # Let this or another worker try again
+                        try:
+                            self.shared.delete(lock)
+                        except Exception as e:
+                            print(f"Cache warmer: could not release the lock: {e}")
+            self._stop.wait(interval)
+
+    def start(self, interval=60):
+        """Start the scheduler thread; it checks the off-peak window every ``interval`` seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,),
+                                        name='cache-warmer', daemon=True)
+        self._thread.start()
+        print(f"Cache warmer scheduled for off-peak hours {self.window[0]:02d}:00-{self.window[1]:02d}:00")
+
+    def stop(self):
+        self._stop.set()
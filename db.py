@@ -0,0 +1,345 @@
+"""Shared MySQL access for the API and the maintenance scripts.
+
+Routes borrow connections from a process-wide pool instead of opening one per
+request:
+
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        ...
+
+Read-only queries can be sent to replicas listed in ``MYSQL_REPLICA_HOSTS``:
+
+    with get_connection(readonly=True, user_key=user_id) as conn:
+        ...
+
+Replicas are used round-robin; one that fails to connect is ejected for
+``REPLICA_EJECT_SECONDS`` and reads fall back to the primary when none is
+left. After ``mark_write(user_id)`` that user's reads stay on the primary for
+``REPLICA_STICKY_SECONDS`` so they always see their own writes.
+
+One-off scripts that only need a single session use ``connect()``.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def db_config(database=True):
+    """Connection settings from the environment"""
+    config = {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', 3306)),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', '')
+    }
+    if database:
+        config['database'] = os.getenv('MYSQL_DB', 'flight_booking')
+    return config
+
+
+def connect(database=True, **overrides):
+    """Open a dedicated (unpooled) connection, for scripts and schema setup"""
+    config = db_config(database)
+    config.update(overrides)
+    return mysql.connector.connect(**config)
+
+
+class PoolTimeout(errors.PoolError):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections with health checks on checkout
+
+    Connections are created lazily up to ``size``. A connection that sat idle
+    longer than ``ping_interval`` seconds is pinged before it is handed out
+    and replaced if the server dropped it. Cursors are buffered by default so
+    a handler returning early never leaves unread rows on a shared connection.
+    """
+
+    def __init__(self, size=None, timeout=None, ping_interval=None, name='primary', **config):
+        self.size = size or int(os.getenv('DB_POOL_SIZE', 10))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.ping_interval = (ping_interval if ping_interval is not None
+                              else float(os.getenv('DB_POOL_PING_INTERVAL', 30)))
+        self.name = name
+        self.config = dict(config or db_config())
+        self.config.setdefault('buffered', True)
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._created = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._failed_checks = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _new_connection(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except errors.Error:
+            with self._lock:
+                self._failed_checks += 1
+            return False
+
+    def acquire(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds for a free slot"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(msg=f"No free connection in pool '{self.name}' after {self.timeout}s")
+        waited = time.monotonic() - started
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    candidate, idle_since = self._idle.pop()
+                except IndexError:
+                    conn = self._new_connection()
+                    break
+                if self._healthy(candidate, idle_since):
+                    conn = candidate
+                else:
+                    self._discard(candidate)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection; open transactions are rolled back first"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.append((conn, time.monotonic()))
+        except errors.Error:
+            # Broken or left in an unusable state: drop it, a new one is made on demand
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_idle(self):
+        """Close every idle connection (e.g. after fork or on shutdown)"""
+        while self._idle:
+            conn, _ = self._idle.pop()
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'utilization': round(self._in_use / self.size, 3),
+                'created': self._created,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'failed_health_checks': self._failed_checks,
+                'wait_ms_avg': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'wait_ms_max': round(self._wait_max * 1000, 3)
+            }
+
+
+def parse_hosts(spec):
+    """Parse ``"host[:port],host[:port]"`` into (host, port) pairs"""
+    hosts = []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        hosts.append((host, int(port) if port else int(os.getenv('MYSQL_PORT', 3306))))
+    return hosts
+
+
+class ReplicaSet:
+    """Round-robin over replica pools with health-based ejection"""
+
+    def __init__(self, hosts, eject_seconds=None):
+        self.eject_seconds = (eject_seconds if eject_seconds is not None
+                              else float(os.getenv('REPLICA_EJECT_SECONDS', 30)))
+        self.pools = []
+        for host, port in hosts:
+            config = db_config()
+            config.update(host=host, port=port)
+            self.pools.append(ConnectionPool(name=f"replica-{host}:{port}", **config))
+        self._ejected_until = {p.name: 0.0 for p in self.pools}
+        self._ejections = {p.name: 0 for p in self.pools}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _eject(self, replica, reason):
+        with self._lock:
+            self._ejected_until[replica.name] = time.monotonic() + self.eject_seconds
+            self._ejections[replica.name] += 1
+        replica.close_idle()
+        print(f"Ejecting {replica.name} for {self.eject_seconds}s: {reason}")
+
+    def _candidates(self):
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next)
+            healthy = [p for p in self.pools if self._ejected_until[p.name] <= now]
+        if not healthy:
+            return []
+        start %= len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def acquire(self):
+        """Borrow a connection from the next healthy replica, or (None, None)"""
+        for replica in self._candidates():
+            try:
+                return replica, replica.acquire()
+            except PoolTimeout:
+                # Busy, not broken: try the next replica
+                continue
+            except errors.Error as err:
+                self._eject(replica, err)
+        return None, None
+
+    @contextmanager
+    def connection(self, replica, conn):
+        try:
+            yield conn
+        except (errors.OperationalError, errors.InterfaceError) as err:
+            # The server went away mid-request
+            self._eject(replica, err)
+            raise
+        finally:
+            replica.release(conn)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            ejected = {name: until > now for name, until in self._ejected_until.items()}
+            ejections = dict(self._ejections)
+        return [dict(p.stats(), ejected=ejected[p.name], ejections=ejections[p.name]) for p in self.pools]
+
+
+class WriteTracker:
+    """Remembers which users wrote recently, so their reads stay on the primary
+
+    Kept in process by default; ``use_store`` plugs in a shared store (anything
+    with ``get``/``set(key, value, ttl)``, e.g. ``DiskCache``) so that a write
+    handled by one worker is honoured by the others.
+    """
+
+    def __init__(self, sticky_seconds=None):
+        self.sticky_seconds = (sticky_seconds if sticky_seconds is not None
+                               else float(os.getenv('REPLICA_STICKY_SECONDS', 5)))
+        self.store = None
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def use_store(self, store):
+        self.store = store
+
+    def mark(self, key):
+        if self.store is not None:
+            self.store.set(f"rw:{key}", 1, self.sticky_seconds)
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent[key] = now + self.sticky_seconds
+            if len(self._recent) > 10000:
+                for stale in [k for k, until in self._recent.items() if until <= now]:
+                    del self._recent[stale]
+
+    def recent(self, key):
+        if self.store is not None:
+            return self.store.get(f"rw:{key}") is not None
+        with self._lock:
+            return self._recent.get(key, 0) > time.monotonic()
+
+
+pool = ConnectionPool()
+replicas = ReplicaSet(parse_hosts(os.getenv('MYSQL_REPLICA_HOSTS')))
+write_tracker = WriteTracker()
+routing = {'primary_reads': 0, 'replica_reads': 0, 'sticky_reads': 0, 'fallback_reads': 0}
+_routing_lock = threading.Lock()
+
+
+def _count(metric):
+    with _routing_lock:
+        routing[metric] += 1
+
+
+def get_connection(readonly=False, user_key=None):
+    """Context manager borrowing a pooled connection for the duration of a request
+
+    ``readonly=True`` allows the query to run on a replica; pass the user the
+    read is for as ``user_key`` to get read-your-writes consistency.
+    """
+    if readonly and replicas.pools:
+        if user_key is not None and write_tracker.recent(str(user_key)):
+            _count('sticky_reads')
+        else:
+            replica, conn = replicas.acquire()
+            if conn is not None:
+                _count('replica_reads')
+                return replicas.connection(replica, conn)
+            _count('fallback_reads')
+    elif readonly:
+        _count('primary_reads')
+    return pool.connection()
+
+
+def mark_write(*user_keys):
+    """Record that these users just wrote, pinning their reads to the primary"""
+    for key in user_keys:
+        if key is not None:
+            write_tracker.mark(str(key))
+
+
+def pool_stats():
+    return {
+        'primary': pool.stats(),
+        'replicas': replicas.stats(),
+        'routing': dict(routing)
+    }
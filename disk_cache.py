@@ -0,0 +1,148 @@
+"""Host-wide key-value cache on SQLite, shared by all worker processes.
+
+Entries survive restarts and deploys, carry a TTL, and the file is kept under
+``max_bytes`` by evicting the entries closest to expiry. The database runs in
+WAL mode, so readers never block the writer and a crash can lose at most the
+last transaction, never corrupt the file. Each thread keeps its own
+connection; a point lookup is a primary-key read on a local file.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+"""
+
+
+class DiskCache:
+    """TTL key-value store in a single SQLite file"""
+
+    def __init__(self, path=None, max_bytes=None, cull_every=200):
+        self.path = path or os.getenv('SHARED_CACHE_PATH', os.path.join('cache', 'shared_cache.db'))
+        self.max_bytes = max_bytes or int(os.getenv('SHARED_CACHE_MAX_MB', 256)) * 1024 * 1024
+        self.cull_every = cull_every
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread and per process (never reuse across fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        """Return the value stored under ``key``, or ``default`` if missing or expired"""
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_many(self, keys):
+        """Return a dict of the live entries among ``keys``"""
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' for _ in keys)
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND expires_at > ?",
+            list(keys) + [time.time()]
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def ttl(self, key):
+        """Seconds left before ``key`` expires, or None if it is not cached"""
+        row = self._connection().execute(
+            "SELECT expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        remaining = row[0] - time.time() if row else 0
+        return remaining if remaining > 0 else None
+
+    def set(self, key, value, ttl):
+        """Store ``value`` (JSON-serialisable) under ``key`` for ``ttl`` seconds"""
+        payload = json.dumps(value, separators=(',', ':'))
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+            (key, payload, time.time() + ttl, len(payload) + len(key))
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, ttl):
+        """Store ``value`` only if ``key`` is absent or expired; True if it was stored
+
+        Atomic across processes, so it doubles as a host-wide lock with a lease.
+        """
+        payload = json.dumps(value, separators=(',', ':'))
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+                (key, payload, now + ttl, len(payload) + len(key))
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _maybe_cull(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes % self.cull_every:
+                return
+        self.cull()
+
+    def cull(self):
+        """Drop expired entries, then the ones closest to expiry until under ``max_bytes``"""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM cache ORDER BY expires_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key, _ in rows])
+            conn.execute('COMMIT')
+            total -= sum(size for _, size in rows)
+
+    def stats(self):
+        conn = self._connection()
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,307 @@
+"""Export bookings and flights to date-partitioned files for offline analytics.
+
+Rows are read in primary-key order (``WHERE id > last_id ORDER BY id LIMIT n``)
+from a read replica when ``MYSQL_REPLICA_HOSTS`` is set. They are written as
+Parquet (default) or Arrow IPC when pyarrow is installed, and as CSV
+otherwise:
+
+    exports/bookings/date=2026-11-01/part-20261102T010000.parquet
+
+Each run after the first only exports rows whose ``updated_at`` (or
+``created_at`` for tables without it) changed since the previous run; the
+watermark per table is kept in ``exports/_state.json``. A changed row is
+written again in a new part file, so readers keep the latest copy per ``id``.
+The watermark stops ``--lag`` seconds before the server's current time,
+leaving rows of transactions that are still committing for the next run. On a
+replica it also stops short by the replication delay, so rows the replica has
+not applied yet are not skipped; a replica whose delay is unknown (replication
+stopped) is refused.
+
+At most ``ANALYTICS_MAX_OPEN_PARTITIONS`` part files are open at once. When
+more partitions are being written, the least recently used file is closed and
+later rows of that partition go to a further part file (``part-<run>-1`` ...).
+
+    python export_analytics.py                     # bookings and flights, incremental
+    python export_analytics.py bookings --full --format csv
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+import mysql.connector
+from db import connect, parse_hosts
+from dotenv import load_dotenv
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+# Load environment variables
+load_dotenv()
+
+EXPORT_DIR = os.getenv('ANALYTICS_EXPORT_DIR', 'exports')
+STATE_FILE = '_state.json'
+MAX_OPEN_PARTITIONS = int(os.getenv('ANALYTICS_MAX_OPEN_PARTITIONS', 128))
+
+# Column whose date names the partition a row is written to
+PARTITION_COLUMNS = {'bookings': 'created_at', 'flights': 'departure_time'}
+
+
+def load_state(output):
+    path = os.path.join(output, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(output, state):
+    path = os.path.join(output, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def connect_source(use_replica=True):
+    """``(connection, is_replica)``: the first replica if one is configured, else the primary"""
+    replicas = parse_hosts(os.getenv('MYSQL_REPLICA_HOSTS'))
+    if use_replica and replicas:
+        host, port = replicas[0]
+        print(f"Reading from replica {host}:{port}")
+        return connect(host=host, port=port), True
+    print("Reading from the primary")
+    return connect(), False
+
+
+def replica_delay(cursor):
+    """Seconds the replica's data is behind its source (the worst channel)
+
+    Raises RuntimeError when the delay is unknown, e.g. replication stopped.
+    """
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+        column = 'Seconds_Behind_Source'
+    except mysql.connector.Error:
+        # MySQL before 8.0.22
+        cursor.execute("SHOW SLAVE STATUS")
+        column = 'Seconds_Behind_Master'
+    channels = [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+    if not channels:
+        raise RuntimeError("the source server is not a replica")
+    delays = [channel.get(column) for channel in channels]
+    if any(delay is None for delay in delays):
+        raise RuntimeError("replication is not running, so the replica's delay is unknown")
+    return max(int(delay) for delay in delays)
+
+
+def describe_table(cursor, table):
+    """(column, data_type, precision, scale) for each column of a table"""
+    cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+    """, (table,))
+    return cursor.fetchall()
+
+
+def arrow_schema(columns):
+    """Arrow types for MySQL columns, so every batch and partition agrees"""
+    fields = []
+    for name, data_type, precision, scale in columns:
+        if data_type in ('tinyint', 'smallint', 'mediumint', 'int', 'bigint'):
+            arrow_type = pa.int64()
+        elif data_type == 'decimal':
+            arrow_type = pa.decimal128(int(precision), int(scale))
+        elif data_type in ('float', 'double'):
+            arrow_type = pa.float64()
+        elif data_type in ('datetime', 'timestamp'):
+            arrow_type = pa.timestamp('us')
+        elif data_type == 'date':
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+class PartitionWriter:
+    """Writes date partitions, keeping the ``max_open`` most recently used files open"""
+
+    def __init__(self, output, table, fmt, columns, run_id, max_open=MAX_OPEN_PARTITIONS):
+        self.directory = os.path.join(output, table)
+        self.fmt = fmt
+        self.names = [c[0] for c in columns]
+        self.schema = arrow_schema(columns) if fmt != 'csv' else None
+        self.run_id = run_id
+        self.max_open = max(max_open, 1)
+        self.files = OrderedDict()
+        self.parts = {}
+        self.rows = 0
+
+    def _open(self, partition):
+        directory = os.path.join(self.directory, f"date={partition}")
+        os.makedirs(directory, exist_ok=True)
+        # A partition whose file was closed earlier in the run continues in a new part
+        part = self.parts.get(partition, 0)
+        self.parts[partition] = part + 1
+        suffix = f"-{part}" if part else ''
+        path = os.path.join(directory, f"part-{self.run_id}{suffix}.{self.fmt}")
+        if self.fmt == 'parquet':
+            return pa.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        if self.fmt == 'arrow':
+            return pa.ipc.new_file(path, self.schema)
+        f = open(path, 'w', newline='', encoding='utf-8')
+        writer = csv.writer(f)
+        writer.writerow(self.names)
+        return f, writer
+
+    def write(self, partition, rows):
+        target = self.files.get(partition)
+        if target is None:
+            if len(self.files) >= self.max_open:
+                self._close(self.files.popitem(last=False)[1])
+            target = self.files[partition] = self._open(partition)
+        else:
+            self.files.move_to_end(partition)
+        if self.fmt == 'csv':
+            target[1].writerows(rows)
+        else:
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)],
+                schema=self.schema
+            )
+            if self.fmt == 'arrow':
+                target.write(batch)
+            else:
+                target.write_batch(batch)
+        self.rows += len(rows)
+
+    def _close(self, target):
+        if self.fmt == 'csv':
+            target[0].close()
+        else:
+            target.close()
+
+    def close(self):
+        while self.files:
+            self._close(self.files.popitem(last=False)[1])
+
+
+def partition_of(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return 'unknown'
+
+
+def export_table(conn, table, output, fmt, state, batch_size=50000, lag=60, full=False,
+                 replica=False):
+    """Export new or changed rows of one table; returns the number of rows written"""
+    cursor = conn.cursor()
+    columns = describe_table(cursor, table)
+    names = [c[0] for c in columns]
+    if not names:
+        print(f"Skipping {table}: table does not exist")
+        return 0
+    watermark_column = 'updated_at' if 'updated_at' in names else 'created_at'
+    partition_index = names.index(PARTITION_COLUMNS.get(table, watermark_column))
+
+    # Upper bound from the server clock, so it matches the stored timestamps.
+    # A replica only holds rows committed on the primary up to its delay ago.
+    delay = replica_delay(cursor) if replica else 0
+    if delay:
+        print(f"Replica is {delay}s behind; the watermark stops that much earlier")
+    cursor.execute("SELECT NOW() - INTERVAL %s SECOND", (lag + delay,))
+    upper = cursor.fetchone()[0]
+    lower = None if full else state.get(table, {}).get('watermark')
+
+    conditions = ["id > %s", f"{watermark_column} < %s"]
+    if lower:
+        conditions.append(f"{watermark_column} >= %s")
+    query = f"""
+        SELECT {', '.join(f'`{n}`' for n in names)} FROM `{table}`
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        LIMIT %s
+    """
+
+    run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+    writer = PartitionWriter(output, table, fmt, columns, run_id)
+    id_index = names.index('id')
+    last_id = 0
+    started = time.time()
+    print(f"Exporting {table} changed {'since ' + lower if lower else 'ever'} up to {upper} ({fmt})")
+    try:
+        while True:
+            params = [last_id, upper] + ([lower] if lower else []) + [batch_size]
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            by_partition = {}
+            for row in rows:
+                by_partition.setdefault(partition_of(row[partition_index]), []).append(row)
+            for partition, partition_rows in by_partition.items():
+                writer.write(partition, partition_rows)
+            last_id = rows[-1][id_index]
+            elapsed = time.time() - started
+            print(f"  {table}: {writer.rows:,} rows, last id {last_id} ({writer.rows / elapsed:,.0f} rows/s)")
+    finally:
+        writer.close()
+        cursor.close()
+
+    state[table] = {
+        'watermark': upper.isoformat(sep=' '),
+        'watermark_column': watermark_column,
+        'rows': writer.rows,
+        'partitions': len(writer.parts),
+        'exported_at': datetime.now().isoformat(timespec='seconds')
+    }
+    print(f"Exported {writer.rows:,} rows of {table} into {len(writer.parts)} partitions "
+          f"in {time.time() - started:.1f}s")
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export tables to date-partitioned analytics files')
+    parser.add_argument('tables', nargs='*', default=['bookings', 'flights'])
+    parser.add_argument('--output', default=EXPORT_DIR, help='Export directory')
+    parser.add_argument('--format', choices=['parquet', 'arrow', 'csv'],
+                        default='parquet' if pa is not None else 'csv')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Rows per primary-key range')
+    parser.add_argument('--lag', type=int, default=60, help='Seconds left for in-flight transactions')
+    parser.add_argument('--full', action='store_true', help='Ignore the saved watermarks')
+    parser.add_argument('--primary', action='store_true', help='Read from the primary even if replicas exist')
+    args = parser.parse_args()
+
+    if args.format != 'csv' and pa is None:
+        print("Warning: pyarrow is not installed, falling back to CSV")
+        args.format = 'csv'
+
+    os.makedirs(args.output, exist_ok=True)
+    state = load_state(args.output)
+
+    conn = None
+    try:
+        conn, replica = connect_source(use_replica=not args.primary)
+        for table in args.tables:
+            export_table(conn, table, args.output, args.format, state,
+                         args.batch_size, args.lag, args.full, replica)
+            # Only advance a table's watermark once its export is complete
+            save_state(args.output, state)
+    except (RuntimeError, mysql.connector.Error) as err:
+        print(f"Error: {err}")
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Cheapest fare per route and day, kept next to the flights table.
+
+``route_fare_summary`` holds one row per (source, destination, departure date)
+with the lowest price, the number of flights and the earliest departure. It is
+maintained by triggers on ``flights``:
+
+- an insert folds the new flight into its row (``LEAST`` / ``+ 1``);
+- an update that changes the route, departure time or price, and any delete,
+  recompute the affected rows from the route index. Seat count updates from
+  bookings do not touch the summary.
+
+Calendar and "cheapest from X" queries then read the summary's primary key or
+its ``(source, date)`` index instead of aggregating ``flights``.
+
+    python fare_summary.py install         # table, procedure and triggers
+    python fare_summary.py rebuild         # recompute everything from flights
+    python fare_summary.py drop-triggers   # e.g. before a bulk load
+"""
+import argparse
+import time
+
+import mysql.connector
+from db import connect
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS route_fare_summary (
+        source_airport_id INT NOT NULL,
+        destination_airport_id INT NOT NULL,
+        departure_date DATE NOT NULL,
+        min_price DECIMAL(10, 2) NOT NULL,
+        flight_count INT NOT NULL,
+        earliest_departure DATETIME NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (source_airport_id, destination_airport_id, departure_date),
+        INDEX idx_fare_summary_source_date (source_airport_id, departure_date, destination_airport_id, min_price)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+# Recompute one (route, day) row; deletes it when no flight is left
+REFRESH_PROCEDURE_SQL = """
+    CREATE PROCEDURE refresh_route_fare_summary(IN p_source INT, IN p_destination INT, IN p_date DATE)
+    BEGIN
+        DECLARE v_count INT;
+        DECLARE v_min_price DECIMAL(10, 2);
+        DECLARE v_earliest DATETIME;
+
+        SELECT COUNT(*), MIN(price), MIN(departure_time)
+        INTO v_count, v_min_price, v_earliest
+        FROM flights
+        WHERE source_airport_id = p_source
+        AND destination_airport_id = p_destination
+        AND departure_time >= p_date AND departure_time < p_date + INTERVAL 1 DAY;
+
+        IF v_count = 0 THEN
+            DELETE FROM route_fare_summary
+            WHERE source_airport_id = p_source
+            AND destination_airport_id = p_destination
+            AND departure_date = p_date;
+        ELSE
+            INSERT INTO route_fare_summary
+                (source_airport_id, destination_airport_id, departure_date, min_price, flight_count, earliest_departure)
+            VALUES (p_source, p_destination, p_date, v_min_price, v_count, v_earliest)
+            ON DUPLICATE KEY UPDATE
+                min_price = v_min_price, flight_count = v_count, earliest_departure = v_earliest;
+        END IF;
+    END
+"""
+
+TRIGGERS = {
+    'flights_fare_summary_insert': """
+        CREATE TRIGGER flights_fare_summary_insert AFTER INSERT ON flights
+        FOR EACH ROW
+            INSERT INTO route_fare_summary
+                (source_airport_id, destination_airport_id, departure_date, min_price, flight_count, earliest_departure)
+            VALUES (NEW.source_airport_id, NEW.destination_airport_id, DATE(NEW.departure_time),
+                    NEW.price, 1, NEW.departure_time)
+            ON DUPLICATE KEY UPDATE
+                min_price = LEAST(min_price, NEW.price),
+                flight_count = flight_count + 1,
+                earliest_departure = LEAST(earliest_departure, NEW.departure_time)
+    """,
+    'flights_fare_summary_update': """
+        CREATE TRIGGER flights_fare_summary_update AFTER UPDATE ON flights
+        FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.source_airport_id <=> NEW.source_airport_id
+                    AND OLD.destination_airport_id <=> NEW.destination_airport_id
+                    AND OLD.departure_time <=> NEW.departure_time
+                    AND OLD.price <=> NEW.price) THEN
+                CALL refresh_route_fare_summary(OLD.source_airport_id, OLD.destination_airport_id,
+                                                DATE(OLD.departure_time));
+                IF NOT (OLD.source_airport_id <=> NEW.source_airport_id
+                        AND OLD.destination_airport_id <=> NEW.destination_airport_id
+                        AND DATE(OLD.departure_time) <=> DATE(NEW.departure_time)) THEN
+                    CALL refresh_route_fare_summary(NEW.source_airport_id, NEW.destination_airport_id,
+                                                    DATE(NEW.departure_time));
+                END IF;
+            END IF;
+        END
+    """,
+    'flights_fare_summary_delete': """
+        CREATE TRIGGER flights_fare_summary_delete AFTER DELETE ON flights
+        FOR EACH ROW
+            CALL refresh_route_fare_summary(OLD.source_airport_id, OLD.destination_airport_id,
+                                            DATE(OLD.departure_time))
+    """
+}
+
+REBUILD_SQL = """
+    INSERT INTO route_fare_summary
+        (source_airport_id, destination_airport_id, departure_date, min_price, flight_count, earliest_departure)
+    SELECT source_airport_id, destination_airport_id, DATE(departure_time),
+           MIN(price), COUNT(*), MIN(departure_time)
+    FROM flights
+    GROUP BY source_airport_id, destination_airport_id, DATE(departure_time)
+"""
+
+
+def install_triggers(cursor):
+    """(Re)create the refresh procedure and the flights triggers"""
+    cursor.execute("DROP PROCEDURE IF EXISTS refresh_route_fare_summary")
+    cursor.execute(REFRESH_PROCEDURE_SQL)
+    for name, sql in TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(sql)
+
+
+def drop_triggers(cursor):
+    """Stop maintaining the summary, e.g. while bulk loading flights"""
+    for name in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def install(cursor):
+    """Create the summary table and start maintaining it"""
+    cursor.execute(CREATE_TABLE_SQL)
+    install_triggers(cursor)
+
+
+def rebuild(cursor):
+    """Recompute the whole summary from flights; returns the number of rows"""
+    cursor.execute("DELETE FROM route_fare_summary")
+    cursor.execute(REBUILD_SQL)
+    return cursor.rowcount
+
+
+def fare_calendar(cursor, source, destination, start, end):
+    """Cheapest fare per day for a route, ``start`` to ``end`` inclusive"""
+    cursor.execute("""
+        SELECT s.departure_date AS date, s.min_price, s.flight_count, s.earliest_departure
+        FROM route_fare_summary s
+        WHERE s.source_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND s.destination_airport_id = (SELECT id FROM airports WHERE code = %s)
+        AND s.departure_date BETWEEN %s AND %s
+        ORDER BY s.departure_date
+    """, (source, destination, start, end))
+    return cursor.fetchall()
+
+
+def cheapest_from(cursor, source, start, end, limit=20):
+    """Cheapest fare per destination from ``source`` between two dates"""
+    cursor.execute("""
+        SELECT a.code AS destination, a.city, cheapest.min_price, cheapest.flight_count
+        FROM (
+            SELECT destination_airport_id, MIN(min_price) AS min_price, SUM(flight_count) AS flight_count
+            FROM route_fare_summary
+            WHERE source_airport_id = (SELECT id FROM airports WHERE code = %s)
+            AND departure_date BETWEEN %s AND %s
+            GROUP BY destination_airport_id
+            ORDER BY min_price
+            LIMIT %s
+        ) cheapest
+        JOIN airports a ON a.id = cheapest.destination_airport_id
+        ORDER BY cheapest.min_price
+    """, (source, start, end, limit))
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the route_fare_summary table')
+    subparsers = parser.add_subparsers(dest='command', help='Command to run')
+    subparsers.add_parser('install', help='Create the table, procedure and triggers')
+    subparsers.add_parser('drop-triggers', help='Remove the triggers (summary stops updating)')
+    subparsers.add_parser('rebuild', help='Recompute the summary from the flights table')
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return
+
+    conn = None
+    cursor = None
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        if args.command == 'install':
+            install(cursor)
+            print("Installed route_fare_summary and its triggers")
+        elif args.command == 'drop-triggers':
+            drop_triggers(cursor)
+            print("Dropped the route_fare_summary triggers")
+        elif args.command == 'rebuild':
+            started = time.time()
+            cursor.execute(CREATE_TABLE_SQL)
+            rows = rebuild(cursor)
+            conn.commit()
+            print(f"Rebuilt route_fare_summary: {rows} rows in {time.time() - started:.1f}s")
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
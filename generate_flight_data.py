@@ -1,111 +1,316 @@
+"""Generate synthetic flight schedules, from a few hundred rows up to millions.
+
+Airports come from ``airportsdata``: a fixed set of hubs plus ``--airports``
+spoke airports. Hubs are connected to each other; every spoke is connected to
+its nearest hubs. Flights are spread over those routes by route weight (trunk
+routes fly more often), with banked departure times, distance-based durations
+and prices. The same ``--seed`` and ``--start-date`` always produce the same
+schedule.
+
+Flights are generated in fixed-size chunks, optionally in several worker
+processes, and written with batched ``executemany`` or streamed through a CSV
+file and ``LOAD DATA LOCAL INFILE`` (the server needs ``local_infile=ON``).
+The fare summary triggers are dropped during the load and the summary is
+rebuilt afterwards. New flights are added to the existing ones; ``--truncate``
+deletes the existing flights first, and refuses while bookings exist.
+
+    python generate_flight_data.py --flights 2000000 --airports 1500 --workers 4 --method load-data
+"""
+import argparse
+import csv
+import os
 import random
-import mysql.connector
+import tempfile
+import time
+from bisect import bisect
 from datetime import datetime, timedelta
+from itertools import accumulate
+from math import radians, sin, cos, sqrt, atan2
+from multiprocessing import Pool
+
+import airportsdata
+import mysql.connector
+from db import connect
 from dotenv import load_dotenv
-import os
+
+import fare_summary
 
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    """Create a database connection"""
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
+# Hub airports and the carrier operating each hub's network
+HUB_CARRIERS = {
+    'ATL': ('DL', 'Delta Air Lines'), 'DFW': ('AA', 'American Airlines'), 'DEN': ('UA', 'United Airlines'),
+    'ORD': ('UA', 'United Airlines'), 'LAX': ('AA', 'American Airlines'), 'JFK': ('B6', 'JetBlue Airways'),
+    'SEA': ('AS', 'Alaska Airlines'), 'SFO': ('UA', 'United Airlines'), 'MIA': ('AA', 'American Airlines'),
+    'CLT': ('AA', 'American Airlines'), 'IAH': ('UA', 'United Airlines'), 'LAS': ('WN', 'Southwest Airlines'),
+    'YYZ': ('AC', 'Air Canada'), 'YVR': ('AC', 'Air Canada'), 'MEX': ('AM', 'Aeromexico'),
+    'GRU': ('LA', 'LATAM Airlines'), 'BOG': ('AV', 'Avianca'), 'LHR': ('BA', 'British Airways'),
+    'CDG': ('AF', 'Air France'), 'AMS': ('KL', 'KLM'), 'FRA': ('LH', 'Lufthansa'),
+    'MUC': ('LH', 'Lufthansa'), 'MAD': ('IB', 'Iberia'), 'FCO': ('AZ', 'ITA Airways'),
+    'IST': ('TK', 'Turkish Airlines'), 'DXB': ('EK', 'Emirates'), 'DOH': ('QR', 'Qatar Airways'),
+    'AUH': ('EY', 'Etihad Airways'), 'DEL': ('AI', 'Air India'), 'BOM': ('6E', 'IndiGo'),
+    'BLR': ('6E', 'IndiGo'), 'HYD': ('6E', 'IndiGo'), 'MAA': ('AI', 'Air India'),
+    'SIN': ('SQ', 'Singapore Airlines'), 'HKG': ('CX', 'Cathay Pacific'), 'BKK': ('TG', 'Thai Airways'),
+    'KUL': ('MH', 'Malaysia Airlines'), 'ICN': ('KE', 'Korean Air'), 'NRT': ('NH', 'All Nippon Airways'),
+    'HND': ('JL', 'Japan Airlines'), 'PEK': ('CA', 'Air China'), 'PVG': ('MU', 'China Eastern'),
+    'CAN': ('CZ', 'China Southern'), 'SYD': ('QF', 'Qantas'), 'MEL': ('QF', 'Qantas'),
+    'JNB': ('SA', 'South African Airways'), 'ADD': ('ET', 'Ethiopian Airlines'), 'NBO': ('KQ', 'Kenya Airways'),
+    'CAI': ('MS', 'EgyptAir')
+}
+
+# Relative departure frequency per hour of day (hub banks in the morning and evening)
+HOUR_WEIGHTS = [1, 1, 1, 1, 2, 6, 10, 12, 11, 8, 7, 7, 8, 8, 7, 7, 9, 11, 12, 10, 8, 5, 3, 2]
+SEAT_CAPACITIES = [72, 76, 150, 180, 186, 220, 300, 350]
+
+FLIGHT_COLUMNS = ('flight_number', 'airline', 'source_airport_id', 'destination_airport_id',
+                  'departure_time', 'arrival_time', 'price', 'available_seats')
+INSERT_FLIGHT_SQL = f"""
+    INSERT INTO flights ({', '.join(FLIGHT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(FLIGHT_COLUMNS))})
+"""
+
+
+def distance_km(a, b):
+    """Great-circle distance between two airportsdata entries"""
+    lat1, lon1, lat2, lon2 = map(radians, [a['lat'], a['lon'], b['lat'], b['lon']])
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * atan2(sqrt(h), sqrt(1 - h))
+
+
+def select_airports(count, seed):
+    """Hubs plus ``count`` spoke airports, the same ones for the same seed"""
+    data = airportsdata.load('IATA')
+    hubs = [data[code] for code in HUB_CARRIERS if code in data]
+    # Real airports with an ICAO code; international ones first
+    candidates = sorted(
+        (a for code, a in data.items()
+         if code not in HUB_CARRIERS and a['city'] and a['country'] and a['icao'].isalpha()),
+        key=lambda a: ('International' not in a['name'], a['iata'])
     )
+    international = [a for a in candidates if 'International' in a['name']]
+    others = [a for a in candidates if 'International' not in a['name']]
+    rng = random.Random(seed)
+    spokes = international[:count]
+    if len(spokes) < count:
+        spokes += rng.sample(others, min(count - len(spokes), len(others)))
+    return hubs, spokes
 
-def generate_flight_number():
-    """Generate a random flight number"""
-    airlines = ['AA', 'UA', 'DL', 'WN', 'B6', 'AS', 'NK', 'F9', 'G4', 'SY']
-    return f"{random.choice(airlines)}{random.randint(100, 9999)}"
 
-def generate_flight_duration():
-    """Generate a random flight duration between 1 and 8 hours"""
-    return random.randint(60, 480)  # in minutes
+def store_airports(cursor, airports):
+    """Insert missing airports and return a code -> id map"""
+    cursor.executemany("""
+        INSERT IGNORE INTO airports (code, name, city, country, latitude, longitude, timezone)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(a['iata'], a['name'][:100], a['city'][:100], a['country'], a['lat'], a['lon'], a['tz'])
+          for a in airports])
+    cursor.execute("SELECT code, id FROM airports")
+    return dict(cursor.fetchall())
 
-def generate_flight_price(base_price=100):
-    """Generate a random flight price"""
-    return round(base_price * random.uniform(0.8, 2.5), 2)
 
-def generate_sample_flights(num_flights=100):
-    """Generate sample flight data"""
+def build_routes(hubs, spokes, airport_ids, hubs_per_spoke=2):
+    """Directed routes as (source_id, destination_id, km, carrier code, carrier name, weight)
+
+    Hub to hub routes carry the most traffic, weighted by how short they are;
+    each spoke gets round trips to its ``hubs_per_spoke`` nearest hubs.
+    """
+    routes = []
+    for a in hubs:
+        for b in hubs:
+            if a is b:
+                continue
+            km = distance_km(a, b)
+            code, name = HUB_CARRIERS[a['iata']]
+            routes.append((airport_ids[a['iata']], airport_ids[b['iata']], km, code, name,
+                           12.0 if km < 3000 else 4.0))
+    for spoke in spokes:
+        nearest = sorted(hubs, key=lambda hub: distance_km(spoke, hub))[:hubs_per_spoke]
+        for rank, hub in enumerate(nearest):
+            km = distance_km(spoke, hub)
+            code, name = HUB_CARRIERS[hub['iata']]
+            weight = 3.0 if rank == 0 else 1.0
+            routes.append((airport_ids[spoke['iata']], airport_ids[hub['iata']], km, code, name, weight))
+            routes.append((airport_ids[hub['iata']], airport_ids[spoke['iata']], km, code, name, weight))
+    return routes
+
+
+# Worker state, set once per process by init_worker
+_routes = None
+_cum_weights = None
+_options = None
+
+
+def init_worker(routes, options):
+    global _routes, _cum_weights, _options
+    _routes = routes
+    _cum_weights = list(accumulate(route[5] for route in routes))
+    _options = options
+
+
+def generate_chunk(chunk, size):
+    """Rows for one chunk; the chunk number seeds its generator"""
+    rng = random.Random(f"{_options['seed']}:{chunk}")
+    start = _options['start_date']
+    days = _options['days']
+    total = _cum_weights[-1]
+    hour_cum = list(accumulate(HOUR_WEIGHTS))
+    rows = []
+    for _ in range(size):
+        source_id, destination_id, km, code, name, _ = _routes[bisect(_cum_weights, rng.random() * total)]
+        hour = bisect(hour_cum, rng.random() * hour_cum[-1])
+        departure = start + timedelta(days=rng.randrange(days), hours=hour, minutes=rng.randrange(0, 60, 5))
+        minutes = int(km / 13.5) + 30 + rng.randint(0, 20)
+        capacity = rng.choice(SEAT_CAPACITIES)
+        rows.append((
+            f"{code}{rng.randint(100, 9999)}",
+            name,
+            source_id,
+            destination_id,
+            departure.strftime('%Y-%m-%d %H:%M:%S'),
+            (departure + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S'),
+            round((40 + km * 0.11) * rng.uniform(0.8, 2.5), 2),
+            rng.randint(0, capacity)
+        ))
+    return rows
+
+
+def write_executemany(conn, rows, batch_size):
+    cursor = conn.cursor()
+    for i in range(0, len(rows), batch_size):
+        cursor.executemany(INSERT_FLIGHT_SQL, rows[i:i + batch_size])
+        conn.commit()
+    cursor.close()
+
+
+def write_load_data(conn, rows):
+    """Stream the rows to a CSV file and bulk load it"""
+    with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv', delete=False) as f:
+        csv.writer(f).writerows(rows)
+        path = f.name
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE flights
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\r\\n'
+            ({', '.join(FLIGHT_COLUMNS)})
+        """, (path,))
+        conn.commit()
+        cursor.close()
+    finally:
+        os.remove(path)
+
+
+def load_chunk(task):
+    """Generate and write one chunk; returns (rows, generation seconds)"""
+    chunk, size = task
+    started = time.time()
+    rows = generate_chunk(chunk, size)
+    generated = time.time() - started
+
+    conn = connect(allow_local_infile=True) if _options['method'] == 'load-data' else connect()
+    try:
+        if _options['method'] == 'load-data':
+            write_load_data(conn, rows)
+        else:
+            write_executemany(conn, rows, _options['batch_size'])
+    finally:
+        conn.close()
+    return len(rows), generated
+
+
+def delete_flights(conn, cursor, batch_size=50000):
+    """Delete every flight in batches, with foreign key checks left on"""
+    deleted = 0
+    while True:
+        cursor.execute("DELETE FROM flights ORDER BY id LIMIT %s", (batch_size,))
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+
+
+def generate_flights(num_flights, num_airports=500, days=90, seed=42, start_date=None,
+                     workers=1, method='executemany', batch_size=5000, chunk_size=50000,
+                     truncate=False):
+    """Generate ``num_flights`` flights over ``days`` days and load them into MySQL
+
+    The flights are added to the existing ones unless ``truncate`` is set.
+    """
     conn = None
     cursor = None
-    
+    start_date = start_date or (datetime.now().date() + timedelta(days=1))
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get all airport IDs
-        cursor.execute("SELECT id, code FROM airports")
-        airports = cursor.fetchall()
-        
-        if not airports:
-            print("No airports found in the database. Please run init_db.py first.")
-            return
-        
-        # Generate flights
-        flights = []
-        airlines = [
-            'American Airlines', 'United Airlines', 'Delta Air Lines',
-            'Southwest Airlines', 'JetBlue Airways', 'Alaska Airlines',
-            'Spirit Airlines', 'Frontier Airlines', 'Allegiant Air', 'Sun Country Airlines'
-        ]
-        
-        # Clear existing flights
-        cursor.execute("TRUNCATE TABLE flights")
-        
-        for _ in range(num_flights):
-            # Select random source and destination airports (must be different)
-            source, destination = random.sample(airports, 2)
-            
-            # Generate random departure time in the next 30 days
-            departure_time = datetime.now() + timedelta(days=random.randint(1, 30), 
-                                                      hours=random.randint(0, 23),
-                                                      minutes=random.choice([0, 15, 30, 45]))
-            
-            # Generate random flight duration
-            duration = generate_flight_duration()
-            arrival_time = departure_time + timedelta(minutes=duration)
-            
-            # Generate flight data
-            flight = {
-                'flight_number': generate_flight_number(),
-                'airline': random.choice(airlines),
-                'source_airport_id': source['id'],
-                'destination_airport_id': destination['id'],
-                'departure_time': departure_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'arrival_time': arrival_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'price': generate_flight_price(100 + (duration / 10)),  # Longer flights cost more
-                'available_seats': random.randint(5, 300)
-            }
-            
-            # Insert flight
-            cursor.execute("""
-                INSERT INTO flights (
-                    flight_number, airline, source_airport_id, destination_airport_id,
-                    departure_time, arrival_time, price, available_seats
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                flight['flight_number'],
-                flight['airline'],
-                flight['source_airport_id'],
-                flight['destination_airport_id'],
-                flight['departure_time'],
-                flight['arrival_time'],
-                flight['price'],
-                flight['available_seats']
-            ))
-            
-            flights.append(flight)
-        
+        conn = connect()
+        cursor = conn.cursor()
+
+        if truncate:
+            # Bookings cascade from flights; never drop them as a side effect
+            cursor.execute("SELECT COUNT(*) FROM bookings")
+            bookings = cursor.fetchone()[0]
+            if bookings:
+                print(f"Error: {bookings:,} bookings exist; delete them before using --truncate")
+                return
+
+        hubs, spokes = select_airports(num_airports, seed)
+        airport_ids = store_airports(cursor, hubs + spokes)
+        routes = build_routes(hubs, spokes, airport_ids)
         conn.commit()
-        print(f"Generated {len(flights)} sample flights")
-        
+        print(f"Using {len(hubs)} hubs, {len(spokes)} spoke airports and {len(routes)} routes")
+
+        # Row-by-row trigger work would dominate the load; the summary is rebuilt below
+        fare_summary.drop_triggers(cursor)
+        try:
+            if truncate:
+                print(f"Deleted {delete_flights(conn, cursor):,} existing flights")
+
+            options = {
+                'seed': seed,
+                'start_date': datetime.combine(start_date, datetime.min.time()),
+                'days': days,
+                'method': method,
+                'batch_size': batch_size
+            }
+            tasks = [(chunk, min(chunk_size, num_flights - offset))
+                     for chunk, offset in enumerate(range(0, num_flights, chunk_size))]
+
+            started = time.time()
+            loaded = 0
+            generation = 0.0
+            if workers > 1:
+                pool = Pool(workers, initializer=init_worker, initargs=(routes, options))
+                results = pool.imap_unordered(load_chunk, tasks)
+            else:
+                pool = None
+                init_worker(routes, options)
+                results = map(load_chunk, tasks)
+            try:
+                for rows, generated in results:
+                    loaded += rows
+                    generation += generated
+                    elapsed = time.time() - started
+                    print(f"  {loaded:,}/{num_flights:,} flights ({loaded / elapsed:,.0f} rows/s)")
+            finally:
+                if pool:
+                    pool.close()
+                    pool.join()
+            elapsed = time.time() - started
+        finally:
+            # Whatever happened to the load, flights must not be left without its triggers
+            print("Rebuilding the fare summary...")
+            summary_started = time.time()
+            cursor.execute(fare_summary.CREATE_TABLE_SQL)
+            summary_rows = fare_summary.rebuild(cursor)
+            conn.commit()
+            fare_summary.install_triggers(cursor)
+
+        print(f"Loaded {loaded:,} flights in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s, "
+              f"{method}, {workers} worker(s); generation {generation:.1f} CPU-s)")
+        print(f"Fare summary: {summary_rows:,} rows in {time.time() - summary_started:.1f}s")
+
     except mysql.connector.Error as err:
-        print(f"Error generating sample flights: {err}")
+        print(f"Error generating flights: {err}")
         if conn:
             conn.rollback()
     finally:
@@ -114,7 +319,29 @@ def generate_sample_flights(num_flights=100):
         if conn and conn.is_connected():
             conn.close()
 
+
+def generate_sample_flights(num_flights=100):
+    """Generate a small sample schedule"""
+    generate_flights(num_flights, num_airports=50, days=30)
+
+
 if __name__ == "__main__":
-    print("Generating sample flight data...")
-    generate_sample_flights(200)  # Generate 200 sample flights
-    print("Sample flight data generation complete")
+    parser = argparse.ArgumentParser(description='Generate synthetic flight schedules')
+    parser.add_argument('--flights', type=int, default=200, help='Number of flights to generate')
+    parser.add_argument('--airports', type=int, default=500, help='Spoke airports besides the hubs')
+    parser.add_argument('--days', type=int, default=90, help='Days of schedule from the start date')
+    parser.add_argument('--start-date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help='First departure day (default: tomorrow)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help='Generator/loader processes')
+    parser.add_argument('--method', choices=['executemany', 'load-data'], default='executemany')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per executemany')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows per worker task')
+    parser.add_argument('--truncate', action='store_true',
+                        help='Delete existing flights first (refused while bookings exist)')
+    args = parser.parse_args()
+
+    print("Generating flight data...")
+    generate_flights(args.flights, args.airports, args.days, args.seed, args.start_date,
+                     args.workers, args.method, args.batch_size, args.chunk_size, args.truncate)
+    print("Flight data generation complete")
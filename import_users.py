@@ -0,0 +1,263 @@
+"""Bulk import of existing user accounts from CSV or JSON Lines.
+
+Records need ``name``, ``email``, ``password`` (plain text) and ``mobile``,
+the same fields as ``POST /api/auth/register``, and are checked with the same
+rules. Valid records are hashed in batches on a process pool using every core
+(``--workers``), at ``BCRYPT_ROUNDS`` cost, and inserted with one
+``executemany`` and one commit per batch. Emails or mobile numbers that
+already exist are skipped (``ON DUPLICATE KEY UPDATE id = id``); values too
+long for their column are rejected rather than truncated.
+
+After every committed batch the number of input records consumed is written
+to a checkpoint file next to the input (``<input>.checkpoint``). Running the
+same command again resumes after the last committed batch; ``--restart``
+ignores the checkpoint. Rejected records are appended to ``--rejects`` with
+their record number and the validation error. That includes passwords bcrypt
+refuses to hash (a NUL byte, or more than 72 bytes with bcrypt 5); the rest of
+their batch is still imported.
+
+    python import_users.py customers.csv
+    python import_users.py customers.jsonl --workers 16 --batch-size 2000 --rejects rejected.jsonl
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from collections import deque
+
+import bcrypt
+import mysql.connector
+from auth_routes import REGISTRATION_FIELDS, validate_user_fields
+from db import connect
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+COLUMNS = ('name', 'email', 'password', 'mobile')
+
+
+def read_records(path, file_format=None):
+    """Yield one dict per input record, streaming the file"""
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                # Keep the record numbering stable and let validation reject it
+                record = {'_error': f'Invalid JSON on line {number}: {e.msg}'}
+            if not isinstance(record, dict):
+                record = {'_error': f'Line {number} is not a JSON object'}
+            yield record
+
+
+def hash_batch(batch, rounds):
+    """Replace the plain-text passwords of a batch with bcrypt hashes (runs in a worker)
+
+    Returns ``(rows, rejects)``; records whose password bcrypt refuses come
+    back as ``(record number, record without password, error)``.
+    """
+    rows = []
+    rejects = []
+    for number, name, email, password, mobile in batch:
+        try:
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds))
+        except ValueError as e:
+            rejects.append((number, {'name': name, 'email': email, 'mobile': mobile},
+                            f'Password cannot be hashed: {e}'))
+            continue
+        rows.append((name, email, hashed.decode('utf-8'), mobile))
+    return rows, rejects
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def insert_sql(cursor):
+    """INSERT statement for the users table, with an id column for UUID ids
+
+    Only duplicate keys are skipped; unlike INSERT IGNORE this does not turn
+    other errors (such as data too long) into warnings.
+    """
+    cursor.execute("""
+        SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'id'
+    """)
+    uuid_ids = cursor.fetchone()[0] in ('varchar', 'char')
+    if uuid_ids:
+        sql = "INSERT INTO users (id, name, email, password, mobile) VALUES (%s, %s, %s, %s, %s)"
+    else:
+        sql = "INSERT INTO users (name, email, password, mobile) VALUES (%s, %s, %s, %s)"
+    return sql + " ON DUPLICATE KEY UPDATE id = id", uuid_ids
+
+
+def column_lengths(cursor):
+    """Maximum length of the users columns a record fills, except the hashed password"""
+    cursor.execute("""
+        SELECT COLUMN_NAME, CHARACTER_MAXIMUM_LENGTH FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users'
+    """)
+    return {column: length for column, length in cursor.fetchall()
+            if column in COLUMNS and column != 'password' and length}
+
+
+def batches(records, start, batch_size, rejects, lengths=None):
+    """Group valid records into batches of ``(record number, *COLUMNS)`` tuples
+
+    Yields ``(rows, consumed, rejected)``: ``consumed`` is the number of input
+    records read once the batch is complete, invalid ones included, and
+    ``rejected`` how many invalid records were read since the previous batch.
+    """
+    batch = []
+    consumed = start
+    rejected = 0
+    for number, record in enumerate(records, 1):
+        if number <= start:
+            continue
+        consumed = number
+        error = record.get('_error') or validate_user_fields(record, REGISTRATION_FIELDS)
+        row = tuple(str(record[column]).strip() if column != 'password' else str(record[column])
+                    for column in COLUMNS) if not error else ()
+        for column, value in zip(COLUMNS, row):
+            if lengths and len(value) > lengths.get(column, len(value)):
+                error = f'{column} is longer than {lengths[column]} characters'
+                break
+        if error:
+            rejects(number, record, error)
+            rejected += 1
+            continue
+        batch.append((number,) + row)
+        if len(batch) >= batch_size:
+            yield batch, consumed, rejected
+            batch = []
+            rejected = 0
+    if batch or rejected:
+        yield batch, consumed, rejected
+
+
+def import_users(path, file_format=None, batch_size=1000, workers=None, rounds=None,
+                 checkpoint_path=None, rejects_path=None, restart=False):
+    workers = workers or os.cpu_count() or 2
+    rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+    checkpoint_path = checkpoint_path or path + '.checkpoint'
+    checkpoint = {} if restart else load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint.get('input') != os.path.abspath(path):
+        raise ValueError(f"{checkpoint_path} belongs to {checkpoint.get('input')}")
+    start = checkpoint.get('records', 0)
+    totals = {key: checkpoint.get(key, 0) for key in ('inserted', 'duplicates', 'rejected')}
+    if start:
+        print(f"Resuming after record {start:,} ({totals['inserted']:,} users already imported)")
+
+    rejects_file = open(rejects_path, 'a', encoding='utf-8') if rejects_path else None
+
+    shown = 0
+
+    def reject(number, record, error):
+        nonlocal shown
+        if rejects_file:
+            record = {key: value for key, value in record.items() if key != 'password'}
+            rejects_file.write(json.dumps({'record': number, 'error': error, 'data': record}) + '\n')
+        elif shown < 10:
+            print(f"  record {number}: {error}")
+            shown += 1
+
+    conn = connect()
+    cursor = conn.cursor()
+    sql, uuid_ids = insert_sql(cursor)
+    lengths = column_lengths(cursor)
+
+    # Fork keeps the workers from re-importing this module and the app
+    context = (multiprocessing.get_context('fork')
+               if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing)
+    pool = context.Pool(workers)
+    # Hashing runs ahead of the inserts by a few batches; more would only hold memory
+    in_flight = deque()
+    started = time.time()
+    processed = 0
+
+    def commit(result, consumed, rejected):
+        nonlocal processed
+        rows, hash_rejects = result.get()
+        for number, record, error in hash_rejects:
+            reject(number, record, error)
+        totals['rejected'] += rejected + len(hash_rejects)
+        if rows:
+            if uuid_ids:
+                rows = [(str(uuid.uuid4()),) + row for row in rows]
+            cursor.executemany(sql, rows)
+            conn.commit()
+            inserted = max(cursor.rowcount, 0)
+            totals['inserted'] += inserted
+            totals['duplicates'] += len(rows) - inserted
+            processed += len(rows)
+        save_checkpoint(checkpoint_path, dict(totals, input=os.path.abspath(path), records=consumed))
+        elapsed = time.time() - started
+        print(f"  {consumed:,} records read, {totals['inserted']:,} imported "
+              f"({processed / elapsed if elapsed else 0:,.0f} users/s)")
+
+    try:
+        for batch, consumed, rejected in batches(read_records(path, file_format), start, batch_size, reject, lengths):
+            in_flight.append((pool.apply_async(hash_batch, (batch, rounds)), consumed, rejected))
+            if len(in_flight) >= workers * 2:
+                commit(*in_flight.popleft())
+        while in_flight:
+            commit(*in_flight.popleft())
+    finally:
+        pool.terminate()
+        cursor.close()
+        conn.close()
+        if rejects_file:
+            rejects_file.close()
+
+    elapsed = time.time() - started
+    print(f"\nImported {totals['inserted']:,} users, skipped {totals['duplicates']:,} existing "
+          f"and rejected {totals['rejected']:,} invalid records")
+    print(f"This run: {processed:,} users in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:,.0f} users/s, {workers} workers, bcrypt cost {rounds})")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import users from CSV or JSON Lines')
+    parser.add_argument('input', help='CSV with a header row, or one JSON object per line')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Users per insert and commit')
+    parser.add_argument('--workers', type=int, help='Hashing processes (default: all cores)')
+    parser.add_argument('--rounds', type=int, help='bcrypt cost (default: BCRYPT_ROUNDS or 12)')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <input>.checkpoint)')
+    parser.add_argument('--rejects', help='Append rejected records to this JSON Lines file')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    args = parser.parse_args()
+
+    try:
+        import_users(args.input, file_format=args.format, batch_size=args.batch_size,
+                     workers=args.workers, rounds=args.rounds, checkpoint_path=args.checkpoint,
+                     rejects_path=args.rejects, restart=args.restart)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+    except mysql.connector.Error as err:
+        print(f"Database error: {err}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,31 @@
-import os
 import mysql.connector
+from db import connect
+from fare_summary import install as install_fare_summary
+from token_revocation import create_tables as create_token_tables
+from backup_database import install_change_tracking
 from dotenv import load_dotenv
 import bcrypt
 
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    """Create a database connection"""
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
-
 def init_database():
     """Initialize the database with sample data"""
     conn = None
     cursor = None
     
     try:
-        conn = get_db_connection()
+        conn = connect()
         cursor = conn.cursor()
         
         # Drop tables if they exist (in the correct order to respect foreign key constraints)
         cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
         cursor.execute("DROP TABLE IF EXISTS bookings")
+        cursor.execute("DROP TABLE IF EXISTS route_fare_summary")
         cursor.execute("DROP TABLE IF EXISTS flights")
         cursor.execute("DROP TABLE IF EXISTS users")
         cursor.execute("DROP TABLE IF EXISTS airports")
+        cursor.execute("DROP TABLE IF EXISTS backup_tombstones")
         cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
         
         # Create tables
@@ -72,6 +68,7 @@ def init_database():
             destination_airport_id INT NOT NULL,
             departure_time DATETIME NOT NULL,
             arrival_time DATETIME NOT NULL,
+            departure_date DATE AS (DATE(departure_time)) STORED,
             price DECIMAL(10, 2) NOT NULL,
             available_seats INT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -80,10 +77,15 @@ def init_database():
             FOREIGN KEY (source_airport_id) REFERENCES airports(id) ON DELETE CASCADE,
             FOREIGN KEY (destination_airport_id) REFERENCES airports(id) ON DELETE CASCADE,
             INDEX (departure_time),
-            INDEX (arrival_time)
+            INDEX (arrival_time),
+            INDEX idx_flights_route_date_price (source_airport_id, destination_airport_id, departure_date, price),
+            INDEX idx_flights_route_departure (source_airport_id, destination_airport_id, departure_time)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
         
+        # Cheapest fare per route and day, maintained by triggers on flights
+        install_fare_summary(cursor)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS bookings (
             id INT NOT NULL AUTO_INCREMENT,
@@ -103,10 +105,17 @@ def init_database():
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
             FOREIGN KEY (flight_id) REFERENCES flights(id) ON DELETE CASCADE,
             INDEX (booking_date),
-            INDEX (status)
+            INDEX (status),
+            INDEX idx_bookings_user_created (user_id, created_at, id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
         
+        # Refresh tokens and revoked access tokens
+        create_token_tables(cursor)
+        
+        # Delete tombstones and updated_at indexes for incremental backups
+        install_change_tracking(cursor)
+        
         # Insert sample airports if they don't exist
         cursor.execute("SELECT COUNT(*) FROM airports")
         if cursor.fetchone()[0] == 0:
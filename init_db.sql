@@ -28,6 +28,8 @@ CREATE TABLE IF NOT EXISTS bookings (
     booking_reference VARCHAR(36) UNIQUE NOT NULL,
     status VARCHAR(20) DEFAULT 'confirmed',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Serves the newest-first, keyset-paginated bookings history per user
+    INDEX idx_bookings_user_created (user_id, created_at, id),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -0,0 +1,157 @@
+"""Cache of normalized flight offers and a cheapest-fare calendar.
+
+``optimize_route`` looks searches up here before calling Amadeus, and
+``cache_warmer.py`` fills it ahead of time for popular routes. Entries live in
+a small per-process LRU in front of an optional host-wide ``DiskCache``, so
+all workers share results and they survive restarts.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+
+def route_key(source, destination, date):
+    """Cache key for a one-way search"""
+    return f"{source.upper()}-{destination.upper()}:{date}"
+
+
+class OfferCache:
+    """Bounded LRU of search results with per-entry TTL, backed by a shared tier"""
+
+    def __init__(self, ttl=None, max_entries=None, shared=None, local_ttl=None):
+        self.ttl = ttl if ttl is not None else int(os.getenv('OFFER_CACHE_TTL', 900))
+        self.max_entries = max_entries or int(os.getenv('OFFER_CACHE_MAX_ENTRIES', 5000))
+        # Local copies of shared entries are only trusted briefly so workers stay in sync
+        self.local_ttl = local_ttl if local_ttl is not None else int(os.getenv('OFFER_CACHE_LOCAL_TTL', 60))
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._searches = Counter()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, source, destination, date):
+        """Return cached flights for a search, or None if missing or expired"""
+        key = route_key(source, destination, date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        flights = self.shared.get(f"offers:{key}") if self.shared else None
+        if flights is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._store_local(key, flights, self.local_ttl)
+        with self._lock:
+            self.shared_hits += 1
+        return flights
+
+    def set(self, source, destination, date, flights, ttl=None):
+        """Store flights for a search, evicting the least recently used entries"""
+        key = route_key(source, destination, date)
+        ttl = ttl if ttl is not None else self.ttl
+        if self.shared:
+            self.shared.set(f"offers:{key}", flights, ttl)
+            ttl = min(ttl, self.local_ttl)
+        self._store_local(key, flights, ttl)
+
+    def _store_local(self, key, flights, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, flights)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_fresh(self, source, destination, date, min_ttl=0):
+        """True if a search is cached for at least another ``min_ttl`` seconds"""
+        key = route_key(source, destination, date)
+        if self.shared:
+            remaining = self.shared.ttl(f"offers:{key}")
+            return remaining is not None and remaining > min_ttl
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.time() + min_ttl
+
+    def record_search(self, source, destination):
+        """Count a user search so the warmer knows which routes are popular"""
+        with self._lock:
+            self._searches[(source.upper(), destination.upper())] += 1
+
+    def popular_routes(self, limit):
+        """Most searched routes in this process, most popular first"""
+        with self._lock:
+            return self._searches.most_common(limit)
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else None
+            }
+
+
+class PriceCalendar:
+    """Cheapest known fare per route and departure day"""
+
+    def __init__(self, shared=None):
+        self.shared = shared
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def update(self, source, destination, date, flights):
+        """Record the cheapest of a fresh set of search results"""
+        if not flights:
+            return
+        cheapest = min(flights, key=lambda f: f['price'])
+        entry = {
+            'date': date,
+            'price': cheapest['price'],
+            'currency': cheapest.get('currency'),
+            'airline': cheapest.get('airline'),
+            'flightNumber': cheapest.get('flightNumber'),
+            'updated_at': int(time.time())
+        }
+        if self.shared:
+            # Keep the day until it has passed everywhere
+            expires = datetime.strptime(date, '%Y-%m-%d') + timedelta(days=2)
+            self.shared.set(self._key(source, destination, date), entry,
+                            max((expires - datetime.now()).total_seconds(), 60))
+            return
+        with self._lock:
+            self._routes.setdefault((source.upper(), destination.upper()), {})[date] = entry
+
+    def get(self, source, destination, dates):
+        """Calendar entries for ``dates``, ``None`` for days not fetched yet"""
+        if self.shared:
+            keys = [self._key(source, destination, date) for date in dates]
+            found = self.shared.get_many(keys)
+            return [found.get(key, {'date': date, 'price': None}) for key, date in zip(keys, dates)]
+        with self._lock:
+            days = self._routes.get((source.upper(), destination.upper()), {})
+            return [days.get(date, {'date': date, 'price': None}) for date in dates]
+
+    @staticmethod
+    def _key(source, destination, date):
+        return f"calendar:{route_key(source, destination, date)}"
+
+    def prune(self, before_date):
+        """Forget departure days that are already in the past"""
+        with self._lock:
+            for days in self._routes.values():
+                for date in [d for d in days if d < before_date]:
+                    del days[date]
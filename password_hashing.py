@@ -0,0 +1,166 @@
+"""bcrypt hashing and verification on a bounded process pool.
+
+Each bcrypt call burns tens to hundreds of milliseconds of CPU. Run inline,
+it ties up a request thread and competes with every other request for the
+API process's CPU. The hasher sends the work to ``PASSWORD_HASH_WORKERS``
+processes instead, so login throughput scales with cores and request threads
+only wait on a future.
+
+At most ``PASSWORD_HASH_MAX_QUEUE`` operations may be queued or running; past
+that ``HashingBusy`` is raised after ``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds
+so a login spike is shed with a 503 instead of piling up. A pool broken by a
+dead worker (e.g. killed for memory) is replaced and the operation retried
+once; if that fails too, ``HashingBusy`` is raised. New hashes use
+``BCRYPT_ROUNDS``; ``needs_rehash`` tells whether a stored hash is weaker.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HashingBusy(Exception):
+    """Too many hashing operations are already queued"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _verify(password, stored):
+    try:
+        return bcrypt.checkpw(password, stored)
+    except ValueError:
+        # Not a bcrypt hash
+        return False
+
+
+def hash_cost(stored):
+    """Cost factor of a ``$2b$12$...`` hash, or 0 if it cannot be read"""
+    if isinstance(stored, bytes):
+        stored = stored.decode('utf-8')
+    parts = stored.split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    """Process pool running bcrypt, bounded by a queue limit"""
+
+    def __init__(self, workers=None, rounds=None, max_queue=None, queue_timeout=None):
+        self.workers = workers or int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+        self.rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+        self.max_queue = max_queue or int(os.getenv('PASSWORD_HASH_MAX_QUEUE', self.workers * 8))
+        self.queue_timeout = (queue_timeout if queue_timeout is not None
+                              else float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2)))
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._restarts = 0
+        self._time_total = 0.0
+        self._time_max = 0.0
+
+    def _get_executor(self):
+        # Created lazily and again after a fork, so every worker process owns its pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Fork keeps the children from re-importing the app module
+                context = (multiprocessing.get_context('fork')
+                           if 'fork' in multiprocessing.get_all_start_methods() else None)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Forget a broken pool so the next operation starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._restarts += 1
+        executor.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy(f"{self.max_queue} password operations already queued")
+        started = time.monotonic()
+        with self._lock:
+            self._pending += 1
+        try:
+            try:
+                return self._submit(fn, *args)
+            except BrokenProcessPool:
+                pass
+            try:
+                return self._submit(fn, *args)
+            except BrokenProcessPool as e:
+                raise HashingBusy("password hashing workers keep dying") from e
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._time_total += elapsed
+                self._time_max = max(self._time_max, elapsed)
+            self._slots.release()
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` at the configured cost, as a string"""
+        return self._run(_hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def verify(self, password, stored):
+        """Check ``password`` against a stored hash (str or bytes)"""
+        if isinstance(stored, str):
+            stored = stored.encode('utf-8')
+        return self._run(_verify, password.encode('utf-8'), stored)
+
+    def needs_rehash(self, stored):
+        return hash_cost(stored) < self.rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self._rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'queue_depth': self._pending,
+                'max_queue': self.max_queue,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'pool_restarts': self._restarts,
+                'ms_avg': round(self._time_total / self._completed * 1000, 3) if self._completed else 0.0,
+                'ms_max': round(self._time_max * 1000, 3)
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,64 @@
+"""Read-through cache of user profiles for ``/api/auth/me``.
+
+Profiles live in the host-wide ``DiskCache`` under ``profile:<user_id>`` for
+``PROFILE_CACHE_TTL`` seconds, so every worker serves repeat calls without
+MySQL. Whatever changes a user row calls ``invalidate`` (or ``set`` with the
+new profile); the TTL bounds how long a missed invalidation can go unnoticed.
+Reads fill a miss with ``fill``, which never replaces a stored profile, so a
+profile read before an update cannot overwrite the one the update stored.
+"""
+import os
+import threading
+
+from disk_cache import DiskCache
+
+
+class ProfileCache:
+    """User profiles keyed by user id in a shared TTL store"""
+
+    def __init__(self, store=None, ttl=None):
+        self.store = store if store is not None else DiskCache()
+        self.ttl = ttl or int(os.getenv('PROFILE_CACHE_TTL', 300))
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _key(user_id):
+        return f"profile:{user_id}"
+
+    def get(self, user_id):
+        profile = self.store.get(self._key(user_id))
+        with self._lock:
+            if profile is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return profile
+
+    def set(self, user_id, profile):
+        self.store.set(self._key(user_id), profile, self.ttl)
+
+    def fill(self, user_id, profile):
+        """Cache a profile read after a miss, unless one was stored meanwhile"""
+        return self.store.add(self._key(user_id), profile, self.ttl)
+
+    def invalidate(self, user_id):
+        self.store.delete(self._key(user_id))
+        with self._lock:
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self._invalidations
+            }
+
+
+profile_cache = ProfileCache()
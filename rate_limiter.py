@@ -0,0 +1,217 @@
+"""Sliding-window rate limits for the authentication endpoints.
+
+Each rule allows ``limit`` requests per ``window`` seconds and key (a client
+IP, an email, a mobile number). Every key holds just the index of the current
+fixed window, the counts of the current and previous windows and an expiry
+time. A request is allowed while
+
+    previous * (1 - elapsed fraction of the current window) + current < limit
+
+which approximates a true sliding window without storing timestamps.
+Rejected requests are not counted, and the caller is told how many seconds
+until the next request would be allowed.
+
+Counters live in process memory by default. With ``RATE_LIMIT_BACKEND=sqlite``
+they are kept in a SQLite file (``RATE_LIMIT_PATH``) shared by all workers on
+the host, so the limit holds however requests are spread over processes.
+Rules are configured as ``<limit>/<seconds>``, e.g.
+``RATE_LIMIT_LOGIN_IP=30/60``.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+def parse_rule(spec):
+    """``'30/60'`` -> ``(30, 60.0)``"""
+    limit, window = spec.split('/')
+    return int(limit), float(window)
+
+
+def decide(state, window_index, fraction, limit):
+    """Apply one hit to ``(window_index, current, previous)`` counters
+
+    Returns ``(new_state, None)`` if the hit is allowed and ``(None, wait)``
+    if it is not, with ``wait`` as a fraction of the window.
+    """
+    if state is None or state[0] < window_index - 1:
+        current, previous = 0, 0
+    elif state[0] == window_index - 1:
+        current, previous = 0, state[1]
+    else:
+        current, previous = state[1], state[2]
+
+    if previous * (1 - fraction) + current < limit:
+        return (window_index, current + 1, previous), None
+
+    if current < limit:
+        # Wait for enough of the previous window to slide out
+        return None, 1 - (limit - current) / previous - fraction
+    # Wait for the next window, then for the current count to slide out
+    return None, (1 - fraction) + max(0.0, 1 - limit / current)
+
+
+class MemoryCounters:
+    """Per-process counters in a dict kept in least recently used order
+
+    When it grows past ``max_keys`` expired keys are dropped first, then the
+    least recently hit ones, so a flood of new keys cannot evict the counter
+    of a key that is being hammered.
+    """
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, expires_at, apply):
+        with self._lock:
+            # Re-inserting moves the key to the end, so the dict stays in LRU order
+            entry = self._counters.pop(key, None)
+            state, wait = apply(entry[:3] if entry else None)
+            if state is not None:
+                entry = state + (expires_at,)
+            if entry is not None:
+                self._counters[key] = entry
+                if len(self._counters) > self.max_keys:
+                    self._prune()
+            return wait
+
+    def _prune(self):
+        # Keys untouched for two windows count as zero anyway
+        now = time.time()
+        for key in [key for key, entry in self._counters.items() if entry[3] <= now]:
+            del self._counters[key]
+        # Under a flood of distinct keys, forget the least recently hit rather than grow without bound
+        excess = len(self._counters) - self.max_keys * 9 // 10
+        for key in list(self._counters)[:max(excess, 0)]:
+            del self._counters[key]
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class SqliteCounters:
+    """Counters in a SQLite file shared by every worker on the host"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        window_index INTEGER NOT NULL,
+        current INTEGER NOT NULL,
+        previous INTEGER NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS rate_limits_expires_at ON rate_limits (expires_at);
+    """
+
+    def __init__(self, path=None, cull_every=1000):
+        self.path = path or os.getenv('RATE_LIMIT_PATH', os.path.join('cache', 'rate_limits.db'))
+        self.cull_every = cull_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        # One connection per thread and per process (never reuse across fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, expires_at, apply):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT window_index, current, previous FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            state, wait = apply(tuple(row) if row else None)
+            if state is not None:
+                conn.execute("INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?)",
+                             (key,) + state + (expires_at,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (time.time(),))
+        return wait
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    """Named sliding-window rules checked against shared counters"""
+
+    def __init__(self, rules, backend=None):
+        self.rules = dict(rules)
+        backend = backend or os.getenv('RATE_LIMIT_BACKEND', 'memory')
+        self.counters = SqliteCounters() if backend == 'sqlite' else MemoryCounters()
+        self.backend = backend
+        self.enabled = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+        self._lock = threading.Lock()
+        self._allowed = {name: 0 for name in self.rules}
+        self._rejected = {name: 0 for name in self.rules}
+
+    def hit(self, rule, key):
+        """Count a request under ``rule`` for ``key``; seconds to wait if it is over the limit, else 0"""
+        if not self.enabled or not key:
+            return 0
+        limit, window = self.rules[rule]
+        now = time.time()
+        window_index = int(now // window)
+        fraction = (now % window) / window
+        # After two more windows the counts no longer matter and the key can go
+        wait = self.counters.hit(
+            f"{rule}:{str(key).strip().lower()}", (window_index + 2) * window,
+            lambda state: decide(state, window_index, fraction, limit)
+        )
+        with self._lock:
+            if wait is None:
+                self._allowed[rule] += 1
+                return 0
+            self._rejected[rule] += 1
+        return max(math.ceil(wait * window), 1)
+
+    def check(self, *hits):
+        """Apply ``(rule, key)`` hits in order and stop at the first rejection
+
+        Returns the seconds to wait, or 0 if every hit was allowed.
+        """
+        for rule, key in hits:
+            retry_after = self.hit(rule, key)
+            if retry_after:
+                return retry_after
+        return 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'enabled': self.enabled,
+                'keys': len(self.counters),
+                'rules': {name: f"{limit}/{window:g}s" for name, (limit, window) in self.rules.items()},
+                'allowed': dict(self._allowed),
+                'rejected': dict(self._rejected)
+            }
+
+
+rate_limiter = RateLimiter({
+    'login_ip': parse_rule(os.getenv('RATE_LIMIT_LOGIN_IP', '30/60')),
+    'login_identifier': parse_rule(os.getenv('RATE_LIMIT_LOGIN_IDENTIFIER', '10/300')),
+    'register_ip': parse_rule(os.getenv('RATE_LIMIT_REGISTER_IP', '10/3600')),
+    'refresh_ip': parse_rule(os.getenv('RATE_LIMIT_REFRESH_IP', '60/60'))
+})
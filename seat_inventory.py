@@ -0,0 +1,122 @@
+"""Seat inventory for flights in the local ``flights`` table.
+
+A booking never reads ``available_seats`` and writes it back. It runs one
+conditional decrement in the same transaction as the ``bookings`` insert:
+
+    UPDATE flights SET available_seats = available_seats - %s
+    WHERE id = %s AND available_seats >= %s
+
+The statement either takes the seats or matches no row, so concurrent bookers
+cannot oversell. The seats left once it has run (read under the row lock it
+holds) number the seats just sold, and only the booking rows are written
+before the commit, so the lock on a hot flight is held as briefly as possible.
+
+During checkout a user can hold seats for ``SEAT_HOLD_SECONDS``. Holds are
+kept in process memory: they keep other checkouts in the same worker from
+taking those seats, while the decrement above stays the final guard.
+"""
+import os
+import threading
+import time
+import uuid
+
+
+class SeatHolds:
+    """Short-lived, in-memory seat holds per flight"""
+
+    def __init__(self, ttl=None, max_seats=None):
+        self.ttl = ttl or int(os.getenv('SEAT_HOLD_SECONDS', 600))
+        self.max_seats = max_seats or int(os.getenv('SEAT_HOLD_MAX_SEATS', 9))
+        self._holds = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._expired = 0
+        self._rejected = 0
+
+    def _purge(self, now):
+        for hold_id in [h for h, hold in self._holds.items() if hold['expires_at'] <= now]:
+            del self._holds[hold_id]
+            self._expired += 1
+
+    def held(self, flight_id, exclude=None):
+        """Seats held on a flight, not counting the hold ``exclude``"""
+        with self._lock:
+            self._purge(time.time())
+            return sum(hold['seats'] for hold_id, hold in self._holds.items()
+                       if hold['flight_id'] == flight_id and hold_id != exclude)
+
+    def create(self, flight_id, user_id, seats, available):
+        """Hold ``seats`` if ``available`` minus existing holds covers them, else None"""
+        with self._lock:
+            now = time.time()
+            self._purge(now)
+            held = sum(hold['seats'] for hold in self._holds.values() if hold['flight_id'] == flight_id)
+            if available - held < seats:
+                self._rejected += 1
+                return None
+            hold_id = uuid.uuid4().hex
+            self._holds[hold_id] = {
+                'hold_id': hold_id,
+                'flight_id': flight_id,
+                'user_id': user_id,
+                'seats': seats,
+                'expires_at': now + self.ttl
+            }
+            self._created += 1
+            return dict(self._holds[hold_id])
+
+    def get(self, hold_id):
+        """The hold if it exists and has not expired"""
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if hold is None or hold['expires_at'] <= time.time():
+                return None
+            return dict(hold)
+
+    def release(self, hold_id):
+        with self._lock:
+            self._holds.pop(hold_id, None)
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.time())
+            return {
+                'active': len(self._holds),
+                'seats_held': sum(hold['seats'] for hold in self._holds.values()),
+                'created': self._created,
+                'expired': self._expired,
+                'rejected': self._rejected
+            }
+
+
+def take_seats(cursor, flight_id, seats, reserved=0):
+    """Atomically take ``seats`` if at least ``seats + reserved`` are left
+
+    ``reserved`` leaves seats held by other checkouts untouched. Returns the
+    seats left afterwards, or None when the flight does not have enough seats
+    (or does not exist); the caller must then roll back.
+    """
+    cursor.execute("""
+        UPDATE flights
+        SET available_seats = available_seats - %s
+        WHERE id = %s AND available_seats >= %s
+    """, (seats, flight_id, seats + reserved))
+    if cursor.rowcount != 1:
+        return None
+    # The UPDATE holds the row lock, so nobody else has changed it since
+    cursor.execute("SELECT available_seats FROM flights WHERE id = %s", (flight_id,))
+    return cursor.fetchone()[0]
+
+
+def seat_numbers(seats_left, seats):
+    """Seat numbers for ``seats`` just taken, leaving ``seats_left``
+
+    Seats are numbered by inventory position: the seats still for sale are
+    1..seats_left, so the ones just sold follow them.
+    """
+    return [str(seats_left + n) for n in range(1, seats + 1)]
+
+
+def booking_reference():
+    """Unique reference that fits ``bookings.booking_reference`` (VARCHAR(20))"""
+    return uuid.uuid4().hex[:16].upper()
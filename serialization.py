@@ -0,0 +1,68 @@
+"""Fast JSON responses for large payloads.
+
+``json_response`` replaces ``jsonify`` on hot endpoints. It encodes with
+orjson when it is installed and falls back to the standard library otherwise;
+``JSON_SERIALIZER`` forces a backend. MySQL values are handled directly:
+``Decimal`` becomes a string (no precision loss on prices) and
+``datetime``/``date`` become ISO 8601.
+"""
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """Encode the non-JSON types that come back from mysql.connector"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8')
+    if isinstance(obj, set):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+SERIALIZERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    SERIALIZERS['orjson'] = _orjson_dumps
+
+
+def register_serializer(name, dumps):
+    """Make another ``obj -> bytes`` encoder selectable through JSON_SERIALIZER"""
+    SERIALIZERS[name] = dumps
+
+
+def get_serializer(name=None):
+    name = name or os.getenv('JSON_SERIALIZER') or ('orjson' if orjson is not None else 'json')
+    if name not in SERIALIZERS:
+        print(f"Warning: JSON serializer '{name}' is not available, using the standard library")
+        name = 'json'
+    return SERIALIZERS[name]
+
+
+dumps = get_serializer()
+
+
+def json_response(payload, status=200):
+    """Drop-in for ``jsonify(payload), status`` using the fast serializer"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
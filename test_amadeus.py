@@ -1,12 +1,13 @@
 import requests
 import json
+import os
 from datetime import datetime, timedelta
 
 def test_amadeus():
-    # API configuration
-    base_url = "https://test.api.amadeus.com"
-    api_key = "BqDtPNTcgYsPP0X88iGrEsG3IMNzRpoS"
-    api_secret = "cr0APVNsSEoceqUt"
+    # API configuration (AMADEUS_BASE_URL may point at amadeus_stub.py)
+    base_url = os.getenv('AMADEUS_BASE_URL', "https://test.api.amadeus.com").rstrip('/')
+    api_key = os.getenv('AMADEUS_API_KEY', "BqDtPNTcgYsPP0X88iGrEsG3IMNzRpoS")
+    api_secret = os.getenv('AMADEUS_API_SECRET', "cr0APVNsSEoceqUt")
 
     # Get access token
     token_response = requests.post(
@@ -0,0 +1,160 @@
+"""Refresh tokens and access token revocation.
+
+Access tokens are short-lived JWTs with a ``jti``. Revoking one (logout)
+writes its ``jti`` to ``revoked_tokens``; every API process keeps the
+unexpired revocations in memory and pulls new ones every
+``REVOCATION_SYNC_SECONDS``, so checking a token is a set lookup and never a
+query. A revocation made in this process applies immediately, in the others
+after the next sync.
+
+Refresh tokens are random strings stored only as SHA-256 digests in
+``refresh_tokens``. Each use rotates the token; presenting a token that was
+already rotated or revoked revokes every refresh token of that user.
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+from db import get_connection
+
+CREATE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS refresh_tokens (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        token_hash CHAR(64) NOT NULL UNIQUE,
+        user_id VARCHAR(36) NOT NULL,
+        expires_at DATETIME NOT NULL,
+        revoked_at DATETIME NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_refresh_tokens_user (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        jti CHAR(32) PRIMARY KEY,
+        expires_at DATETIME NOT NULL,
+        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_revoked_tokens_revoked (revoked_at),
+        INDEX idx_revoked_tokens_expires (expires_at)
+    )
+    """
+]
+
+ACCESS_TOKEN_SECONDS = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 900))
+REFRESH_TOKEN_DAYS = int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30))
+
+
+def create_tables(cursor):
+    for sql in CREATE_TABLES_SQL:
+        cursor.execute(sql)
+
+
+def hash_refresh_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_refresh_token(cursor, user_id):
+    """Store a new refresh token for the user and return it"""
+    token = secrets.token_urlsafe(32)
+    cursor.execute("""
+        INSERT INTO refresh_tokens (token_hash, user_id, expires_at)
+        VALUES (%s, %s, %s)
+    """, (hash_refresh_token(token), str(user_id), datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS)))
+    return token
+
+
+def revoke_access_token(cursor, jti, expires_at):
+    """Record a revoked access token until it would have expired anyway"""
+    cursor.execute("INSERT IGNORE INTO revoked_tokens (jti, expires_at) VALUES (%s, %s)",
+                   (jti, expires_at))
+
+
+class RevocationList:
+    """In-memory set of revoked, unexpired access token ids
+
+    Reads are a plain ``in`` on a dict the sync thread swaps or extends, so
+    request threads never lock.
+    """
+
+    def __init__(self, get_connection, interval=None, full_interval=None):
+        self.get_connection = get_connection
+        self.interval = interval or float(os.getenv('REVOCATION_SYNC_SECONDS', 5))
+        self.full_interval = full_interval or float(os.getenv('REVOCATION_FULL_SYNC_SECONDS', 3600))
+        self._revoked = {}
+        self._since = None
+        self._last_full = 0.0
+        self._last_error = None
+        self._syncs = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_revoked(self, jti):
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        """Apply a revocation made by this process without waiting for the sync"""
+        self._revoked[jti] = expires_at
+
+    def sync(self, full=False):
+        """Pull revocations from MySQL; a full sync also forgets expired ones"""
+        full = full or self._since is None
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if full:
+                cursor.execute("SELECT jti, expires_at, revoked_at FROM revoked_tokens WHERE expires_at > UTC_TIMESTAMP()")
+            else:
+                # Inclusive: rows revoked within the same second as the last one seen
+                cursor.execute("SELECT jti, expires_at, revoked_at FROM revoked_tokens WHERE revoked_at >= %s",
+                               (self._since,))
+            rows = cursor.fetchall()
+            cursor.close()
+
+        if full:
+            self._revoked = {jti: expires_at for jti, expires_at, _ in rows}
+            self._last_full = time.monotonic()
+        else:
+            for jti, expires_at, _ in rows:
+                self._revoked[jti] = expires_at
+        if rows:
+            latest = max(revoked_at for _, _, revoked_at in rows)
+            self._since = max(self._since, latest) if self._since else latest
+        elif self._since is None:
+            self._since = datetime(1970, 1, 1)
+        self._syncs += 1
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sync(full=time.monotonic() - self._last_full >= self.full_interval)
+                self._last_error = None
+            except mysql.connector.Error as err:
+                # Report once per distinct failure, not on every tick
+                if str(err) != self._last_error:
+                    print(f"Token revocation sync failed: {err}")
+                    self._last_error = str(err)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='revocation-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'revoked': len(self._revoked),
+            'syncs': self._syncs,
+            'sync_interval_s': self.interval,
+            'last_error': self._last_error
+        }
+
+
+revocation_list = RevocationList(get_connection)
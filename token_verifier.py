@@ -0,0 +1,134 @@
+"""JWT signing keys and cached token verification.
+
+Keys are loaded once and identified by ``kid``. With ``JWT_KEYS_FILE`` set,
+they come from a JSON file that is re-read when it changes, so keys can be
+rotated without a redeploy:
+
+    {"active": "2026-10", "keys": {"2026-10": "new secret", "2026-07": "old secret"}}
+
+New tokens are signed with the active key; tokens signed with any listed key
+verify until they expire, and dropping a key from the file invalidates its
+tokens. Without the file, ``SECRET_KEY`` is the only key.
+
+Verified claims are kept in a bounded LRU keyed by the token's SHA-256 until
+the token's ``exp``, so a session's repeated requests skip the HMAC and JSON
+decoding.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+DEFAULT_KID = 'default'
+
+
+class TokenVerifier:
+    """Signs tokens with the active key and verifies them through an LRU of claims"""
+
+    def __init__(self, keys_file=None, cache_size=None, check_interval=None):
+        self.keys_file = keys_file if keys_file is not None else os.getenv('JWT_KEYS_FILE')
+        self.cache_size = cache_size or int(os.getenv('JWT_CACHE_SIZE', 10000))
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('JWT_KEYS_CHECK_SECONDS', 5)))
+        self.keys = {}
+        self.active_kid = None
+        self._mtime = None
+        self._next_check = 0.0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._load_keys()
+
+    def _load_keys(self):
+        if not self.keys_file:
+            self.keys = {DEFAULT_KID: os.getenv('SECRET_KEY', 'your-secret-key')}
+            self.active_kid = DEFAULT_KID
+            return
+        mtime = os.stat(self.keys_file).st_mtime
+        with open(self.keys_file) as f:
+            config = json.load(f)
+        keys = dict(config['keys'])
+        active = config.get('active') or next(iter(keys))
+        if active not in keys:
+            raise ValueError(f"Active key '{active}' is not in {self.keys_file}")
+        with self._lock:
+            self.keys = keys
+            self.active_kid = active
+            self._mtime = mtime
+            # Claims verified with a key that may have been removed must be checked again
+            self._cache.clear()
+            self._reloads += 1
+        print(f"Loaded {len(keys)} JWT keys from {self.keys_file} (active: {active})")
+
+    def _refresh_keys(self):
+        """Reload the keys file if it changed, at most every ``check_interval`` seconds"""
+        if not self.keys_file or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        try:
+            if os.stat(self.keys_file).st_mtime != self._mtime:
+                self._load_keys()
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving with the keys we have
+            print(f"Warning: could not reload JWT keys: {e}")
+
+    def issue(self, payload):
+        """Sign ``payload`` with the active key"""
+        self._refresh_keys()
+        kid = self.active_kid
+        return jwt.encode(payload, self.keys[kid], algorithm='HS256', headers={'kid': kid})
+
+    def verify(self, token):
+        """Claims of a valid token; raises ``jwt.InvalidTokenError`` otherwise"""
+        self._refresh_keys()
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(digest)
+                self._hits += 1
+                return cached[0]
+            self._misses += 1
+
+        # Tokens issued before key ids were introduced carry no kid
+        kid = jwt.get_unverified_header(token).get('kid', DEFAULT_KID)
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id '{kid}'")
+        claims = jwt.decode(token, key, algorithms=['HS256'], options={'require': ['exp']})
+
+        with self._lock:
+            self._cache[digest] = (claims, claims['exp'])
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def forget(self, token):
+        """Drop a token's cached claims, e.g. after it has been revoked"""
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        with self._lock:
+            self._cache.pop(digest, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'active_kid': self.active_kid,
+                'keys': len(self.keys),
+                'reloads': self._reloads,
+                'cached': len(self._cache),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0
+            }
+
+
+token_verifier = TokenVerifier()
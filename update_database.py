@@ -1,26 +1,18 @@
 import os
 import mysql.connector
+from db import connect
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    """Create a database connection"""
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
-
 def update_users_table():
     """Update the users table with the new schema"""
     conn = None
     cursor = None
     
     try:
-        conn = get_db_connection()
+        conn = connect()
         cursor = conn.cursor()
         
         # Check if the password column exists
@@ -74,7 +66,93 @@ def update_users_table():
         if conn and conn.is_connected():
             conn.close()
 
+def ensure_index(cursor, table, index_name, columns):
+    """Create an index unless one with that name already exists"""
+    cursor.execute("""
+        SELECT 1
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s
+        AND TABLE_NAME = %s
+        AND INDEX_NAME = %s
+        LIMIT 1
+    """, (os.getenv('MYSQL_DB', 'flight_booking'), table, index_name))
+    
+    if cursor.fetchone():
+        print(f"Index {index_name} on {table} already exists")
+        return False
+    
+    print(f"Adding index {index_name} on {table} ({columns})...")
+    cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns})")
+    print(f"Successfully added index {index_name}")
+    return True
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column unless it already exists"""
+    cursor.execute("""
+        SELECT 1
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = %s
+        AND TABLE_NAME = %s
+        AND COLUMN_NAME = %s
+    """, (os.getenv('MYSQL_DB', 'flight_booking'), table, column))
+    
+    if cursor.fetchone():
+        print(f"Column {column} on {table} already exists")
+        return False
+    
+    print(f"Adding column {column} to {table}...")
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    print(f"Successfully added column {column}")
+    return True
+
+def update_bookings_indexes():
+    """Add the indexes used by the bookings history endpoint"""
+    conn = None
+    cursor = None
+    
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        
+        # Newest-first keyset pagination per user
+        ensure_index(cursor, 'bookings', 'idx_bookings_user_created', 'user_id, created_at, id')
+        
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
+def update_flights_indexes():
+    """Add the departure date column and indexes used by the local flight search"""
+    conn = None
+    cursor = None
+    
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        
+        ensure_column(cursor, 'flights', 'departure_date',
+                      'DATE AS (DATE(departure_time)) STORED AFTER arrival_time')
+        # Cheapest first for a route and day; time ordered for a route
+        ensure_index(cursor, 'flights', 'idx_flights_route_date_price',
+                     'source_airport_id, destination_airport_id, departure_date, price')
+        ensure_index(cursor, 'flights', 'idx_flights_route_departure',
+                     'source_airport_id, destination_airport_id, departure_time')
+        
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
+
 if __name__ == "__main__":
     print("Updating database schema...")
     update_users_table()
+    update_bookings_indexes()
+    update_flights_indexes()
     print("Database update complete")
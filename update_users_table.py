@@ -1,20 +1,11 @@
-import os
-import mysql.connector
+from db import connect
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
-
 def update_users_table():
     try:
-        conn = get_db_connection()
+        conn = connect()
         cursor = conn.cursor()
         
         # Add password and mobile columns if they don't exist
@@ -1,55 +1,172 @@
+"""Inspect or export tables without loading them into memory.
+
+Rows are streamed from an unbuffered cursor in ``--batch-size`` batches and
+written out as they arrive, as grid tables, CSV or JSON Lines:
+
+    python view_data.py flights --where "price < 150" --columns flight_number,price --limit 20
+    python view_data.py bookings --format jsonl --output bookings.jsonl
+    python view_data.py users flights --format csv --output exports/
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
 import mysql.connector
+from db import connect
 from dotenv import load_dotenv
-import os
 from tabulate import tabulate
 
+import serialization
+
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DB', 'flight_booking')
-    )
-
-def print_table(conn, table_name):
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM {table_name}")
-    rows = cursor.fetchall()
-    
-    if not rows:
-        print(f"\nNo data in {table_name}")
-        return
-        
-    print(f"\n=== {table_name.upper()} ===")
-    print(tabulate(rows, headers='keys', tablefmt='grid'))
+DEFAULT_TABLES = ['users', 'airports', 'flights', 'bookings']
+EXTENSIONS = {'table': 'txt', 'csv': 'csv', 'jsonl': 'jsonl'}
+
+
+def table_columns(conn, table_name):
+    """Column names of a table, in order; empty if the table does not exist"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COLUMN_NAME
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+    """, (table_name,))
+    columns = [row[0] for row in cursor.fetchall()]
     cursor.close()
+    return columns
+
+
+def stream_rows(conn, table_name, columns, where=None, limit=None, batch_size=1000):
+    """Yield lists of row tuples straight from the server, one batch at a time
+
+    ``where`` is passed through as SQL: this is an operator tool, not an API.
+    """
+    query = f"SELECT {', '.join(f'`{c}`' for c in columns)} FROM `{table_name}`"
+    if where:
+        query += f" WHERE {where}"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+
+    # Unbuffered: the client only holds the batch being processed
+    cursor = conn.cursor(buffered=False)
+    cursor.execute(query)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+class TableWriter:
+    """Grid tables, one per batch, for reading in a terminal"""
+
+    def __init__(self, stream, columns, table_name):
+        self.stream = stream
+        self.columns = columns
+        self.stream.write(f"\n=== {table_name.upper()} ===\n")
+
+    def write(self, rows):
+        self.stream.write(tabulate(rows, headers=self.columns, tablefmt='grid') + "\n")
+        self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream, columns, table_name):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+
+class JsonLinesWriter:
+    """One JSON object per row; Decimal and datetime values as in API responses"""
+
+    def __init__(self, stream, columns, table_name):
+        self.stream = stream
+        self.columns = columns
+
+    def write(self, rows):
+        self.stream.write(''.join(
+            serialization.dumps(dict(zip(self.columns, row))).decode('utf-8') + '\n' for row in rows
+        ))
+
+
+WRITERS = {'table': TableWriter, 'csv': CsvWriter, 'jsonl': JsonLinesWriter}
+
+
+def export_table(conn, table_name, fmt='table', output=None, columns=None,
+                 where=None, limit=None, batch_size=1000):
+    """Stream one table to ``output`` (a path, or stdout); returns the row count"""
+    available = table_columns(conn, table_name)
+    if not available:
+        print(f"Error: table {table_name} does not exist", file=sys.stderr)
+        return 0
+    if columns:
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            print(f"Error: unknown columns for {table_name}: {', '.join(unknown)}", file=sys.stderr)
+            return 0
+    else:
+        columns = available
+
+    stream = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    started = time.time()
+    count = 0
+    try:
+        writer = WRITERS[fmt](stream, columns, table_name)
+        for rows in stream_rows(conn, table_name, columns, where, limit, batch_size):
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        if output:
+            stream.close()
+
+    if count == 0 and fmt == 'table':
+        print(f"No data in {table_name}")
+    if output:
+        elapsed = time.time() - started
+        print(f"Wrote {count:,} rows of {table_name} to {output} in {elapsed:.1f}s "
+              f"({count / elapsed if elapsed else count:,.0f} rows/s)", file=sys.stderr)
+    return count
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Stream tables to the terminal, CSV or JSON Lines')
+    parser.add_argument('tables', nargs='*', default=DEFAULT_TABLES, help='Tables to read (default: all)')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='table')
+    parser.add_argument('--output', help='Output file, or a directory when reading several tables')
+    parser.add_argument('--columns', help='Comma separated columns to read')
+    parser.add_argument('--where', help='SQL condition, e.g. "status = \'confirmed\'"')
+    parser.add_argument('--limit', type=int, help='Maximum rows per table')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows fetched per round trip')
+    args = parser.parse_args()
+
+    columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+
+    conn = None
     try:
-        conn = get_db_connection()
-        
-        # Print data from each table
-        tables = ['users', 'airports', 'flights', 'bookings']
-        for table in tables:
-            print_table(conn, table)
-            
+        conn = connect()
+        for table in args.tables:
+            output = args.output
+            if output and len(args.tables) > 1:
+                os.makedirs(output, exist_ok=True)
+                output = os.path.join(output, f"{table}.{EXTENSIONS[args.format]}")
+            export_table(conn, table, args.format, output, columns, args.where, args.limit, args.batch_size)
+
     except mysql.connector.Error as err:
-        print(f"Error: {err}")
+        print(f"Error: {err}", file=sys.stderr)
     finally:
-        if 'conn' in locals() and conn.is_connected():
+        if conn and conn.is_connected():
             conn.close()
 
 if __name__ == "__main__":
-    # Install required package if not already installed
-    try:
-        from tabulate import tabulate
-    except ImportError:
-        import sys
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "tabulate"])
-        from tabulate import tabulate
-    
     main()